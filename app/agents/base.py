@@ -0,0 +1,322 @@
+"""
+Shared helpers for the specialized agents.
+
+Implements the model escalation policy: agents answer on the default agent
+tier and are retried on the larger escalation model only when routing
+confidence is low or the answer fails a basic quality check.
+
+Agents answer through structured output: besides the answer text the model
+reports whether the query is fully handled ("done") and, if not, what a
+follow-up pass should do. The workflow loops only on that signal.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config.llm import get_agent_model, get_escalation_llm
+from app.config.settings import settings
+from app.orchestration.state import AgentState
+from app.rag import get_retriever
+
+logger = logging.getLogger(__name__)
+
+# Structured output format for agent answers (OpenAI json_schema response format)
+COMPLETION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "agent_reply",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answer": {
+                    "type": "string",
+                    "description": "Complete answer to the user, in Markdown"
+                },
+                "done": {
+                    "type": "boolean",
+                    "description": (
+                        "true if the answer fully handles the request. false only if "
+                        "another specialist pass is genuinely required; polite offers "
+                        "of further help do not count"
+                    )
+                },
+                "follow_up": {
+                    "type": ["string", "null"],
+                    "description": "When done is false: what the next pass should do. Otherwise null"
+                },
+            },
+            "required": ["answer", "done", "follow_up"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+@dataclass
+class AgentReply:
+    """Result of an agent LLM call."""
+    content: str
+    model: str
+    escalated: bool = False
+    escalation_reason: Optional[str] = None
+    done: bool = True
+    follow_up: Optional[str] = None
+
+
+# Start of the answer field in a (possibly truncated) structured reply
+_PARTIAL_ANSWER_RE = re.compile(r'"answer"\s*:\s*"((?:[^"\\]|\\.)*)')
+_INCOMPLETE_ESCAPE_RE = re.compile(r'\\u[0-9a-fA-F]{0,3}$')
+
+
+def partial_answer(text: str) -> Optional[str]:
+    """
+    Extract the answer text from a structured reply cut off mid-JSON.
+    
+    Args:
+        text: Raw LLM output (e.g. truncated at max_tokens)
+        
+    Returns:
+        The answer received so far, or None if the answer field never started
+    """
+    match = _PARTIAL_ANSWER_RE.search(text)
+    if not match:
+        return None
+    value = _INCOMPLETE_ESCAPE_RE.sub("", match.group(1))
+    try:
+        return json.loads(f'"{value}"')
+    except json.JSONDecodeError:
+        return value
+
+
+def parse_completion(text: str) -> tuple[str, bool, Optional[str]]:
+    """
+    Split a structured agent answer into answer text and completion signal.
+    
+    Plain-text answers (models or endpoints without structured output
+    support) are treated as complete. A structured answer cut off before
+    the JSON closes (max_tokens) keeps the answer text received so far.
+    
+    Args:
+        text: Raw LLM output
+        
+    Returns:
+        Tuple of (answer, done, follow_up)
+    """
+    if not isinstance(text, str) or not text.lstrip().startswith("{"):
+        return text, True, None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        answer = partial_answer(text)
+        return (text if answer is None else answer), True, None
+    if not isinstance(data, dict) or not isinstance(data.get("answer"), str):
+        return text, True, None
+    
+    done = data.get("done") is not False
+    follow_up = data.get("follow_up") if not done else None
+    return data["answer"], done, follow_up if isinstance(follow_up, str) and follow_up else None
+
+
+def make_reply(response, model: str, **kwargs) -> AgentReply:
+    """
+    Build an AgentReply from a raw LLM response.
+    
+    Args:
+        response: LLM response
+        model: Model that produced it
+        **kwargs: Extra AgentReply fields (escalation info)
+        
+    Returns:
+        AgentReply with the answer and completion signal
+    """
+    answer, done, follow_up = parse_completion(response_text(response))
+    return AgentReply(content=answer, model=model, done=done, follow_up=follow_up, **kwargs)
+
+
+def completion_kwargs() -> dict:
+    """Get the LLM invoke kwargs requesting a structured completion signal."""
+    if not settings.structured_completion:
+        return {}
+    return {"response_format": COMPLETION_RESPONSE_FORMAT}
+
+
+def apply_reply(state: AgentState, reply: AgentReply) -> None:
+    """
+    Record an agent's completion signal in the state.
+    
+    Args:
+        state: State returned by the agent (modified in place)
+        reply: The agent's reply
+    """
+    state["agent_done"] = reply.done
+    state["follow_up"] = reply.follow_up
+
+
+def response_text(response) -> str:
+    """
+    Extract text content from an LLM response.
+
+    Args:
+        response: LLM response (message object or plain string)
+
+    Returns:
+        Response text
+    """
+    if hasattr(response, 'content'):
+        return response.content
+    return str(response)
+
+
+def routing_confidence(state: AgentState) -> Optional[float]:
+    """
+    Get the confidence of the routing decision that selected this agent.
+
+    Args:
+        state: Current agent state
+
+    Returns:
+        Latest routing confidence, or None if the agent was not routed
+    """
+    routing_history = state.get("routing_history") or []
+    if routing_history:
+        return routing_history[-1].confidence
+    return None
+
+
+def retrieval_query(state: AgentState) -> str:
+    """
+    Get the text to retrieve context for.
+    
+    Always the user's query for this turn: on follow-up iterations the
+    latest message is the previous agent's answer.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Query text
+    """
+    if state.get("user_query"):
+        return state["user_query"]
+    for message in reversed(state["messages"]):
+        if message.role == "user":
+            return message.content
+    return state["messages"][-1].content
+
+
+def retrieve_context(state: AgentState, domain: str, top_k: int = 3) -> str:
+    """
+    Retrieve formatted RAG context for an agent.
+    
+    The query embedding is computed once per turn and cached in the state,
+    so follow-up iterations (and the shared-memory search) reuse it.
+    
+    Args:
+        state: Current agent state (query_embedding may be set)
+        domain: Agent domain to search
+        top_k: Number of documents to retrieve
+        
+    Returns:
+        Formatted context string (empty if nothing was found)
+    """
+    retriever = get_retriever()
+    query = retrieval_query(state)
+    
+    embedding = state.get("query_embedding")
+    if embedding is None and retriever.has_documents(domain):
+        embedding = retriever.vector_store.embed_query(query)
+        state["query_embedding"] = embedding
+    
+    return retriever.retrieve_and_format(
+        query=query,
+        domain=domain,
+        top_k=top_k,
+        query_embedding=embedding
+    )
+
+
+def check_answer(response, content: str) -> Optional[str]:
+    """
+    Check whether an answer is good enough to return without escalation.
+
+    Args:
+        response: Raw LLM response
+        content: Extracted response text
+
+    Returns:
+        Reason the answer failed the check, or None if it passed
+    """
+    if not isinstance(content, str) or not content.strip():
+        return "empty answer"
+
+    metadata = getattr(response, "response_metadata", None)
+    if isinstance(metadata, dict) and metadata.get("finish_reason") == "length":
+        return "answer truncated at max_tokens"
+
+    return None
+
+
+def invoke_with_escalation(
+    llm,
+    llm_messages: list[dict],
+    temperature: float,
+    confidence: Optional[float] = None
+) -> AgentReply:
+    """
+    Invoke an agent LLM, escalating to the larger model tier on demand.
+
+    Escalation policy:
+    - Routing confidence below settings.escalation_confidence_threshold goes
+      straight to the escalation model (the small model is skipped)
+    - Otherwise the default agent model answers first, and the request is
+      retried on the escalation model only if the answer fails check_answer()
+    - If escalation is disabled or fails, the default answer is kept
+
+    Args:
+        llm: Default-tier LLM instance
+        llm_messages: Messages to send
+        temperature: Temperature for the escalation model
+        confidence: Routing confidence (None if unknown)
+
+    Returns:
+        AgentReply with the final content, completion signal and the model
+        that produced it
+    """
+    invoke_kwargs = completion_kwargs()
+    
+    escalation_reason = None
+    if confidence is not None and confidence < settings.escalation_confidence_threshold:
+        escalation_reason = f"low routing confidence ({confidence:.2f})"
+
+    reply = None
+    if escalation_reason is None:
+        response = llm.invoke(llm_messages, **invoke_kwargs)
+        reply = make_reply(response, get_agent_model())
+
+        escalation_reason = check_answer(response, reply.content)
+        if escalation_reason is None:
+            return reply
+
+    escalation_llm = get_escalation_llm(temperature=temperature)
+    if escalation_llm is not None:
+        try:
+            response = escalation_llm.invoke(llm_messages, **invoke_kwargs)
+            logger.info(f"Escalated to {settings.escalation_llm_model}: {escalation_reason}")
+            return make_reply(
+                response,
+                settings.escalation_llm_model,
+                escalated=True,
+                escalation_reason=escalation_reason
+            )
+        except Exception as e:
+            logger.warning(f"Escalation to {settings.escalation_llm_model} failed: {e}")
+
+    # Escalation disabled or failed - use (or produce) the default-tier answer
+    if reply is None:
+        response = llm.invoke(llm_messages, **invoke_kwargs)
+        reply = make_reply(response, get_agent_model())
+    return reply
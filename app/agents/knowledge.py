@@ -5,7 +5,7 @@ Knowledge Agent - Personal knowledge base, facts, and memories.
 from app.orchestration.state import AgentState, Message
 from app.config.llm import get_llm
 from app.prompts.templates import KNOWLEDGE_AGENT_PROMPT
-from app.rag import get_retriever
+from app.agents.base import apply_reply, invoke_with_escalation, retrieve_context, routing_confidence
 from datetime import datetime
 
 
@@ -32,16 +32,9 @@ def knowledge_agent(state: AgentState) -> AgentState:
     if not messages:
         return state
     
-    latest_message = messages[-1]
-    user_query = latest_message.content
-    
     # Retrieve relevant context from knowledge base
-    retriever = get_retriever()
-    context = retriever.retrieve_and_format(
-        query=user_query,
-        domain="knowledge",
-        top_k=3
-    )
+    # (for the turn's user query; the embedding is reused across iterations)
+    context = retrieve_context(state, domain="knowledge", top_k=3)
     
     # Get LLM instance
     llm = get_llm(temperature=0.4)
@@ -61,14 +54,14 @@ def knowledge_agent(state: AgentState) -> AgentState:
             "content": msg.content
         })
     
-    # Get response from LLM
-    response = llm.invoke(llm_messages)
-    
-    # Extract content
-    if hasattr(response, 'content'):
-        response_content = response.content
-    else:
-        response_content = str(response)
+    # Get response from LLM (escalates to the larger model tier on demand)
+    reply = invoke_with_escalation(
+        llm,
+        llm_messages,
+        temperature=0.4,
+        confidence=routing_confidence(state)
+    )
+    response_content = reply.content
     
     # Create response message
     assistant_message = Message(
@@ -82,5 +75,6 @@ def knowledge_agent(state: AgentState) -> AgentState:
     new_state = state.copy()
     new_state["messages"] = state["messages"] + [assistant_message]
     new_state["current_agent"] = "knowledge"
+    apply_reply(new_state, reply)
     
     return new_state
@@ -3,81 +3,273 @@ Router Agent - LLM-based intelligent routing for the Digital Twin system.
 """
 
 import json
-from typing import Optional
+import re
+from dataclasses import dataclass, field, replace
+from typing import Optional, Sequence
 from app.config.llm import get_llm
+from app.config.settings import settings
 from app.prompts.templates import ROUTER_AGENT_PROMPT
+from app.utils.memo import memoized
 
 
-def router_agent(message: str) -> tuple[str, float, str]:
+# The routing decision is a single line of JSON; stop as soon as it closes
+# (the stop sequence itself is not returned, so the brace is restored below)
+ROUTER_STOP_SEQUENCES = ["}\n", "\n\n"]
+
+VALID_AGENTS = ["professional", "communication", "knowledge", "decision", "general"]
+
+
+@dataclass
+class RouteResult:
+    """Routing decision, including secondary agents for multi-domain queries."""
+    agent: str
+    confidence: float
+    reasoning: str
+    also: dict[str, float] = field(default_factory=dict)  # Secondary agent -> confidence
+    
+    def as_tuple(self) -> tuple[str, float, str]:
+        """Return the (agent_name, confidence, reasoning) tuple."""
+        return self.agent, self.confidence, self.reasoning
+    
+    def scores(self) -> dict[str, float]:
+        """Return confidence per agent for the primary and secondary agents."""
+        return {**self.also, self.agent: self.confidence}
+
+
+class RouterDecisionParser:
     """
-    LLM-based router that intelligently routes queries to appropriate agents.
+    Incremental parser for a streamed routing decision.
     
-    Uses an LLM to analyze the query semantically and determine the best agent,
-    providing better accuracy than keyword-based routing.
+    The router prompt fixes the field order to agent, confidence, also,
+    reasoning, so the fields we act on arrive in the first few tokens. feed()
+    reports completion as soon as they are fully parsed, letting the caller
+    abandon the rest of the stream (the reasoning).
+    """
+    
+    _AGENT_RE = re.compile(r'"agent"\s*:\s*"([^"]*)"')
+    # A number is only complete once a delimiter follows it
+    _CONFIDENCE_RE = re.compile(r'"confidence"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}\n]')
+    _ALSO_RE = re.compile(r'"also"\s*:\s*(\{[^{}]*\})')
+    _REASONING_KEY_RE = re.compile(r'"reasoning"\s*:')
+    _REASONING_RE = re.compile(r'"reasoning"\s*:\s*"((?:[^"\\]|\\.)*)')
+    
+    def __init__(self):
+        self.buffer = ""
+        self.agent: Optional[str] = None
+        self.confidence: Optional[float] = None
+        self.also: Optional[dict[str, float]] = None
+        self._reasoning_started = False
+    
+    def feed(self, text: str) -> bool:
+        """
+        Add streamed text to the parser.
+        
+        Args:
+            text: Next chunk of model output
+            
+        Returns:
+            True once the routing fields have been parsed
+        """
+        self.buffer += text
+        
+        if self.agent is None:
+            match = self._AGENT_RE.search(self.buffer)
+            if match:
+                self.agent = match.group(1)
+        
+        if self.confidence is None:
+            match = self._CONFIDENCE_RE.search(self.buffer)
+            if match:
+                self.confidence = float(match.group(1))
+        
+        if self.also is None:
+            match = self._ALSO_RE.search(self.buffer)
+            if match:
+                self.also = _parse_also(match.group(1))
+        
+        if not self._reasoning_started:
+            self._reasoning_started = self._REASONING_KEY_RE.search(self.buffer) is not None
+        
+        return self.complete
+    
+    @property
+    def complete(self) -> bool:
+        """Whether the fields needed for routing have been parsed."""
+        # `also` precedes reasoning, so once reasoning starts it is not coming
+        return (
+            self.agent is not None
+            and self.confidence is not None
+            and (self.also is not None or self._reasoning_started)
+        )
+    
+    @property
+    def reasoning(self) -> Optional[str]:
+        """Reasoning text received so far (possibly truncated), if any."""
+        match = self._REASONING_RE.search(self.buffer)
+        if not match:
+            return None
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except json.JSONDecodeError:
+            return match.group(1)
+
+
+def _parse_also(value) -> dict[str, float]:
+    """Parse secondary agents, dropping invalid names and confidences."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return {}
+    if not isinstance(value, dict):
+        return {}
+    
+    also = {}
+    for agent, confidence in value.items():
+        try:
+            confidence = max(0.0, min(1.0, float(confidence)))
+        except (TypeError, ValueError):
+            continue
+        if agent in VALID_AGENTS:
+            also[agent] = confidence
+    return also
+
+
+def _validate_decision(agent: str, confidence, reasoning: str, also=None) -> RouteResult:
+    """Validate agent name and clamp confidence to [0, 1]."""
+    if agent not in VALID_AGENTS:
+        return RouteResult("general", 0.6, f"Invalid agent '{agent}' returned, using general")
+    
+    # Ensure confidence is in valid range
+    confidence = max(0.0, min(1.0, float(confidence)))
+    
+    also = {name: conf for name, conf in (also or {}).items() if name != agent}
+    
+    return RouteResult(agent, confidence, reasoning, also)
+
+
+def _parse_routing_json(response_text: str) -> RouteResult:
+    """
+    Parse a complete routing decision from raw model output.
+    
+    Args:
+        response_text: Full model output
+        
+    Returns:
+        Parsed RouteResult
+        
+    Raises:
+        json.JSONDecodeError: If the JSON object is malformed
+    """
+    # Try to extract JSON from response (in case LLM adds extra text)
+    response_text = response_text.strip()
+    
+    # Restore closing braces swallowed by the stop sequence
+    missing_braces = response_text.count('{') - response_text.count('}')
+    if missing_braces > 0:
+        response_text += '}' * missing_braces
+    
+    # Find JSON object in response
+    start_idx = response_text.find('{')
+    end_idx = response_text.rfind('}') + 1
+    
+    if start_idx == -1 or end_idx <= start_idx:
+        # JSON not found, fallback
+        return RouteResult("general", 0.6, "Could not parse LLM response, using general agent")
+    
+    routing_decision = json.loads(response_text[start_idx:end_idx])
+    
+    return _validate_decision(
+        routing_decision.get("agent", "general"),
+        routing_decision.get("confidence", 0.6),
+        routing_decision.get("reasoning", "LLM routing decision"),
+        _parse_also(routing_decision.get("also"))
+    )
+
+
+def route_query(message: str, exclude: Sequence[str] = ()) -> RouteResult:
+    """
+    LLM-based routing returning the full decision, including secondary agents.
+    
+    The completion is streamed through RouterDecisionParser and the stream is
+    closed as soon as the routing fields are known, so router latency depends
+    on the first few tokens rather than the full JSON. The reasoning is kept only
+    as far as it had arrived.
     
     Args:
         message: User message to route
+        exclude: Agents that already handled the query (named in the prompt)
         
     Returns:
-        Tuple of (agent_name, confidence, reasoning)
+        RouteResult with primary agent and any secondary agents
     """
-    # Get LLM instance with low temperature for consistent routing
-    llm = get_llm(temperature=0.2)
+    # Small router-tier model with low temperature and a tight token budget
+    llm = get_llm(
+        model=settings.router_llm_model,
+        temperature=0.2,
+        max_tokens=settings.router_max_tokens,
+        stop=ROUTER_STOP_SEQUENCES
+    )
     
     # Prepare the routing prompt
-    full_prompt = f"{ROUTER_AGENT_PROMPT}\n\nUser Query: \"{message}\"\n\nYour routing decision (JSON):"
+    full_prompt = f"{ROUTER_AGENT_PROMPT}\n\nUser Query: \"{message}\""
+    if exclude:
+        full_prompt += f"\n\nAlready answered by (choose a different agent): {', '.join(exclude)}"
+    full_prompt += "\n\nYour routing decision (JSON):"
     
     try:
-        # Get routing decision from LLM
-        response = llm.invoke([
+        # Stream routing decision from LLM, stopping early once it is usable
+        parser = RouterDecisionParser()
+        stream = llm.stream([
             {"role": "system", "content": "You are a routing agent that responds only with valid JSON."},
             {"role": "user", "content": full_prompt}
         ])
+        try:
+            for chunk in stream:
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if parser.feed(text):
+                    break
+        finally:
+            # Closing the generator aborts the underlying HTTP response
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
         
-        # Extract response content
-        if hasattr(response, 'content'):
-            response_text = response.content
-        else:
-            response_text = str(response)
-        
-        # Parse JSON response
-        # Try to extract JSON from response (in case LLM adds extra text)
-        response_text = response_text.strip()
-        
-        # Find JSON object in response
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}') + 1
+        if parser.complete:
+            return _validate_decision(
+                parser.agent,
+                parser.confidence,
+                parser.reasoning or "LLM routing decision",
+                parser.also
+            )
         
-        if start_idx != -1 and end_idx > start_idx:
-            json_str = response_text[start_idx:end_idx]
-            routing_decision = json.loads(json_str)
-            
-            agent = routing_decision.get("agent", "general")
-            confidence = routing_decision.get("confidence", 0.6)
-            reasoning = routing_decision.get("reasoning", "LLM routing decision")
-            
-            # Validate agent name
-            valid_agents = ["professional", "communication", "knowledge", "decision", "general"]
-            if agent not in valid_agents:
-                agent = "general"
-                confidence = 0.6
-                reasoning = f"Invalid agent '{agent}' returned, using general"
-            
-            # Ensure confidence is in valid range
-            confidence = max(0.0, min(1.0, float(confidence)))
-            
-            return agent, confidence, reasoning
-        else:
-            # JSON not found, fallback
-            return "general", 0.6, "Could not parse LLM response, using general agent"
+        # Stream ended before the fields were recognized - parse what we got
+        return _parse_routing_json(parser.buffer)
     
     except json.JSONDecodeError as e:
         # JSON parsing failed, fallback to general
-        return "general", 0.6, f"JSON decode error: {str(e)}, using general agent"
+        return RouteResult("general", 0.6, f"JSON decode error: {str(e)}, using general agent")
     
     except Exception as e:
-        # Any other error, fallback to general
-        return "general", 0.5, f"Router error: {str(e)}, using general agent"
+        # Any other error: zero confidence so callers use the keyword
+        # fallback instead of treating this as a real decision
+        return RouteResult("general", 0.0, f"Router error: {str(e)}, using general agent")
+
+
+def router_agent(message: str) -> tuple[str, float, str]:
+    """
+    LLM-based router that intelligently routes queries to appropriate agents.
+    
+    Uses an LLM to analyze the query semantically and determine the best agent,
+    providing better accuracy than keyword-based routing.
+    
+    Args:
+        message: User message to route
+        
+    Returns:
+        Tuple of (agent_name, confidence, reasoning)
+    """
+    return route_query(message).as_tuple()
 
 
 def router_agent_with_fallback(message: str) -> tuple[str, float, str]:
@@ -107,7 +299,66 @@ def router_agent_with_fallback(message: str) -> tuple[str, float, str]:
         return _keyword_fallback(message)
 
 
-def _keyword_fallback(message: str) -> tuple[str, float, str]:
+def route_query_with_fallback(message: str, exclude: Sequence[str] = ()) -> RouteResult:
+    """
+    Full routing decision with keyword fallback for reliability.
+    
+    Same policy as router_agent_with_fallback, but keeps secondary agents
+    so the workflow can fan out multi-domain queries. Identical routing
+    calls within one request reuse the first LLM decision.
+    
+    Args:
+        message: User message to route
+        exclude: Agents that must not be chosen (already exhausted)
+        
+    Returns:
+        RouteResult (secondary agents are empty on keyword fallback)
+    """
+    try:
+        decision = memoized("routing", (message, tuple(exclude)), lambda: route_query(message, exclude))
+        result = replace(decision, also=dict(decision.also))
+        
+        if result.confidence < 0.5:
+            return RouteResult(*_keyword_fallback(message, exclude))
+        
+        if result.agent in exclude:
+            return _next_best(result, message, exclude)
+        
+        result.reasoning = f"LLM: {result.reasoning}"
+        return result
+    
+    except Exception:
+        # LLM routing failed completely, use keyword fallback
+        return RouteResult(*_keyword_fallback(message, exclude))
+
+
+def next_best_agent(scores: dict[str, float], exclude: Sequence[str] = ()) -> Optional[tuple[str, float]]:
+    """
+    Pick the highest-scoring agent that has not been excluded.
+    
+    Args:
+        scores: Confidence per agent (e.g. from RouteResult.scores())
+        exclude: Agents to skip
+        
+    Returns:
+        Tuple of (agent_name, confidence), or None if every agent is excluded
+    """
+    candidates = {agent: score for agent, score in scores.items() if agent not in exclude}
+    if not candidates:
+        return None
+    agent = max(candidates, key=candidates.get)
+    return agent, candidates[agent]
+
+
+def _next_best(result: RouteResult, message: str, exclude: Sequence[str]) -> RouteResult:
+    """Replace an excluded LLM choice with its best secondary agent or the keyword fallback."""
+    best = next_best_agent(result.also, exclude)
+    if best is not None:
+        return RouteResult(best[0], best[1], f"LLM: {result.agent} already tried, next best")
+    return RouteResult(*_keyword_fallback(message, exclude))
+
+
+def _keyword_fallback(message: str, exclude: Sequence[str] = ()) -> tuple[str, float, str]:
     """
     Simple keyword-based routing fallback.
     
@@ -115,6 +366,7 @@ def _keyword_fallback(message: str) -> tuple[str, float, str]:
     
     Args:
         message: User message to route
+        exclude: Agents that must not be chosen
         
     Returns:
         Tuple of (agent_name, confidence, reasoning)
@@ -134,11 +386,15 @@ def _keyword_fallback(message: str) -> tuple[str, float, str]:
         "knowledge": sum(1 for kw in knowledge_keywords if kw in message_lower),
         "decision": sum(1 for kw in decision_keywords if kw in message_lower),
     }
+    for agent in exclude:
+        scores.pop(agent, None)
     
-    max_score = max(scores.values())
+    max_score = max(scores.values(), default=0)
     
     if max_score == 0:
-        return "general", 0.6, "Fallback: No keywords matched"
+        # General unless already tried; then the first agent not yet tried
+        untried = [agent for agent in ["general", *VALID_AGENTS] if agent not in exclude]
+        return (untried[0] if untried else "general"), 0.6, "Fallback: No keywords matched"
     
     best_agent = max(scores, key=scores.get)
     confidence = min(0.75, 0.6 + (max_score * 0.1))
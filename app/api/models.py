@@ -1,6 +1,6 @@
 """Pydantic Models for API Request/Response"""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -37,6 +37,13 @@ class ChatRequest(BaseModel):
         ge=1,
         le=10
     )
+    
+    timeout_seconds: Optional[float] = Field(
+        None,
+        description="Overall deadline for the request in seconds (defaults to the server setting)",
+        ge=1,
+        le=300
+    )
 
 
 class IterationDetail(BaseModel):
@@ -116,6 +123,81 @@ class HealthResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class StateMessage(BaseModel):
+    """Conversation message from the graph state"""
+    
+    model_config = ConfigDict(from_attributes=True)
+    
+    role: str = Field(..., description="Role: 'user', 'assistant', or 'system'")
+    content: str = Field(..., description="Message content")
+    timestamp: datetime
+    agent: Optional[str] = Field(None, description="Agent that generated this message")
+
+
+class StateRoutingDecision(BaseModel):
+    """Routing decision from the graph state"""
+    
+    model_config = ConfigDict(from_attributes=True)
+    
+    target_agent: str = Field(..., description="Agent to route to")
+    confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score (0-1)")
+    reasoning: Optional[str] = Field(None, description="Why this agent was selected")
+    timestamp: datetime
+
+
+class StateRetrievedDocument(BaseModel):
+    """Retrieved document from the graph state"""
+    
+    model_config = ConfigDict(from_attributes=True)
+    
+    content: str = Field(..., description="Document content")
+    source: str = Field(..., description="Document source")
+    score: float = Field(..., description="Relevance score")
+    agent_domain: str = Field(..., description="Which agent's domain")
+
+
+class StateIterationLog(BaseModel):
+    """Iteration log entry from the graph state"""
+    
+    model_config = ConfigDict(from_attributes=True)
+    
+    iteration: int = Field(..., description="Iteration number")
+    agent: str = Field(..., description="Agent that executed")
+    action: str = Field(..., description="What happened in this iteration")
+    confidence: float = Field(..., description="Routing confidence")
+    reasoning: Optional[str] = Field(None, description="Why this happened")
+    timestamp: datetime
+
+
+# State keys holding record lists, and the API model for their items
+STATE_RECORD_MODELS: dict[str, type[BaseModel]] = {
+    "messages": StateMessage,
+    "routing_history": StateRoutingDecision,
+    "retrieved_docs": StateRetrievedDocument,
+    "iteration_log": StateIterationLog,
+}
+
+
+def state_to_api(state: dict) -> dict:
+    """
+    Convert the record lists of a graph state to API models.
+    
+    The graph uses lightweight slotted records internally; validation and
+    schema generation happen only here, at the API boundary.
+    
+    Args:
+        state: Agent state (not modified)
+        
+    Returns:
+        Shallow copy of the state with records converted to Pydantic models
+    """
+    converted = dict(state)
+    for key, model in STATE_RECORD_MODELS.items():
+        if key in converted:
+            converted[key] = [model.model_validate(record) for record in converted[key]]
+    return converted
+
+
 class StateExampleResponse(BaseModel):
     """Response model for state structure example"""
     
@@ -160,3 +242,13 @@ class ConversationMessagesResponse(BaseModel):
     conversation_id: str = Field(..., description="Conversation ID")
     messages: list[MessageResponse] = Field(..., description="List of messages")
     total: int = Field(..., description="Total number of messages")
+
+
+class MetricsResponse(BaseModel):
+    """Response model for performance metrics"""
+    
+    counters: dict[str, int] = Field(..., description="Raw performance counters")
+    rates: dict[str, Optional[float]] = Field(
+        default_factory=dict,
+        description="Derived rates (None until the underlying event has happened)"
+    )
@@ -16,6 +16,8 @@ from app.api.models import (
     ConversationListResponse,
     ConversationMessagesResponse,
     MessageResponse,
+    MetricsResponse,
+    state_to_api,
 )
 from app.database import get_db
 from app.services.conversation import ConversationService
@@ -26,6 +28,7 @@ from app.orchestration.state import (
     create_initial_state,
 )
 from app.orchestration.graph import run_workflow
+from app.orchestration.checkpoint import delete_checkpoints, has_checkpoint
 from app.agents import (
     general_agent,
     professional_agent,
@@ -34,6 +37,10 @@ from app.agents import (
     decision_agent,
 )
 from app.agents.router import router_agent_with_fallback
+from app.orchestration.speculation import speculation_hit_rate
+from app.orchestration.sticky import sticky_rate
+from app.rag.embeddings import average_batch_size
+from app.utils.metrics import metrics
 
 router = APIRouter(tags=["chat"])
 
@@ -48,7 +55,7 @@ AGENT_REGISTRY = {
 
 
 @router.post("/chat/graph", response_model=ChatResponse)
-async def chat_with_graph(request: ChatRequest) -> ChatResponse:
+def chat_with_graph(request: ChatRequest) -> ChatResponse:
     """
     Chat endpoint using LangGraph workflow (Phase 5).
     
@@ -69,7 +76,8 @@ async def chat_with_graph(request: ChatRequest) -> ChatResponse:
     state = create_initial_state(
         user_query=request.message,
         user_id=request.user_id,
-        max_iterations=request.max_iterations
+        max_iterations=request.max_iterations,
+        deadline=start_time + request.timeout_seconds if request.timeout_seconds else None
     )
     
     # Run through the graph workflow
@@ -78,6 +86,10 @@ async def chat_with_graph(request: ChatRequest) -> ChatResponse:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
     
+    # Deadline hit before any agent answered
+    if final_state["messages"][-1].role != "assistant":
+        raise HTTPException(status_code=504, detail=final_state.get("error") or "Request deadline exceeded")
+    
     # Get the agent's response (last message)
     agent_response = final_state["messages"][-1].content
     
@@ -111,7 +123,7 @@ async def chat_with_graph(request: ChatRequest) -> ChatResponse:
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
+def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
     """
     Main chat endpoint with agent routing, execution, and persistence.
     
@@ -145,9 +157,10 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatRespo
             title=request.message[:50] + ("..." if len(request.message) > 50 else "")
         )
     
-    # Load conversation history if continuing conversation
+    # Load conversation history if continuing a conversation that has no
+    # checkpoint yet (checkpointed conversations continue from their state)
     history_messages = []
-    if request.conversation_id:
+    if request.conversation_id and not has_checkpoint(conversation.id):
         db_messages = ConversationService.get_conversation_messages(db, conversation.id)
         history_messages = ConversationService.messages_to_state_format(db_messages)
     
@@ -156,7 +169,8 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatRespo
         user_query=request.message,
         user_id=request.user_id,
         session_id=request.session_id,
-        max_iterations=request.max_iterations
+        max_iterations=request.max_iterations,
+        deadline=start_time + request.timeout_seconds if request.timeout_seconds else None
     )
     
     # Add conversation history to state
@@ -173,10 +187,14 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)) -> ChatRespo
     
     # Run through LangGraph workflow (enables multi-iteration!)
     try:
-        final_state = run_workflow(state)
+        final_state = run_workflow(state, thread_id=conversation.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
     
+    # Deadline hit before any agent answered
+    if final_state["messages"][-1].role != "assistant":
+        raise HTTPException(status_code=504, detail=final_state.get("error") or "Request deadline exceeded")
+    
     # Get the agent's response (last message from workflow)
     agent_response = final_state["messages"][-1].content
     
@@ -313,13 +331,13 @@ async def get_state_example():
     now = datetime.now()
     state: AgentState = {
         "messages": [
-            Message(role="user", content="Example query", timestamp=now.isoformat()),
-            Message(role="assistant", content="Example response", agent="professional", timestamp=now.isoformat())
+            Message(role="user", content="Example query", timestamp=now),
+            Message(role="assistant", content="Example response", agent="professional", timestamp=now)
         ],
         "current_agent": "router",
         "next_agent": None,
         "routing_history": [
-            RoutingDecision(target_agent="professional", confidence=0.9, reasoning="Example routing", timestamp=now.isoformat())
+            RoutingDecision(target_agent="professional", confidence=0.9, reasoning="Example routing", timestamp=now)
         ],
         "routing_confidence": 0.9,
         "retrieved_docs": [],
@@ -336,11 +354,30 @@ async def get_state_example():
     }
     
     return StateExampleResponse(
-        state_structure=state,
+        state_structure=state_to_api(state),
         note="This shows the internal state structure with Phase 3 agents active!",
     )
 
 
+@router.get("/metrics", response_model=MetricsResponse)
+async def get_metrics() -> MetricsResponse:
+    """
+    Get in-process performance counters and derived rates.
+    """
+    return MetricsResponse(
+        counters=metrics.snapshot(),
+        rates={
+            "speculation_hit_rate": speculation_hit_rate(),
+            "sticky_routing_rate": sticky_rate(),
+            "context_tokens_saved_rate": metrics.ratio("context.tokens_saved", "context.tokens_in"),
+            "retrieval_cache_hit_rate": metrics.ratio("retrieval_cache.hits", "retrieval_cache.lookups"),
+            "embedding_batch_size": average_batch_size(),
+            "query_batch_size": metrics.ratio("query_batch.requests", "query_batch.calls"),
+            "vector_namespace_hit_rate": metrics.ratio("vector_namespaces.hits", "vector_namespaces.lookups"),
+        },
+    )
+
+
 @router.get("/conversations", response_model=ConversationListResponse)
 async def list_conversations(
     user_id: str = "default_user",
@@ -470,6 +507,7 @@ async def delete_conversation(
     
     # Delete conversation
     success = ConversationService.delete_conversation(db, conversation_id)
+    delete_checkpoints(conversation_id)
     
     if success:
         return {"message": "Conversation deleted successfully", "conversation_id": conversation_id}
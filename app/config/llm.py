@@ -2,32 +2,51 @@
 
 from langchain_openai import ChatOpenAI
 from app.config.settings import settings
+from app.utils.deadline import call_retries, call_timeout, check_deadline
+
+# Retries of a failed call (the OpenAI client's default) when time allows
+LLM_MAX_RETRIES = 2
 
 
 def get_llm(
     model: str | None = None,
     temperature: float | None = None,
-    max_tokens: int | None = None
+    max_tokens: int | None = None,
+    stop: list[str] | None = None
 ) -> ChatOpenAI:
     """
     Create a configured ChatOpenAI instance
     
     Args:
-        model: Model name (defaults to settings.default_llm_model)
+        model: Model name (defaults to the agent tier, see get_agent_model)
         temperature: Temperature setting (defaults to settings.llm_temperature)
         max_tokens: Max tokens (defaults to settings.max_tokens)
+        stop: Optional stop sequences
     
     Returns:
         Configured ChatOpenAI instance
+        
+    Raises:
+        DeadlineExceeded: If the current request deadline has already passed
     """
+    check_deadline("LLM call")
+    
+    # Each call, retries included, is bounded by the remaining request budget
+    timeout = call_timeout(settings.tool_timeout_seconds)
+    
     # Use base_url parameter for custom endpoints
     kwargs = {
         "api_key": settings.openai_api_key,
-        "model": model or settings.default_llm_model,
+        "model": model or get_agent_model(),
         "temperature": temperature if temperature is not None else settings.llm_temperature,
-        "max_tokens": max_tokens or settings.max_tokens
+        "max_tokens": max_tokens or settings.max_tokens,
+        "timeout": timeout,
+        "max_retries": call_retries(timeout, LLM_MAX_RETRIES)
     }
     
+    if stop:
+        kwargs["stop"] = stop
+    
     # Only set base_url if it's not the default OpenAI API
     if settings.openai_api_base != "https://api.openai.com/v1":
         kwargs["base_url"] = settings.openai_api_base
@@ -35,6 +54,32 @@ def get_llm(
     return ChatOpenAI(**kwargs)
 
 
+def get_agent_model() -> str:
+    """
+    Get the default model tier used by specialized agents.
+    
+    Returns:
+        settings.agent_llm_model, falling back to settings.default_llm_model
+    """
+    return settings.agent_llm_model or settings.default_llm_model
+
+
+def get_escalation_llm(temperature: float | None = None) -> ChatOpenAI | None:
+    """
+    Create the larger LLM used when an agent answer needs escalation.
+    
+    Args:
+        temperature: Temperature setting (defaults to settings.llm_temperature)
+    
+    Returns:
+        Configured ChatOpenAI instance, or None if escalation is disabled
+    """
+    model = settings.escalation_llm_model
+    if not model or model == get_agent_model():
+        return None
+    return get_llm(model=model, temperature=temperature)
+
+
 def get_embedding_model():
     """
     Create a configured embedding model instance
@@ -28,12 +28,59 @@ class Settings(BaseSettings):
     pinecone_api_key: str | None = None
     pinecone_environment: str | None = None
     
+    # Retrieval: "hybrid" fuses vector and BM25 rankings with reciprocal rank fusion
+    retrieval_mode: Literal["vector", "hybrid"] = "hybrid"
+    hybrid_rrf_k: int = 60  # RRF rank constant
+    hybrid_candidates: int = 20  # Candidates taken from each ranking before fusion
+    retrieval_cache_size: int = 256  # Cached retrieval results (LRU, 0 disables)
+    query_batch_enabled: bool = True  # Coalesce concurrent queries per collection
+    query_batch_window_ms: float = 2.0  # How long a batch waits for more queries
+    query_batch_max_size: int = 32
+    vector_namespaces_enabled: bool = False  # Per-user collections (user_id x domain)
+    vector_namespace_cache_size: int = 64  # Open user namespaces kept in memory (LRU)
+    vector_quantization: Literal["none", "float16", "int8", "ivfpq"] = "none"  # In-process search over compact codes; full vectors kept in a sidecar, not ChromaDB
+    quantization_rescore_factor: int = 4  # Shortlist of n_results x factor rescored at full precision (0 = off)
+    ivfpq_nlist: int = 1024  # Inverted lists (coarse clusters) per domain
+    ivfpq_subquantizers: int = 32  # PQ code bytes per vector; must divide the embedding size
+    ivfpq_nprobe: int = 16  # Lists scanned per query (recall vs latency)
+    ivfpq_train_size: int = 20000  # Vectors sampled to train a domain's index
+    vector_shards: int = 0  # Worker processes for sharded exact search (0 = off)
+    vector_sharded_domains: list[str] = ["shared"]  # Domains searched across the shard workers
+    
+    # Diversity: over-fetch and pick top_k by Maximal Marginal Relevance
+    mmr_enabled: bool = True
+    mmr_lambda: float = 0.7  # 1.0 = relevance only, 0.0 = diversity only
+    mmr_domain_lambdas: dict[str, float] = {}  # Per-domain overrides, e.g. {"decision": 1.0}
+    mmr_fetch_k: int = 12  # Candidates considered before selection
+    
+    # Context packing: de-duplicate, merge adjacent chunks, trim to a token budget
+    context_packing_enabled: bool = True
+    context_token_budget: int = 1200  # Tokens of retrieved context per agent call
+    context_duplicate_threshold: float = 0.9  # Word overlap for near-duplicate chunks
+    
+    # Ingestion dedup: MinHash/LSH near-duplicate chunks are not embedded
+    # link also records them on the kept chunk; run --rebuild-dedup after turning it on
+    ingestion_dedup: Literal["off", "skip", "link"] = "off"
+    ingestion_dedup_threshold: float = 0.8  # Estimated Jaccard similarity of word 3-gram shingles
+    ingestion_dedup_permutations: int = 128  # MinHash signature size
+    
     # Model Configuration
     default_llm_model: str = "gpt-4o-mini"  # Updated to gpt-4o-mini for MW
     embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int | None = None  # Shortened vectors (e.g. 256, 512); None = full size
+    embedding_batch_enabled: bool = True  # Merge concurrent query embeddings into one call
+    embedding_batch_window_ms: float = 5.0  # How long a batch waits for more queries
+    embedding_batch_max_size: int = 16  # A full batch is sent immediately
     llm_temperature: float = 0.1  # Updated to 0.1 for MW
     max_tokens: int = 4096
     
+    # Model Tiers (per-node model selection)
+    router_llm_model: str = "gpt-4o-mini"  # Small, fast model for routing
+    router_max_tokens: int = 96  # Routing JSON is ~40 tokens
+    agent_llm_model: str | None = None  # Defaults to default_llm_model
+    escalation_llm_model: str | None = "gpt-4o"  # None disables escalation
+    escalation_confidence_threshold: float = 0.6  # Escalate below this routing confidence
+    
     # API Configuration
     api_host: str = "0.0.0.0"
     api_port: int = 8000
@@ -43,9 +90,41 @@ class Settings(BaseSettings):
     routing_confidence_threshold: float = 0.7
     max_routing_iterations: int = 3
     
+    # Speculative Execution (run the keyword-predicted agent alongside the router)
+    speculative_execution: bool = False
+    
+    # Multi-domain Fan-out (run several agents concurrently and merge)
+    fanout_enabled: bool = True
+    fanout_confidence_threshold: float = 0.7  # Min confidence for a secondary agent
+    fanout_max_agents: int = 3
+    
+    # Worker pool for speculative and fan-out agent runs
+    agent_max_workers: int = 8
+    
+    # Fast path: canned replies for trivial intents (greetings, thanks) before the router
+    fast_path_enabled: bool = True
+    fast_path_max_words: int = 6
+    
+    # Sticky routing: short/anaphoric follow-ups reuse the previous turn's agent
+    sticky_routing_enabled: bool = True
+    sticky_max_words: int = 8  # Messages this short count as follow-ups
+    sticky_similarity_threshold: float = 0.5  # Share of topic words seen in the previous turn
+    
+    # Re-routing: reuse first-pass scores for the next best agent above this confidence
+    reroute_min_confidence: float = 0.5
+    
+    # Structured completion signal from agents (json_schema response format)
+    structured_completion: bool = True
+    
+    # Conversation Checkpoints (LangGraph SQLite checkpointer, keyed by conversation ID)
+    checkpoint_enabled: bool = True
+    checkpoint_db_path: str = "./data/database/checkpoints.db"
+    checkpoint_keep_last: int = 3  # Checkpoints kept per conversation
+    
     # Safety Configuration
     max_agent_iterations: int = 10
-    tool_timeout_seconds: int = 30
+    tool_timeout_seconds: int = 30  # Per LLM call, bounded by the request deadline
+    request_timeout_seconds: float = 60.0  # Overall budget for one workflow run
     
     # Database Configuration
     database_url: str | None = None  # Optional, defaults to SQLite
@@ -73,6 +73,7 @@ async def root():
             "conversations": "/api/conversations",
             "conversation_messages": "/api/conversations/{conversation_id}/messages",
             "state_example": "/api/state/example",
+            "metrics": "/api/metrics",
             "health": "/health"
         }
     }
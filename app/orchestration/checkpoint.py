@@ -0,0 +1,172 @@
+"""Conversation checkpoints for the LangGraph workflow
+
+The persistent workflow is compiled with a SQLite-backed checkpointer keyed
+by conversation ID (the LangGraph thread_id). A turn loads the last
+checkpoint and appends the new message instead of rebuilding the state from
+the message table, and a run interrupted by a crash can resume from the last
+completed node.
+
+Checkpoints are msgpack (zlib-compressed above a size threshold) and only
+the most recent few per conversation are kept.
+"""
+
+import logging
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.config.settings import settings
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite is optional
+    SqliteSaver = None
+
+logger = logging.getLogger(__name__)
+
+# State records stored in checkpoints (allowed for msgpack deserialization)
+STATE_RECORD_TYPES = [
+    ("app.orchestration.state", "Message"),
+    ("app.orchestration.state", "RoutingDecision"),
+    ("app.orchestration.state", "RetrievedDocument"),
+    ("app.orchestration.state", "IterationLog"),
+]
+
+# Payloads smaller than this are stored uncompressed
+COMPRESSION_THRESHOLD = 512
+
+_COMPRESSED_SUFFIX = "+zlib"
+
+
+class CompressedSerializer:
+    """Checkpoint serializer: msgpack via JsonPlusSerializer, plus zlib for large payloads."""
+
+    def __init__(self, threshold: int = COMPRESSION_THRESHOLD):
+        self.threshold = threshold
+        self.serde = JsonPlusSerializer(allowed_msgpack_modules=STATE_RECORD_TYPES)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.threshold:
+            return type_ + _COMPRESSED_SUFFIX, zlib.compress(data)
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(_COMPRESSED_SUFFIX):
+            type_ = type_[:-len(_COMPRESSED_SUFFIX)]
+            payload = zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+
+def thread_config(thread_id: str) -> dict:
+    """
+    Build the LangGraph config for a conversation thread.
+
+    Args:
+        thread_id: Conversation ID
+
+    Returns:
+        RunnableConfig selecting the thread's checkpoints
+    """
+    return {"configurable": {"thread_id": thread_id}}
+
+
+_checkpointer = None
+
+
+def get_checkpointer() -> Optional["SqliteSaver"]:
+    """
+    Get the singleton checkpointer instance.
+
+    Returns:
+        SqliteSaver, or None if checkpointing is disabled or
+        langgraph-checkpoint-sqlite is not installed
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        if not settings.checkpoint_enabled:
+            return None
+        if SqliteSaver is None:
+            logger.warning("langgraph-checkpoint-sqlite not installed; conversation checkpoints disabled")
+            return None
+
+        path = Path(settings.checkpoint_db_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        _checkpointer = SqliteSaver(conn, serde=CompressedSerializer())
+        _checkpointer.setup()
+    return _checkpointer
+
+
+def prune_checkpoints(checkpointer: "SqliteSaver", thread_id: str, keep: Optional[int] = None) -> int:
+    """
+    Delete all but the most recent checkpoints of a thread.
+
+    Checkpoint IDs are time-ordered, so the newest sort last.
+
+    Args:
+        checkpointer: Checkpointer to prune
+        thread_id: Conversation ID
+        keep: Checkpoints to keep (defaults to settings.checkpoint_keep_last)
+
+    Returns:
+        Number of checkpoints deleted
+    """
+    keep = keep if keep is not None else settings.checkpoint_keep_last
+
+    with checkpointer.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM checkpoints
+            WHERE thread_id = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM checkpoints
+                WHERE thread_id = ?
+                ORDER BY checkpoint_id DESC
+                LIMIT ?
+            )
+            """,
+            (thread_id, thread_id, keep),
+        )
+        deleted = cur.rowcount
+        cur.execute(
+            """
+            DELETE FROM writes
+            WHERE thread_id = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+            )
+            """,
+            (thread_id, thread_id),
+        )
+    return deleted
+
+
+def has_checkpoint(thread_id: str) -> bool:
+    """
+    Check whether a conversation has a stored checkpoint.
+
+    Args:
+        thread_id: Conversation ID
+
+    Returns:
+        True if the next turn can continue from a checkpoint
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return False
+    return checkpointer.get_tuple(thread_config(thread_id)) is not None
+
+
+def delete_checkpoints(thread_id: str) -> None:
+    """
+    Delete all checkpoints of a conversation.
+
+    Args:
+        thread_id: Conversation ID
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is not None:
+        checkpointer.delete_thread(thread_id)
@@ -0,0 +1,62 @@
+"""Multi-domain fan-out for the LangGraph workflow
+
+When the router reports secondary agents above a confidence threshold, the
+fan-out node runs all of them concurrently (each with its own RAG retrieval)
+and merges their answers, so wall time is the slowest branch instead of the
+sum of serial router + agent iterations.
+"""
+
+from app.agents.router import RouteResult
+from app.config.settings import settings
+from app.orchestration.state import Message
+
+
+def select_fanout_agents(decision: RouteResult) -> list[str]:
+    """
+    Choose the agents to run concurrently for a routing decision.
+
+    Args:
+        decision: Routing decision with secondary agents
+
+    Returns:
+        Primary agent followed by qualifying secondary agents, or an empty
+        list if the query should go to a single agent
+    """
+    if not settings.fanout_enabled:
+        return []
+
+    secondary = sorted(
+        (
+            agent for agent, confidence in decision.also.items()
+            if confidence >= settings.fanout_confidence_threshold and agent != decision.agent
+        ),
+        key=lambda agent: decision.also[agent],
+        reverse=True
+    )
+    if not secondary:
+        return []
+
+    return [decision.agent] + secondary[:settings.fanout_max_agents - 1]
+
+
+def merge_agent_responses(responses: list[Message]) -> str:
+    """
+    Combine branch answers into a single response.
+
+    Deliberately lightweight (no extra LLM call): each agent's answer becomes
+    a titled section, in routing order.
+
+    Args:
+        responses: Assistant messages from each branch, primary first
+
+    Returns:
+        Merged response text
+    """
+    if len(responses) == 1:
+        return responses[0].content
+
+    sections = [
+        f"**{(message.agent or 'general').title()}**\n\n{message.content.strip()}"
+        for message in responses
+    ]
+    return "\n\n---\n\n".join(sections)
@@ -0,0 +1,115 @@
+"""Trivial-intent fast path for the LangGraph workflow
+
+Greetings, thanks, acknowledgements and farewells ("hello", "thanks", "ok")
+do not need the router LLM, RAG retrieval or an agent completion. A small
+local classifier recognizes them before the router and a canned reply is
+returned in well under a millisecond; the turn is still logged and persisted
+like any other. An acknowledgement that answers the assistant's question or
+offer ("sure" after "Would you like a draft?") is a request, not small talk,
+and goes to the router.
+"""
+
+import re
+from typing import Optional
+
+from app.config.settings import settings
+from app.prompts.templates import FAST_PATH_RESPONSES
+from app.utils.metrics import metrics
+from app.utils.text import tokenize
+
+# Words that signal each intent
+INTENT_WORDS = {
+    "greeting": frozenset({"hi", "hello", "hey", "hiya", "howdy", "yo", "greetings", "morning", "afternoon", "evening"}),
+    "thanks": frozenset({"thanks", "thank", "thx", "ty", "cheers", "appreciate", "appreciated"}),
+    "acknowledgement": frozenset({"ok", "okay", "k", "cool", "great", "nice", "awesome", "perfect", "gotcha", "sure", "alright", "understood", "noted"}),
+    "farewell": frozenset({"bye", "goodbye", "cya", "later", "night"}),
+}
+
+# Words allowed around intent words without changing the meaning
+FILLER_WORDS = frozenset({
+    "a", "again", "all", "and", "for", "good", "got", "it", "lot", "much", "oh", "so",
+    "that's", "thats", "the", "there", "very", "you", "your", "help", "see", "ah", "wow",
+})
+
+# Checked in this order when several intents match ("thanks, bye" is a farewell)
+INTENT_PRIORITY = ("farewell", "thanks", "greeting", "acknowledgement")
+
+# Phrases that make the end of an assistant reply an offer awaiting an answer
+OFFER_PHRASES = (
+    "would you like", "do you want", "want me to", "shall i", "should i",
+    "i can also", "let me know if you'd like", "let me know if you want",
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def awaits_answer(reply: str) -> bool:
+    """
+    Check whether an assistant reply ends with a question or an offer.
+
+    Args:
+        reply: Previous assistant message
+
+    Returns:
+        True if the reply's last sentence asks the user something
+    """
+    sentences = _SENTENCE_END.split(reply.strip())
+    last = sentences[-1].lower() if sentences else ""
+    return last.endswith("?") or any(phrase in last for phrase in OFFER_PHRASES)
+
+
+def classify_intent(message: str) -> Optional[str]:
+    """
+    Classify a message as a trivial intent.
+
+    Only messages made up entirely of intent and filler words qualify, so
+    anything with actual content ("hi, can you review my code?") is left
+    to the router.
+
+    Args:
+        message: User message
+
+    Returns:
+        Intent name, or None if the message needs the full pipeline
+    """
+    tokens = tokenize(message)
+    if not tokens or len(tokens) > settings.fast_path_max_words:
+        return None
+
+    matched = set()
+    for token in tokens:
+        intents = [intent for intent, words in INTENT_WORDS.items() if token in words]
+        if intents:
+            matched.update(intents)
+        elif token not in FILLER_WORDS:
+            return None
+
+    for intent in INTENT_PRIORITY:
+        if intent in matched:
+            return intent
+    return None
+
+
+def fast_path_response(message: str, previous_reply: Optional[str] = None) -> Optional[tuple[str, str]]:
+    """
+    Get the canned reply for a trivial message.
+
+    Args:
+        message: User message
+        previous_reply: The assistant's previous message, if any
+
+    Returns:
+        Tuple of (intent, response), or None if the fast path does not apply
+    """
+    if not settings.fast_path_enabled:
+        return None
+
+    intent = classify_intent(message)
+    if intent is None:
+        return None
+    if intent == "acknowledgement" and previous_reply and awaits_answer(previous_reply):
+        # "Sure" accepts the offer; the agent has to act on it
+        return None
+
+    metrics.increment("fast_path.hits")
+    return intent, FAST_PATH_RESPONSES[intent]
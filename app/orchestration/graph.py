@@ -4,16 +4,101 @@ This module defines the StateGraph that orchestrates routing and execution
 of specialized agents using LangGraph's graph-based workflow system.
 """
 
-from typing import Literal
+import threading
+import time
+from typing import Literal, Optional
 from langgraph.graph import StateGraph, END
+from langgraph.types import Command
 
-from app.orchestration.state import AgentState, increment_iteration, update_routing
-from app.agents.router import router_agent_with_fallback
+from app.orchestration.state import AgentState, IterationLog, increment_iteration, update_routing
+from app.agents.router import RouteResult, next_best_agent, route_query_with_fallback
 from app.agents.general import general_agent
 from app.agents.professional import professional_agent
 from app.agents.communication import communication_agent
 from app.agents.knowledge import knowledge_agent
 from app.agents.decision import decision_agent
+from app.config.settings import settings
+from app.rag.namespaces import namespace_scope
+from app.utils.deadline import DeadlineExceeded, deadline_scope, expired, remaining
+from app.utils.memo import RequestMemo, memo_scope
+from app.utils.metrics import metrics
+from app.orchestration.checkpoint import get_checkpointer, prune_checkpoints, thread_config
+from app.orchestration.fanout import select_fanout_agents, merge_agent_responses
+from app.orchestration.fastpath import fast_path_response
+from app.orchestration.parallel import submit_agent
+from app.orchestration.sticky import previous_exchange, sticky_decision
+from app.orchestration.speculation import predict_agent, resolve_speculation
+
+
+# Phrases that used to trigger another iteration; now only used to count
+# the iterations saved by the structured completion signal
+CONTINUATION_KEYWORDS = (
+    "let me", "i'll also", "additionally", "furthermore",
+    "i can also", "would you like", "shall i",
+)
+
+# Specialized agent nodes by name
+AGENT_FUNCTIONS = {
+    "general": general_agent,
+    "professional": professional_agent,
+    "communication": communication_agent,
+    "knowledge": knowledge_agent,
+    "decision": decision_agent,
+}
+
+
+def fast_path_node(state: AgentState) -> AgentState:
+    """
+    Fast-path node - answers trivial intents before the router.
+    
+    Greetings, thanks and similar messages get a canned reply without any
+    LLM or vector store call; for everything else the node only records
+    whether the turn sticks to the previous agent (state["sticky_route"]).
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Updated state with final_response set if the fast path applied
+    """
+    from app.orchestration.state import Message, RoutingDecision
+    from datetime import datetime
+    
+    exchange = previous_exchange(state["messages"])
+    reply = fast_path_response(
+        state.get("user_query") or state["messages"][-1].content,
+        previous_reply=exchange[1].content if exchange else None
+    )
+    if reply is None:
+        # Decide stickiness once per turn; the (speculative) router reads it
+        sticky = sticky_decision(state)
+        state["sticky_route"] = RoutingDecision(
+            target_agent=sticky.agent, confidence=sticky.confidence, reasoning=sticky.reasoning
+        ) if sticky else None
+        return state
+    
+    intent, response = reply
+    state = update_routing(state, "general", 1.0, f"Fast path: {intent}")
+    state["messages"] = state["messages"] + [
+        Message(role="assistant", content=response, agent="general", timestamp=datetime.now())
+    ]
+    state["current_agent"] = "general"
+    state["final_response"] = response
+    
+    return record_agent_execution(state, "fast_path", action=f"Answered {intent} from template")
+
+
+def after_fast_path(state: AgentState) -> Literal["router", "end"]:
+    """
+    Conditional edge after the fast path: end if it answered, else route.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        "end" if the fast path produced the response, "router" otherwise
+    """
+    return "end" if state.get("final_response") else "router"
 
 
 def router_node(state: AgentState) -> AgentState:
@@ -31,11 +116,23 @@ def router_node(state: AgentState) -> AgentState:
     from app.orchestration.state import IterationLog
     from datetime import datetime
     
-    # Get latest user message
-    latest_message = state["messages"][-1].content
+    if state["iterations"] == 0:
+        # Follow-ups stick to the previous turn's agent; otherwise route the
+        # user's query using LLM with fallback
+        sticky = state.get("sticky_route")
+        if sticky is not None:
+            decision = RouteResult(sticky.target_agent, sticky.confidence, sticky.reasoning)
+        else:
+            metrics.increment("routing.llm_routed")
+            decision = route_query_with_fallback(state.get("user_query") or state["messages"][-1].content)
+        state["routing_scores"] = decision.scores()
+    else:
+        # Follow-up pass: re-route from the query, skipping exhausted agents
+        decision = reroute(state)
+    agent_name, confidence, reasoning = decision.as_tuple()
     
-    # Route using LLM with fallback
-    agent_name, confidence, reasoning = router_agent_with_fallback(latest_message)
+    # Multi-domain queries fan out to several agents concurrently
+    state["fanout_agents"] = select_fanout_agents(decision)
     
     # Log this routing decision (only once per iteration)
     current_iter = state["iterations"] + 1
@@ -45,10 +142,14 @@ def router_node(state: AgentState) -> AgentState:
         for log in state["iteration_log"]
     )
     if not already_logged:
+        if state["fanout_agents"]:
+            action = f"Fanned out to {', '.join(state['fanout_agents'])}"
+        else:
+            action = f"Routed to {agent_name}"
         log_entry = IterationLog(
             iteration=current_iter,
             agent="router",
-            action=f"Routed to {agent_name}",
+            action=action,
             confidence=confidence,
             reasoning=reasoning,
             timestamp=datetime.now()
@@ -64,6 +165,217 @@ def router_node(state: AgentState) -> AgentState:
     return state
 
 
+def exhausted_agents(state: AgentState) -> list[str]:
+    """
+    Get the agents that already answered this turn and have nothing to add.
+    
+    An agent that asked for a follow-up stays eligible.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Agent names to exclude when re-routing
+    """
+    tried = state.get("tried_agents") or []
+    if not state.get("agent_done", True):
+        return [agent for agent in tried if agent != state["current_agent"]]
+    return list(tried)
+
+
+def reroute(state: AgentState) -> RouteResult:
+    """
+    Routing decision for a follow-up iteration.
+    
+    Routes from the turn's user query (by now the latest message is the
+    previous agent's answer) plus the agents already tried. Without a
+    follow-up request the first pass's scores are reused, so the next best
+    untried agent is chosen without another LLM call.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        RouteResult that never targets an exhausted agent (unless every
+        agent is exhausted and the fallback lands on one)
+    """
+    query = state.get("user_query") or state["messages"][-1].content
+    exhausted = exhausted_agents(state)
+    follow_up = state.get("follow_up")
+    
+    if not follow_up:
+        best = next_best_agent(state.get("routing_scores") or {}, exhausted)
+        if best is not None and best[1] >= settings.reroute_min_confidence:
+            metrics.increment("routing.reroute_reused")
+            return RouteResult(best[0], best[1], "Reused first-pass scores: next best untried agent")
+    
+    metrics.increment("routing.reroute_llm")
+    message = f"{query}\nFollow-up: {follow_up}" if follow_up else query
+    decision = route_query_with_fallback(message, exclude=exhausted)
+    decision.also = {agent: score for agent, score in decision.also.items() if agent not in exhausted}
+    return decision
+
+
+def speculative_router_node(state: AgentState) -> AgentState:
+    """
+    Router node that speculatively runs the predicted agent in parallel.
+    
+    On the first iteration the keyword router predicts the target agent and
+    that agent (retrieval + generation) starts in the background while the
+    LLM router decides. If both agree the speculative response is committed
+    by the speculative_commit node and the agent node is skipped; otherwise
+    the speculative run is cancelled (stopping before its LLM call if it has
+    not reached it yet) and the routed agent runs.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Updated state with routing decision (and speculative response on a hit)
+    """
+    from app.orchestration.state import IterationLog
+    from datetime import datetime
+    
+    # Speculate only on the first pass of a turn that is not sticky;
+    # re-routing depends on prior output
+    if state["iterations"] > 0 or state.get("sticky_route") is not None:
+        return router_node(state)
+    
+    predicted = predict_agent(state["messages"][-1].content)
+    cancel_event = threading.Event()
+    future = submit_agent(state, AGENT_FUNCTIONS[predicted], cancel_event)
+    
+    state = router_node(state)
+    
+    # A fan-out decision is never a single-agent hit
+    target = None if state["fanout_agents"] else state["routing_history"][-1].target_agent
+    result = resolve_speculation(
+        future, predicted, target, timeout=remaining(state.get("deadline")), cancel_event=cancel_event
+    )
+    if result is not None:
+        # Carried to speculative_commit along with the agent's completion signal
+        state["speculative_response"] = result["messages"][-1]
+        state["agent_done"] = result.get("agent_done", True)
+        state["follow_up"] = result.get("follow_up")
+    else:
+        state["speculative_response"] = None
+        state["iteration_log"].append(IterationLog(
+            iteration=state["iterations"] + 1,
+            agent="router",
+            action="Speculation miss",
+            confidence=state["routing_confidence"],
+            reasoning=f"Predicted {predicted}, router chose {target or 'fan-out'}",
+            timestamp=datetime.now()
+        ))
+    
+    return state
+
+
+def speculative_commit_node(state: AgentState) -> AgentState:
+    """
+    Commit the speculative agent response produced alongside the router.
+    
+    Args:
+        state: Current agent state with speculative_response (and the
+               speculative run's agent_done / follow_up) set
+        
+    Returns:
+        Updated state as if the routed agent node had run
+    """
+    message = state["speculative_response"]
+    
+    # agent_done and follow_up were taken from the speculative run
+    state["messages"] = state["messages"] + [message]
+    state["current_agent"] = message.agent
+    state["speculative_response"] = None
+    
+    return record_agent_execution(state, message.agent, action="Committed speculative response")
+
+
+def fanout_node(state: AgentState) -> AgentState:
+    """
+    Fan-out node - runs several specialized agents concurrently and merges.
+    
+    Each branch runs its agent (including its own RAG retrieval) on a private
+    copy of the state; the answers are combined by merge_agent_responses.
+    
+    Args:
+        state: Current agent state with fanout_agents set
+        
+    Returns:
+        Updated state with the merged response
+    """
+    from app.orchestration.state import IterationLog, Message
+    from datetime import datetime
+    
+    agents = state["fanout_agents"]
+    if expired(state.get("deadline")):
+        state["fanout_agents"] = []
+        return stop_on_deadline(state, "fanout", DeadlineExceeded("Request deadline exceeded before fan-out"))
+    
+    futures = {name: submit_agent(state, AGENT_FUNCTIONS[name]) for name in agents}
+    
+    responses = []
+    follow_ups = []
+    errors = []
+    for name, future in futures.items():
+        try:
+            # Branches still running at the deadline are abandoned
+            result = future.result(timeout=remaining(state.get("deadline")))
+        except Exception as e:
+            errors.append(e)
+            state["iteration_log"].append(IterationLog(
+                iteration=state["iterations"] + 1,
+                agent=name,
+                action="Fan-out branch failed",
+                confidence=state["routing_confidence"],
+                reasoning=str(e),
+                timestamp=datetime.now()
+            ))
+            continue
+        
+        message = result["messages"][-1] if result["messages"] else None
+        if message is None or message.role != "assistant":
+            continue
+        responses.append(message)
+        if not result.get("agent_done", True):
+            follow_ups.append(result.get("follow_up") or f"{name} agent reported more work")
+        state["iteration_log"].append(IterationLog(
+            iteration=state["iterations"] + 1,
+            agent=name,
+            action="Fan-out branch response",
+            confidence=state["routing_confidence"],
+            reasoning=f"Response: {message.content[:100]}...",
+            timestamp=datetime.now()
+        ))
+    
+    if not responses:
+        if expired(state.get("deadline")):
+            state["fanout_agents"] = []
+            return stop_on_deadline(state, "fanout", errors[0] if errors else DeadlineExceeded())
+        if errors:
+            raise errors[0]
+        raise RuntimeError("No fan-out branch produced a response")
+    
+    metrics.increment("fanout.requests")
+    metrics.increment("fanout.branches", len(responses))
+    
+    merged = Message(
+        role="assistant",
+        content=merge_agent_responses(responses),
+        agent=agents[0],
+        timestamp=datetime.now().isoformat()
+    )
+    state["messages"] = state["messages"] + [merged]
+    state["current_agent"] = agents[0]
+    state["fanout_agents"] = []
+    state["tried_agents"] = (state.get("tried_agents") or []) + agents
+    state["agent_done"] = not follow_ups
+    state["follow_up"] = "; ".join(follow_ups) or None
+    
+    return record_agent_execution(state, "fanout", action=f"Merged {len(responses)} agent responses")
+
+
 def route_to_agent(state: AgentState) -> str:
     """
     Conditional edge function that determines which agent node to call next.
@@ -76,6 +388,14 @@ def route_to_agent(state: AgentState) -> str:
     Returns:
         Name of the next agent node
     """
+    # A committed speculative response skips the agent node entirely
+    if state.get("speculative_response") is not None:
+        return "speculative"
+    
+    # Multi-domain queries run several agents concurrently
+    if state.get("fanout_agents"):
+        return "fanout"
+    
     # Get the latest routing decision
     if state["routing_history"]:
         target_agent = state["routing_history"][-1].target_agent
@@ -94,8 +414,10 @@ def should_continue(state: AgentState) -> Literal["continue", "end"]:
     
     Checks:
     - Max iterations reached
+    - Remaining request deadline budget
     - should_continue flag
     - Agent confidence threshold
+    - Structured completion signal (agent_done / follow_up) from the agent
     
     Args:
         state: Current agent state
@@ -119,6 +441,23 @@ def should_continue(state: AgentState) -> Literal["continue", "end"]:
         state["iteration_log"].append(log_entry)
         return "end"
     
+    # Check the remaining request budget can fit another iteration
+    budget = remaining(state.get("deadline"))
+    if budget is not None and state["iterations"] > 0 and state.get("started_at"):
+        elapsed = (datetime.now() - state["started_at"]).total_seconds()
+        per_iteration = elapsed / state["iterations"]
+        if budget < per_iteration:
+            log_entry = IterationLog(
+                iteration=state["iterations"],
+                agent="workflow",
+                action="Stopped: Deadline budget exhausted",
+                confidence=0.0,
+                reasoning=f"{budget:.1f}s left, iterations take ~{per_iteration:.1f}s",
+                timestamp=datetime.now()
+            )
+            state["iteration_log"].append(log_entry)
+            return "end"
+    
     # Check should_continue flag
     if not state["should_continue"]:
         log_entry = IterationLog(
@@ -153,24 +492,25 @@ def should_continue(state: AgentState) -> Literal["continue", "end"]:
     
     # Allow up to 3 iterations for complex queries
     if state["iterations"] < 3:
-        # Check if the last message suggests more work needed
-        if state["messages"]:
+        # Continue only if the agent reported that more work is needed
+        if not state.get("agent_done", True):
+            metrics.increment("completion.follow_ups")
+            log_entry = IterationLog(
+                iteration=state["iterations"],
+                agent="workflow",
+                action="Continuing: Agent signaled more work",
+                confidence=0.0,
+                reasoning=state.get("follow_up") or "Agent reported the answer is incomplete",
+                timestamp=datetime.now()
+            )
+            state["iteration_log"].append(log_entry)
+            return "continue"
+        
+        # Count iterations the old keyword heuristic would have added
+        if state["messages"] and state["messages"][-1].role == "assistant":
             last_message = state["messages"][-1].content.lower()
-            # Continue if agent is asking questions or needs clarification
-            if any(indicator in last_message for indicator in [
-                "let me", "i'll also", "additionally", "furthermore",
-                "i can also", "would you like", "shall i"
-            ]):
-                log_entry = IterationLog(
-                    iteration=state["iterations"],
-                    agent="workflow",
-                    action="Continuing: Agent signaled more work",
-                    confidence=0.0,
-                    reasoning="Detected continuation keywords in response",
-                    timestamp=datetime.now()
-                )
-                state["iteration_log"].append(log_entry)
-                return "continue"
+            if any(indicator in last_message for indicator in CONTINUATION_KEYWORDS):
+                metrics.increment("completion.iterations_saved")
     
     # Default: end after processing
     log_entry = IterationLog(
@@ -196,60 +536,149 @@ def agent_wrapper(agent_func):
         Wrapped agent function
     """
     def wrapped(state: AgentState) -> AgentState:
-        from app.orchestration.state import IterationLog, increment_iteration
-        from datetime import datetime
-        
         agent_name = agent_func.__name__.replace('_agent', '')
+        deadline = state.get("deadline")
         
-        # Execute the agent
-        state = agent_func(state)
+        # Execute the agent within the request deadline
+        try:
+            if deadline is not None:
+                with deadline_scope(deadline):
+                    state = agent_func(state)
+            else:
+                state = agent_func(state)
+        except Exception as e:
+            if not (isinstance(e, DeadlineExceeded) or expired(deadline)):
+                raise
+            return stop_on_deadline(state, agent_name, e)
         
-        # Log agent execution
-        response_preview = state["messages"][-1].content[:100] if state["messages"] else "No response"
-        log_entry = IterationLog(
-            iteration=state["iterations"] + 1,
-            agent=agent_name,
-            action="Generated response",
-            confidence=state["routing_confidence"],
-            reasoning=f"Response: {response_preview}...",
-            timestamp=datetime.now()
-        )
-        state["iteration_log"].append(log_entry)
+        return record_agent_execution(state, agent_name)
+    
+    return wrapped
+
+
+def stop_on_deadline(state: AgentState, agent_name: str, error: Exception) -> AgentState:
+    """
+    End the workflow after the request deadline expired mid-node.
+    
+    The best response produced so far (if any) stays the last message.
+    
+    Args:
+        state: Current agent state
+        agent_name: Node that was interrupted
+        error: The timeout error
         
-        # Increment iteration counter
-        state = increment_iteration(state)
+    Returns:
+        Updated state with should_continue=False
+    """
+    from app.orchestration.state import IterationLog
+    from datetime import datetime
+    
+    metrics.increment("deadline.expired")
+    
+    state["iteration_log"].append(IterationLog(
+        iteration=state["iterations"] + 1,
+        agent=agent_name,
+        action="Stopped: Deadline exceeded",
+        confidence=state["routing_confidence"],
+        reasoning=str(error),
+        timestamp=datetime.now()
+    ))
+    state["should_continue"] = False
+    state["error"] = f"Request deadline exceeded during {agent_name}"
+    
+    return state
+
+
+def record_agent_execution(
+    state: AgentState,
+    agent_name: str,
+    action: str = "Generated response"
+) -> AgentState:
+    """
+    Log an agent execution and increment the iteration counter.
+    
+    Args:
+        state: State after the agent produced its response
+        agent_name: Name of the agent that executed
+        action: Description for the iteration log
         
-        return state
+    Returns:
+        Updated state
+    """
+    from datetime import datetime
     
-    return wrapped
+    # Log agent execution
+    response_preview = state["messages"][-1].content[:100] if state["messages"] else "No response"
+    log_entry = IterationLog(
+        iteration=state["iterations"] + 1,
+        agent=agent_name,
+        action=action,
+        confidence=state["routing_confidence"],
+        reasoning=f"Response: {response_preview}...",
+        timestamp=datetime.now()
+    )
+    state["iteration_log"].append(log_entry)
+    
+    if agent_name in AGENT_FUNCTIONS:
+        state["tried_agents"] = (state.get("tried_agents") or []) + [agent_name]
+    
+    # Increment iteration counter
+    return increment_iteration(state)
 
 
-def create_workflow() -> StateGraph:
+def create_workflow(speculative: bool | None = None, checkpointer=None) -> StateGraph:
     """
     Create and configure the LangGraph workflow.
     
     Graph structure:
-        START → router → [5 agents] → should_continue → END
-                  ↑                           ↓
-                  └───────────────────────────┘
-                         (loop for multi-turn)
+        START → fast_path → router → [5 agents] → should_continue → END
+                    ↓          ↑                           ↓
+                   END         └───────────────────────────┘
+                                      (loop for multi-turn)
+    
+    Trivial intents (greetings, thanks) are answered by the fast_path node
+    without reaching the router.
+    
+    Multi-domain queries go through the fanout node, which runs several
+    agents concurrently and merges their answers.
+    
+    In speculative mode the router also starts the keyword-predicted agent
+    concurrently; a hit goes through the speculative_commit node instead
+    of the agent node.
+    
+    Args:
+        speculative: Enable speculative execution (defaults to
+                     settings.speculative_execution)
+        checkpointer: Optional LangGraph checkpointer (runs then need a
+                      thread_id in their config)
     
     Returns:
         Compiled StateGraph ready for execution
     """
+    if speculative is None:
+        speculative = settings.speculative_execution
+    
     # Create the graph
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("router", router_node)
-    workflow.add_node("general", agent_wrapper(general_agent))
-    workflow.add_node("professional", agent_wrapper(professional_agent))
-    workflow.add_node("communication", agent_wrapper(communication_agent))
-    workflow.add_node("knowledge", agent_wrapper(knowledge_agent))
-    workflow.add_node("decision", agent_wrapper(decision_agent))
+    workflow.add_node("fast_path", fast_path_node)
+    workflow.add_node("router", speculative_router_node if speculative else router_node)
+    workflow.add_node("speculative", speculative_commit_node)
+    workflow.add_node("fanout", fanout_node)
+    for agent_name, agent_func in AGENT_FUNCTIONS.items():
+        workflow.add_node(agent_name, agent_wrapper(agent_func))
     
-    # Set entry point
-    workflow.set_entry_point("router")
+    # Set entry point (trivial intents end right after the fast path)
+    workflow.set_entry_point("fast_path")
+    workflow.add_conditional_edges(
+        "fast_path",
+        after_fast_path,
+        {
+            "router": "router",
+            "end": END
+        }
+    )
     
     # Add conditional edges from router to agents
     workflow.add_conditional_edges(
@@ -261,11 +690,13 @@ def create_workflow() -> StateGraph:
             "communication": "communication",
             "knowledge": "knowledge",
             "decision": "decision",
+            "speculative": "speculative",
+            "fanout": "fanout",
         }
     )
     
     # Add conditional edges from agents back to router or end
-    for agent_name in ["general", "professional", "communication", "knowledge", "decision"]:
+    for agent_name in [*AGENT_FUNCTIONS, "speculative", "fanout"]:
         workflow.add_conditional_edges(
             agent_name,
             should_continue,
@@ -276,21 +707,104 @@ def create_workflow() -> StateGraph:
         )
     
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 
 # Create the compiled workflow (singleton)
 workflow_app = create_workflow()
 
+_persistent_app = None
 
-def run_workflow(state: AgentState) -> AgentState:
+
+def get_persistent_workflow():
+    """
+    Get the singleton workflow compiled with the conversation checkpointer.
+    
+    Returns:
+        Compiled workflow, or None if checkpoints are unavailable
+    """
+    global _persistent_app
+    if _persistent_app is None:
+        checkpointer = get_checkpointer()
+        if checkpointer is None:
+            return None
+        _persistent_app = create_workflow(checkpointer=checkpointer)
+    return _persistent_app
+
+
+def run_workflow(state: AgentState, thread_id: Optional[str] = None) -> AgentState:
     """
     Execute the workflow with the given initial state.
     
+    The run is bounded by state["deadline"] (defaulting to
+    settings.request_timeout_seconds from now), which is also published
+    to LLM, embedding and vector store calls through a contextvar.
+    Identical embedding, retrieval and routing calls are deduplicated by a
+    request memo for the duration of the run; the savings are logged in
+    the iteration log. Vector store calls use state["user_id"]'s namespace
+    (when per-user namespaces are enabled).
+    
+    With a thread_id (conversation ID) the run is checkpointed: the new
+    message is appended to the conversation's checkpointed messages, and
+    retrying a turn that was interrupted mid-workflow resumes it from the
+    last completed node.
+    
     Args:
         state: Initial agent state
+        thread_id: Optional conversation ID to checkpoint under
         
     Returns:
         Final state after workflow execution
     """
-    return workflow_app.invoke(state)
+    if state.get("deadline") is None:
+        state["deadline"] = time.time() + settings.request_timeout_seconds
+    
+    persistent_app = get_persistent_workflow() if thread_id else None
+    
+    with deadline_scope(state["deadline"]), memo_scope() as memo, namespace_scope(state.get("user_id")):
+        if persistent_app is None:
+            return record_memo(workflow_app.invoke(state), memo)
+        
+        config = thread_config(thread_id)
+        snapshot = persistent_app.get_state(config)
+        if snapshot.next and snapshot.values.get("user_query") == state["user_query"]:
+            # Retry of an interrupted turn: resume with the new deadline
+            metrics.increment("checkpoint.resumed")
+            final_state = persistent_app.invoke(Command(update={"deadline": state["deadline"]}), config)
+        else:
+            # New turn: continue the stored conversation; the per-turn
+            # routing history and iteration log start empty
+            if snapshot.values:
+                state["messages"] = snapshot.values.get("messages", []) + state["messages"]
+            final_state = persistent_app.invoke(state, config)
+    
+    prune_checkpoints(persistent_app.checkpointer, thread_id)
+    return record_memo(final_state, memo)
+
+
+def record_memo(state: AgentState, memo: RequestMemo) -> AgentState:
+    """
+    Log how many embedding, retrieval and routing calls the request memo saved.
+    
+    Args:
+        state: Final agent state
+        memo: The run's request memo
+        
+    Returns:
+        State with a workflow iteration log entry (if any call was memoized)
+    """
+    from app.orchestration.state import IterationLog
+    from datetime import datetime
+    
+    if not memo.calls and not memo.hits:
+        return state
+    
+    state["iteration_log"].append(IterationLog(
+        iteration=state["iterations"],
+        agent="workflow",
+        action=f"Memo: {sum(memo.hits.values())} duplicate calls skipped",
+        confidence=0.0,
+        reasoning=memo.summary(),
+        timestamp=datetime.now()
+    ))
+    return state
@@ -0,0 +1,52 @@
+"""Background execution of agents for the LangGraph workflow
+
+Shared worker pool used by speculative execution and multi-agent fan-out.
+Agents run on private copies of the state so concurrent runs never see
+each other's (or the graph's) in-place list mutations.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.config.settings import settings
+from app.orchestration.state import AgentState
+from app.utils.deadline import cancel_scope
+
+# Shared pool for background agent runs
+_executor = ThreadPoolExecutor(
+    max_workers=settings.agent_max_workers,
+    thread_name_prefix="agent-worker"
+)
+
+
+def submit_agent(
+    state: AgentState,
+    agent_func: Callable[[AgentState], AgentState],
+    cancel_event: Optional[threading.Event] = None
+) -> Future:
+    """
+    Run an agent on a private copy of the state in the background.
+
+    Args:
+        state: Current agent state (not modified)
+        agent_func: Agent function to run
+        cancel_event: Once set, the run stops at its next deadline check
+                      (e.g. between retrieval and the LLM call)
+
+    Returns:
+        Future resolving to the agent's output state
+    """
+    private_state = dict(state)
+    for key in ("messages", "routing_history", "iteration_log"):
+        private_state[key] = list(state.get(key) or [])
+
+    # Carry request-scoped context (deadlines, memoization) into the worker
+    context = contextvars.copy_context()
+    return _executor.submit(context.run, _run_cancellable, agent_func, private_state, cancel_event)
+
+
+def _run_cancellable(agent_func, state: AgentState, cancel_event: Optional[threading.Event]) -> AgentState:
+    with cancel_scope(cancel_event):
+        return agent_func(state)
@@ -0,0 +1,121 @@
+"""Speculative agent execution for the LangGraph workflow
+
+The keyword router predicts the target agent in microseconds, so the
+predicted agent (including its RAG retrieval) can start generating while
+the LLM router is still deciding. If the router agrees, the speculative
+response is committed and the router round trip disappears from the
+critical path; otherwise it is discarded and the routed agent runs normally.
+
+A discarded run is stopped through its cancel event at its next deadline
+check, so a miss decided during retrieval never reaches the LLM call. A
+run that had already called the LLM is counted in speculation.wasted_calls.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from app.agents.router import _keyword_fallback
+from app.orchestration.state import AgentState
+from app.utils.deadline import RunCancelled
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def predict_agent(message: str) -> str:
+    """
+    Predict the target agent locally, without an LLM call.
+
+    Args:
+        message: User message to route
+
+    Returns:
+        Predicted agent name
+    """
+    agent, _, _ = _keyword_fallback(message)
+    return agent
+
+
+def resolve_speculation(
+    future: Future,
+    predicted: str,
+    target: Optional[str],
+    timeout: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> Optional[AgentState]:
+    """
+    Commit or discard a speculative run once the router has decided.
+
+    Args:
+        future: Future returned by submit_agent
+        predicted: Agent that was run speculatively
+        target: Agent chosen by the router (None if no single agent was chosen)
+        timeout: Max seconds to wait for the speculative run
+        cancel_event: Cancel event the run was submitted with
+
+    Returns:
+        The speculative run's final state (ending with its assistant
+        message) on a hit, None on a miss
+    """
+    metrics.increment("speculation.attempts")
+
+    if predicted != target:
+        metrics.increment("speculation.misses")
+        discard(future, cancel_event)
+        return None
+
+    try:
+        result = future.result(timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Speculative {predicted} agent failed: {e}")
+        metrics.increment("speculation.errors")
+        discard(future, cancel_event)
+        return None
+
+    messages = result.get("messages") or []
+    if not messages or messages[-1].role != "assistant":
+        metrics.increment("speculation.errors")
+        return None
+
+    metrics.increment("speculation.hits")
+    return result
+
+
+def discard(future: Future, cancel_event: Optional[threading.Event] = None):
+    """
+    Stop a speculative run whose result will not be used.
+
+    A run that has not started is dropped; a running one stops at its next
+    deadline check. Runs that finish anyway made LLM calls for nothing and
+    are counted in speculation.wasted_calls.
+
+    Args:
+        future: Future returned by submit_agent
+        cancel_event: Cancel event the run was submitted with
+    """
+    if cancel_event is not None:
+        cancel_event.set()
+    if future.cancel():
+        metrics.increment("speculation.cancelled")
+        return
+
+    def record(done: Future):
+        error = done.exception()
+        if isinstance(error, RunCancelled):
+            metrics.increment("speculation.cancelled")
+        elif error is None:
+            metrics.increment("speculation.wasted_calls")
+
+    future.add_done_callback(record)
+
+
+def speculation_hit_rate() -> float | None:
+    """
+    Get the fraction of speculative runs that were committed.
+
+    Returns:
+        Hit rate, or None if no speculation has happened yet
+    """
+    return metrics.ratio("speculation.hits", "speculation.attempts")
@@ -5,70 +5,115 @@ The state is shared between agents and maintains conversation history, routing
 information, and retrieved context.
 """
 
-from typing import TypedDict, Annotated, Optional
-from operator import add
+from dataclasses import dataclass, field
+from typing import TypedDict, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field
 
 
-class Message(BaseModel):
-    """Message model for conversation history"""
-    role: str = Field(..., description="Role: 'user', 'assistant', or 'system'")
-    content: str = Field(..., description="Message content")
-    timestamp: datetime = Field(default_factory=datetime.now)
-    agent: Optional[str] = Field(None, description="Agent that generated this message")
+# State records are plain slotted dataclasses: hundreds are built per request
+# (history conversion, log entries in every node), so they skip Pydantic
+# validation. Pydantic models for the API live in app/api/models.py.
 
 
-class RoutingDecision(BaseModel):
+def _coerce_timestamp(value: datetime | str) -> datetime:
+    """Accept ISO 8601 strings for timestamps (e.g. from persisted history)."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class _Record:
+    """Base class for compact state records."""
+    __slots__ = ()
+    
+    def to_dict(self) -> dict:
+        """Serialize to a plain dict (shallow, no validation)."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass(slots=True)
+class Message(_Record):
+    """Message record for conversation history"""
+    role: str  # 'user', 'assistant', or 'system'
+    content: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    agent: Optional[str] = None  # Agent that generated this message
+    
+    def __post_init__(self):
+        if type(self.timestamp) is not datetime:
+            self.timestamp = _coerce_timestamp(self.timestamp)
+
+
+@dataclass(slots=True)
+class RoutingDecision(_Record):
     """Routing decision metadata"""
-    target_agent: str = Field(..., description="Agent to route to")
-    confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score (0-1)")
-    reasoning: Optional[str] = Field(None, description="Why this agent was selected")
-    timestamp: datetime = Field(default_factory=datetime.now)
+    target_agent: str
+    confidence: float  # Confidence score (0-1)
+    reasoning: Optional[str] = None  # Why this agent was selected
+    timestamp: datetime = field(default_factory=datetime.now)
+    
+    def __post_init__(self):
+        if not 0.0 <= self.confidence <= 1.0:
+            raise ValueError(f"confidence must be between 0 and 1, got {self.confidence}")
+        if type(self.timestamp) is not datetime:
+            self.timestamp = _coerce_timestamp(self.timestamp)
 
 
-class RetrievedDocument(BaseModel):
+@dataclass(slots=True)
+class RetrievedDocument(_Record):
     """Document retrieved from vector store"""
-    content: str = Field(..., description="Document content")
-    source: str = Field(..., description="Document source")
-    score: float = Field(..., description="Relevance score")
-    agent_domain: str = Field(..., description="Which agent's domain (professional, communication, etc)")
+    content: str
+    source: str
+    score: float  # Relevance score
+    agent_domain: str  # Which agent's domain (professional, communication, etc)
 
 
-class IterationLog(BaseModel):
+@dataclass(slots=True)
+class IterationLog(_Record):
     """Log entry for each iteration"""
-    iteration: int = Field(..., description="Iteration number")
-    agent: str = Field(..., description="Agent that executed")
-    action: str = Field(..., description="What happened in this iteration")
-    confidence: float = Field(..., description="Routing confidence")
-    reasoning: Optional[str] = Field(None, description="Why this happened")
-    timestamp: datetime = Field(default_factory=datetime.now)
+    iteration: int
+    agent: str  # Agent that executed
+    action: str  # What happened in this iteration
+    confidence: float  # Routing confidence
+    reasoning: Optional[str] = None  # Why this happened
+    timestamp: datetime = field(default_factory=datetime.now)
+    
+    def __post_init__(self):
+        if type(self.timestamp) is not datetime:
+            self.timestamp = _coerce_timestamp(self.timestamp)
 
 
 class AgentState(TypedDict):
     """
     Central state object shared across all agents in the graph.
     
-    Uses Annotated with reducers to control how state is updated:
-    - add: Accumulates items into a list
-    - replace (default): Overwrites the previous value
+    Every channel is replaced by a node's update. Nodes return the full
+    state, so the accumulated lists (messages, routing_history,
+    iteration_log) are extended by the node itself; routing_history and
+    iteration_log cover one turn and start empty in every graph input.
     """
     
     # Conversation History (accumulated)
-    messages: Annotated[list[Message], add]
+    messages: list[Message]
     
     # Routing Information (replaced)
     current_agent: str  # Current executing agent
     next_agent: Optional[str]  # Next agent to route to
-    routing_history: Annotated[list[RoutingDecision], add]  # History of routing decisions
+    routing_history: list[RoutingDecision]  # Routing decisions of this turn
     routing_confidence: float  # Confidence of current routing decision
+    speculative_response: Optional[Message]  # Committed speculative agent output
+    fanout_agents: list[str]  # Agents to run concurrently for multi-domain queries
+    routing_scores: dict[str, float]  # First-pass confidence per agent, reused when re-routing
+    tried_agents: list[str]  # Agents that already answered this turn
+    sticky_route: Optional[RoutingDecision]  # Follow-up stuck to the previous agent (decided once per turn)
     
     # Iteration Tracking (accumulated)
-    iteration_log: Annotated[list[IterationLog], add]  # What happened in each iteration
+    iteration_log: list[IterationLog]  # What happened in each iteration of this turn
     
     # Retrieved Context (replaced per query)
     retrieved_docs: list[RetrievedDocument]  # Documents from RAG
     rag_query: Optional[str]  # Query used for retrieval
+    query_embedding: Optional[list[float]]  # Embedding of user_query, reused across iterations
     
     # User Context (replaced)
     user_id: Optional[str]  # User identifier
@@ -79,6 +124,9 @@ class AgentState(TypedDict):
     iterations: int  # Current iteration count
     max_iterations: int  # Maximum allowed iterations
     should_continue: bool  # Whether to continue or end
+    agent_done: bool  # Latest agent reported its answer as complete
+    follow_up: Optional[str]  # What the next iteration should do (if not done)
+    deadline: Optional[float]  # Absolute request deadline (time.time() based)
     
     # Final Output (replaced)
     final_response: Optional[str]  # Final response to user
@@ -93,7 +141,8 @@ def create_initial_state(
     user_query: str,
     user_id: Optional[str] = None,
     session_id: Optional[str] = None,
-    max_iterations: int = 5
+    max_iterations: int = 5,
+    deadline: Optional[float] = None
 ) -> AgentState:
     """
     Create initial state for a new conversation turn.
@@ -103,6 +152,8 @@ def create_initial_state(
         user_id: Optional user identifier
         session_id: Optional session identifier (generated if not provided)
         max_iterations: Maximum iterations allowed
+        deadline: Optional absolute deadline (run_workflow applies the
+                  configured request timeout if not set)
         
     Returns:
         AgentState: Initial state object
@@ -118,6 +169,11 @@ def create_initial_state(
         next_agent=None,
         routing_history=[],
         routing_confidence=0.0,
+        speculative_response=None,
+        fanout_agents=[],
+        routing_scores={},
+        tried_agents=[],
+        sticky_route=None,
         
         # Iteration tracking
         iteration_log=[],
@@ -125,6 +181,7 @@ def create_initial_state(
         # RAG
         retrieved_docs=[],
         rag_query=None,
+        query_embedding=None,
         
         # User Context
         user_id=user_id,
@@ -135,6 +192,9 @@ def create_initial_state(
         iterations=0,
         max_iterations=max_iterations,
         should_continue=True,
+        agent_done=True,
+        follow_up=None,
+        deadline=deadline,
         
         # Output
         final_response=None,
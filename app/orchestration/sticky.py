@@ -0,0 +1,116 @@
+"""Conversation-sticky routing for follow-up turns
+
+Most follow-ups in a conversation ("and what about the tests?") belong to
+the agent that answered the previous turn. When a new message is short or
+anaphoric and its topic words are covered by the previous exchange, the
+previous assistant message's agent is reused and the router LLM call is
+skipped.
+"""
+
+from typing import Optional
+
+from app.agents.router import VALID_AGENTS, RouteResult
+from app.config.settings import settings
+from app.orchestration.state import AgentState, Message
+from app.utils.metrics import metrics
+from app.utils.text import containment, content_tokens, tokenize
+
+# Openers and pronouns that refer back to the previous turn
+ANAPHORIC_OPENERS = ("and ", "also ", "what about", "how about", "but ", "so ", "then ", "why ", "ok ", "okay ")
+ANAPHORIC_WORDS = frozenset({"it", "its", "that", "this", "those", "these", "they", "them", "there", "same", "more", "else"})
+
+# Confidence reported for sticky decisions (keeps escalation and retries off)
+STICKY_CONFIDENCE = 0.8
+
+
+def previous_exchange(messages: list[Message]) -> Optional[tuple[Optional[Message], Message]]:
+    """
+    Find the previous user message and assistant answer.
+
+    Args:
+        messages: Conversation messages, ending with the new user message
+
+    Returns:
+        Tuple of (previous user message or None, previous assistant
+        message), or None if nothing was answered yet
+    """
+    for i in range(len(messages) - 2, -1, -1):
+        if messages[i].role == "assistant":
+            for j in range(i - 1, -1, -1):
+                if messages[j].role == "user":
+                    return messages[j], messages[i]
+            return None, messages[i]
+    return None
+
+
+def is_follow_up(message: str) -> bool:
+    """
+    Check whether a message looks like a follow-up (short or anaphoric).
+
+    Args:
+        message: New user message
+
+    Returns:
+        True if the message is short or refers back to the previous turn
+    """
+    tokens = tokenize(message)
+    if len(tokens) <= settings.sticky_max_words:
+        return True
+    text = message.lower().lstrip()
+    return text.startswith(ANAPHORIC_OPENERS) or any(token in ANAPHORIC_WORDS for token in tokens[:4])
+
+
+def sticky_decision(state: AgentState) -> Optional[RouteResult]:
+    """
+    Reuse the previous turn's agent for a follow-up message.
+
+    Args:
+        state: Current agent state (first iteration of a turn)
+
+    Returns:
+        RouteResult for the previous agent, or None to route normally
+    """
+    if not settings.sticky_routing_enabled or state["iterations"] > 0:
+        return None
+
+    exchange = previous_exchange(state["messages"])
+    if exchange is None:
+        return None
+    previous_query, previous_answer = exchange
+    if previous_answer.agent not in VALID_AGENTS:
+        return None
+
+    message = state["messages"][-1].content
+    if not is_follow_up(message):
+        return None
+
+    # Topic words of the follow-up must already appear in the previous turn;
+    # a purely anaphoric message ("why?") has none and sticks
+    query_tokens = content_tokens(message)
+    reference = content_tokens(previous_answer.content)
+    if previous_query is not None:
+        reference |= content_tokens(previous_query.content)
+    score = containment(query_tokens, reference) if query_tokens else 1.0
+    if score < settings.sticky_similarity_threshold:
+        return None
+
+    metrics.increment("routing.sticky")
+    return RouteResult(
+        previous_answer.agent,
+        STICKY_CONFIDENCE,
+        f"Sticky: follow-up to {previous_answer.agent} (overlap {score:.2f})"
+    )
+
+
+def sticky_rate() -> float | None:
+    """
+    Get the fraction of first-pass routing decisions that were sticky.
+
+    Returns:
+        Sticky rate, or None if nothing was routed yet
+    """
+    sticky = metrics.get("routing.sticky")
+    routed = metrics.get("routing.llm_routed")
+    if sticky + routed == 0:
+        return None
+    return sticky / (sticky + routed)
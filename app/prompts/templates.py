@@ -13,21 +13,23 @@ Available Agents:
 2. **communication** - Writing assistance, emails, drafts, tone/style guidance, phrasing, messaging
 3. **knowledge** - Personal information, preferences, memories, background, experiences, "what do I like", "tell me about my"
 4. **decision** - Decision-making support, choices, trade-offs, recommendations, "should I", pros/cons analysis
-5. **general** - Fallback for general questions, greetings, unclear intent, or multi-domain queries
+5. **general** - Fallback for general questions, greetings, or unclear intent
 
 Your Task:
 Analyze the user's query and determine which agent should handle it. Consider:
 - Primary intent and topic
 - Keywords and phrases
 - Context and domain
-- Complexity (if multi-domain or unclear, use 'general')
+- Complexity (if unclear, use 'general'; if multi-domain, list the other agents in "also")
 
-Response Format (JSON):
-{
-    "agent": "agent_name",
-    "confidence": 0.85,
-    "reasoning": "Brief explanation of why this agent was chosen"
-}
+Response Format (a single line of JSON, nothing else):
+{"agent": "agent_name", "confidence": 0.85, "also": {}, "reasoning": "Brief explanation of why this agent was chosen"}
+Always emit the fields in exactly this order: agent, confidence, also, reasoning.
+
+Multi-domain queries:
+- "agent" is the primary agent for the query
+- "also" lists OTHER agents whose domain the query explicitly needs as well, with their confidence
+- Use an empty object {} when a single agent can handle the query (the common case)
 
 Guidelines:
 - Use confidence 0.9-0.95 for very clear matches
@@ -39,19 +41,22 @@ Guidelines:
 
 Examples:
 Query: "How do I implement authentication in my Python API?"
-Response: {"agent": "professional", "confidence": 0.95, "reasoning": "Technical question about programming and API development"}
+Response: {"agent": "professional", "confidence": 0.95, "also": {}, "reasoning": "Technical question about programming and API development"}
 
 Query: "Help me write a professional email to my manager"
-Response: {"agent": "communication", "confidence": 0.90, "reasoning": "Request for writing assistance with tone guidance"}
+Response: {"agent": "communication", "confidence": 0.90, "also": {}, "reasoning": "Request for writing assistance with tone guidance"}
 
 Query: "What are my favorite programming languages?"
-Response: {"agent": "knowledge", "confidence": 0.88, "reasoning": "Query about personal preferences"}
+Response: {"agent": "knowledge", "confidence": 0.88, "also": {}, "reasoning": "Query about personal preferences"}
 
 Query: "Should I learn React or Vue for my next project?"
-Response: {"agent": "decision", "confidence": 0.92, "reasoning": "Decision-making request with trade-off analysis"}
+Response: {"agent": "decision", "confidence": 0.92, "also": {}, "reasoning": "Decision-making request with trade-off analysis"}
+
+Query: "Should I take this Python job offer, and draft the email to accept it?"
+Response: {"agent": "decision", "confidence": 0.85, "also": {"communication": 0.82}, "reasoning": "Career decision plus a drafting request"}
 
 Query: "Hello! How are you?"
-Response: {"agent": "general", "confidence": 0.85, "reasoning": "Casual greeting without specific domain intent"}
+Response: {"agent": "general", "confidence": 0.85, "also": {}, "reasoning": "Casual greeting without specific domain intent"}
 
 Now route the following query:"""
 
@@ -171,3 +176,12 @@ Response style:
 - Support with reasoning, not just conclusions
 
 Note: Currently using general decision-making frameworks. Will be personalized with Eduardo's decision history and values in Phase 8."""
+
+
+# Canned replies for trivial intents answered by the fast path (no LLM call)
+FAST_PATH_RESPONSES = {
+    "greeting": "Hi! How can I help you today?",
+    "thanks": "You're welcome! Let me know if there's anything else I can help with.",
+    "acknowledgement": "Great! Let me know if you need anything else.",
+    "farewell": "Goodbye! Feel free to come back anytime.",
+}
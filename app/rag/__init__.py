@@ -5,6 +5,13 @@ for personalized agent responses.
 """
 
 from app.rag.embeddings import get_embedding_model, embed_text, embed_documents
+from app.rag.lexical import LexicalIndex, LexicalIndexManager, reciprocal_rank_fusion
+from app.rag.dedup import DuplicateIndex, DuplicateIndexManager
+from app.rag.quantization import QuantizedIndex, QuantizedIndexManager
+from app.rag.ivfpq import IVFPQIndex, IVFPQIndexManager
+from app.rag.sidecar import VectorSidecar, VectorSidecarManager
+from app.rag.sharding import ShardedIndex, ShardedIndexManager, ShardWorkerPool
+from app.rag.snapshot import SnapshotReader, SnapshotWriter
 from app.rag.stores import get_vector_store_manager, VectorStoreManager, AGENT_DOMAINS
 from app.rag.ingestion import get_ingestion_pipeline, DocumentIngestionPipeline
 from app.rag.retriever import get_retriever, Retriever, RetrievedDocument
@@ -20,6 +27,32 @@ __all__ = [
     "VectorStoreManager",
     "AGENT_DOMAINS",
     
+    # Lexical Index
+    "LexicalIndex",
+    "LexicalIndexManager",
+    "reciprocal_rank_fusion",
+    
+    # Near-Duplicate Index
+    "DuplicateIndex",
+    "DuplicateIndexManager",
+    
+    # Quantized Index
+    "QuantizedIndex",
+    "QuantizedIndexManager",
+    "IVFPQIndex",
+    "IVFPQIndexManager",
+    "VectorSidecar",
+    "VectorSidecarManager",
+    
+    # Sharded Search
+    "ShardedIndex",
+    "ShardedIndexManager",
+    "ShardWorkerPool",
+    
+    # Snapshots
+    "SnapshotReader",
+    "SnapshotWriter",
+    
     # Ingestion
     "get_ingestion_pipeline",
     "DocumentIngestionPipeline",
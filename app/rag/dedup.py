@@ -0,0 +1,368 @@
+"""Near-Duplicate Chunk Detection for Ingestion
+
+Email exports and meeting notes repeat the same passages (quoted replies,
+signatures, recurring agenda text). Each copy costs an embedding call and
+index space, and later crowds retrieval results. Before a document's chunks
+are embedded, each chunk gets a MinHash signature over its word 3-gram
+shingles, and an LSH index over the domain's signatures (banded buckets)
+finds earlier chunks whose estimated Jaccard similarity reaches the
+threshold. Signatures are persisted next to the vector stores so the whole
+domain is checked, not just the current document.
+"""
+
+import io
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.utils.text import tokenize
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3  # Words per shingle
+MINHASH_SEED = 1  # Fixed so signatures stay comparable across runs
+LSH_RECALL = 0.95  # Chance a pair exactly at the threshold shares a bucket
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hash the overlapping word n-grams of a text.
+
+    Args:
+        text: Input text
+        size: Words per shingle (texts shorter than this form one shingle)
+
+    Returns:
+        Unique 32-bit shingle hashes (empty for a text without words)
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    grams = {" ".join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def lsh_parameters(threshold: float, permutations: int) -> tuple[int, int]:
+    """
+    Choose the LSH banding for a similarity threshold.
+
+    Pairs share a bucket with probability 1 - (1 - s^rows)^bands. The
+    largest band size (fewest spurious candidates) that still catches a
+    pair at the threshold with probability LSH_RECALL is picked;
+    candidates are then verified against their signatures.
+
+    Args:
+        threshold: Jaccard similarity that counts as a duplicate
+        permutations: MinHash signature size
+
+    Returns:
+        (bands, rows per band)
+    """
+    best = (permutations, 1)
+    for rows in range(1, permutations + 1):
+        bands = permutations // rows
+        if 1 - (1 - threshold ** rows) ** bands >= LSH_RECALL:
+            best = (bands, rows)
+    return best
+
+
+class DuplicateIndex:
+    """MinHash signatures and LSH buckets of the chunks of one domain."""
+
+    def __init__(self, permutations: int = 128, threshold: float = 0.8):
+        """
+        Initialize an empty index.
+
+        Args:
+            permutations: MinHash signature size
+            threshold: Estimated Jaccard similarity that counts as a duplicate
+        """
+        self.permutations = permutations
+        self.threshold = threshold
+        self.bands, self.rows = lsh_parameters(threshold, permutations)
+        rng = np.random.default_rng(MINHASH_SEED)
+        self._a = rng.integers(1, 1 << 32, size=permutations, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=permutations, dtype=np.uint64)
+
+        self.ids: list[str] = []
+        self.signatures: list[np.ndarray] = []
+        self._positions: dict[str, int] = {}
+        self._buckets: dict[tuple[int, bytes], list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            text: Chunk text
+
+        Returns:
+            uint32 signature, or None for a text without words
+        """
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return None
+        # Universal hashing h(x) = (a*x + b) mod p; a, b and x are below 2^32, so no overflow
+        values = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _similarity(self, left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.count_nonzero(left == right)) / self.permutations
+
+    def _insert(self, doc_id: str, signature: np.ndarray):
+        position = len(self.ids)
+        self.ids.append(doc_id)
+        self.signatures.append(signature)
+        self._positions[doc_id] = position
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(position)
+
+    def match(self, signature: np.ndarray) -> Optional[tuple[str, float]]:
+        """
+        Find the most similar indexed chunk above the threshold.
+
+        Args:
+            signature: MinHash signature of the new chunk
+
+        Returns:
+            (document ID, estimated Jaccard similarity), or None
+        """
+        candidates = {
+            position
+            for key in self._band_keys(signature)
+            for position in self._buckets.get(key, ())
+        }
+        best = None
+        for position in candidates:
+            similarity = self._similarity(signature, self.signatures[position])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self.ids[position], similarity)
+        return best
+
+    def find_duplicates(self, ids: list[str], texts: list[str]) -> list[Optional[tuple[str, float]]]:
+        """
+        Check new chunks against the index and against each other.
+
+        Nothing is added: chunks are indexed with add() once stored. A chunk
+        whose ID is already indexed is the same chunk being re-ingested and
+        is not reported.
+
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+
+        Returns:
+            Per chunk, (ID of the chunk it duplicates, similarity) or None
+        """
+        matches = []
+        pending: list[tuple[str, np.ndarray]] = []
+        for doc_id, text in zip(ids, texts):
+            signature = self.signature(text)
+            if signature is None or doc_id in self._positions:
+                matches.append(None)
+                continue
+            match = self.match(signature)
+            for pending_id, pending_signature in pending:
+                similarity = self._similarity(signature, pending_signature)
+                if similarity >= self.threshold and (match is None or similarity > match[1]):
+                    match = (pending_id, similarity)
+            if match is None:
+                pending.append((doc_id, signature))
+            matches.append(match)
+        return matches
+
+    def add(self, ids: list[str], texts: list[str]) -> int:
+        """
+        Index chunks.
+
+        IDs already in the index and texts without words are skipped.
+
+        Args:
+            ids: Chunk IDs (same IDs as in the vector store)
+            texts: Chunk texts
+
+        Returns:
+            Number of chunks added
+        """
+        added = 0
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self._positions:
+                continue
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            self._insert(doc_id, signature)
+            added += 1
+        return added
+
+    def to_bytes(self) -> bytes:
+        """Serialize the signatures (buckets are rebuilt on load)."""
+        buffer = io.BytesIO()
+        signatures = np.array(self.signatures, dtype=np.uint32).reshape(len(self.ids), self.permutations)
+        np.savez_compressed(buffer, ids=np.array(self.ids, dtype=str), signatures=signatures)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, permutations: int = 128, threshold: float = 0.8) -> "DuplicateIndex":
+        """
+        Deserialize an index written by to_bytes().
+
+        Raises:
+            ValueError: If the stored signatures have another size
+        """
+        index = cls(permutations, threshold)
+        with np.load(io.BytesIO(data)) as stored:
+            signatures = stored["signatures"]
+            if len(signatures) and signatures.shape[1] != permutations:
+                raise ValueError(
+                    f"Stored MinHash signatures have {signatures.shape[1]} permutations, not {permutations}"
+                )
+            for doc_id, signature in zip(stored["ids"].tolist(), signatures):
+                index._insert(doc_id, signature)
+        return index
+
+
+class DuplicateIndexManager:
+    """
+    Loads, updates and persists the near-duplicate index of each domain.
+
+    Indexes are loaded lazily on first use. Updates are written back
+    immediately, or batched until flush() when added with persist=False
+    (one write per ingestion run instead of one per document). Safe to
+    share between the agent worker threads.
+    """
+
+    def __init__(self, directory: str, permutations: int = 128, threshold: float = 0.8):
+        """
+        Initialize duplicate index manager.
+
+        Args:
+            directory: Directory holding one index file per domain
+            permutations: MinHash signature size
+            threshold: Estimated Jaccard similarity that counts as a duplicate
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.permutations = permutations
+        self.threshold = threshold
+        self._indexes: dict[str, DuplicateIndex] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.minhash.npz"
+
+    def _get(self, domain: str) -> DuplicateIndex:
+        # Caller holds the lock
+        index = self._indexes.get(domain)
+        if index is None:
+            path = self._path(domain)
+            index = DuplicateIndex(self.permutations, self.threshold)
+            if path.exists():
+                try:
+                    index = DuplicateIndex.from_bytes(path.read_bytes(), self.permutations, self.threshold)
+                except ValueError as e:
+                    logger.warning(f"Ignoring {domain} duplicate index ({e}); rebuild it with --rebuild-dedup")
+            self._indexes[domain] = index
+        return index
+
+    def find_duplicates(self, domain: str, ids: list[str], texts: list[str]) -> list[Optional[tuple[str, float]]]:
+        """
+        Check new chunks of a domain for near-duplicates.
+
+        Args:
+            domain: Agent domain
+            ids: Chunk IDs
+            texts: Chunk texts
+
+        Returns:
+            Per chunk, (ID of the chunk it duplicates, similarity) or None
+        """
+        with self._lock:
+            return self._get(domain).find_duplicates(ids, texts)
+
+    def _write(self, domain: str):
+        # Caller holds the lock. Write to a temporary file first so a crash
+        # never leaves a torn index
+        path = self._path(domain)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(self._indexes[domain].to_bytes())
+        tmp_path.replace(path)
+        self._dirty.discard(domain)
+
+    def add_documents(self, domain: str, ids: list[str], texts: list[str], persist: bool = True) -> int:
+        """
+        Index stored chunks of a domain.
+
+        Args:
+            domain: Agent domain
+            ids: Chunk IDs
+            texts: Chunk texts
+            persist: Write the index now; False defers the write to flush()
+
+        Returns:
+            Number of chunks added
+        """
+        with self._lock:
+            added = self._get(domain).add(ids, texts)
+            if added:
+                self._dirty.add(domain)
+            if persist and domain in self._dirty:
+                self._write(domain)
+            return added
+
+    def flush(self, domain: Optional[str] = None):
+        """
+        Write indexes with unsaved additions.
+
+        Args:
+            domain: Agent domain (all domains if None)
+        """
+        with self._lock:
+            for name in [domain] if domain is not None else list(self._dirty):
+                if name in self._dirty:
+                    self._write(name)
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of indexed chunks for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of chunks in the duplicate index
+        """
+        with self._lock:
+            return len(self._get(domain))
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's duplicate index.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._indexes[domain] = DuplicateIndex(self.permutations, self.threshold)
+            self._dirty.discard(domain)
+            self._path(domain).unlink(missing_ok=True)
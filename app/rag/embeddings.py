@@ -1,29 +1,73 @@
 """Embedding utilities for RAG system
 
 Provides OpenAI embedding model configuration and utility functions
-for generating embeddings for documents and queries.
+for generating embeddings for documents and queries, plus a micro-batcher
+that merges concurrent single-query embedding requests into one call.
 """
 
+from typing import Callable
+
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
 from app.config.settings import settings
+from app.utils.batching import MicroBatcher
+from app.utils.deadline import call_timeout
+from app.utils.metrics import metrics
+
+# Native size of text-embedding-3-small vectors
+FULL_DIMENSIONS = 1536
 
 
 def get_embedding_model() -> OpenAIEmbeddings:
     """
     Get configured OpenAI embedding model.
     
-    Uses text-embedding-3-small for cost-effectiveness and quality.
+    Uses text-embedding-3-small for cost-effectiveness and quality, at
+    settings.embedding_dimensions if set (text-embedding-3 models return
+    shortened vectors natively).
     
     Returns:
         OpenAIEmbeddings: Configured embedding model
     """
     return OpenAIEmbeddings(
         model="text-embedding-3-small",
+        dimensions=settings.embedding_dimensions,
         openai_api_key=settings.openai_api_key,
         openai_api_base=settings.openai_api_base,
     )
 
 
+def embedding_kwargs() -> dict:
+    """Get the per-call embedding request options (timeout bounded by the request deadline)."""
+    return {"timeout": call_timeout(settings.tool_timeout_seconds)}
+
+
+def configured_dimensions() -> int:
+    """Get the dimensionality of the vectors the embedding model returns."""
+    return settings.embedding_dimensions or FULL_DIMENSIONS
+
+
+def truncate_embeddings(vectors, dimensions: int) -> list[list[float]]:
+    """
+    Shorten embeddings to their first dimensions, re-normalized.
+    
+    text-embedding-3 vectors are trained Matryoshka-style, so this gives
+    the same vectors the API returns for the shorter size, without
+    re-embedding.
+    
+    Args:
+        vectors: Embeddings of at least `dimensions` values each
+        dimensions: Target dimensionality
+        
+    Returns:
+        Shortened unit-length embeddings
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).tolist()
+
+
 def embed_text(text: str) -> list[float]:
     """
     Generate embedding for a single text string.
@@ -35,7 +79,7 @@ def embed_text(text: str) -> list[float]:
         List of floats representing the embedding vector
     """
     embeddings = get_embedding_model()
-    return embeddings.embed_query(text)
+    return embeddings.embed_query(text, **embedding_kwargs())
 
 
 def embed_documents(texts: list[str]) -> list[list[float]]:
@@ -49,4 +93,62 @@ def embed_documents(texts: list[str]) -> list[list[float]]:
         List of embedding vectors
     """
     embeddings = get_embedding_model()
-    return embeddings.embed_documents(texts)
+    return embeddings.embed_documents(texts, **embedding_kwargs())
+
+
+class EmbeddingBatcher(MicroBatcher):
+    """
+    Micro-batcher for single-text embedding requests.
+    
+    Concurrent requests arriving within the batching window share one
+    embed_documents call (identical texts are embedded once); a lone
+    request pays at most the window in extra latency.
+    """
+    
+    def __init__(
+        self,
+        embed_documents: Callable[[list[str]], list[list[float]]],
+        max_batch_size: int = 16,
+        window_ms: float = 5.0
+    ):
+        """
+        Initialize embedding batcher.
+        
+        Args:
+            embed_documents: Function embedding a list of texts
+            max_batch_size: Texts per call; a full batch is sent immediately
+            window_ms: How long a batch waits for more requests
+        """
+        super().__init__(self._embed_batch, max_batch_size, window_ms, name="embedding_batch")
+        self.embed_documents = embed_documents
+    
+    def embed(self, text: str) -> list[float]:
+        """
+        Embed one text, batched with concurrent requests.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector
+            
+        Raises:
+            DeadlineExceeded: If the request deadline passes while waiting
+        """
+        return self.submit(text)
+    
+    def _embed_batch(self, key, texts: list[str]) -> list[list[float]]:
+        """Embed a batch with one call (each distinct text once)."""
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, self.embed_documents(unique)))
+        return [vectors[text] for text in texts]
+
+
+def average_batch_size() -> float | None:
+    """
+    Get the average number of requests served per embedding call.
+    
+    Returns:
+        Average batch size, or None if nothing was batched yet
+    """
+    return metrics.ratio("embedding_batch.requests", "embedding_batch.calls")
@@ -10,10 +10,22 @@ from pathlib import Path
 from typing import Optional, List
 from datetime import datetime
 import hashlib
+import random
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from app.config.settings import settings
+from app.rag.embeddings import configured_dimensions, truncate_embeddings
+from app.rag.ivfpq import IVFPQIndexManager
 from app.rag.stores import get_vector_store_manager, AGENT_DOMAINS
+from app.utils.metrics import metrics
+from app.utils.tokens import count_tokens
+
+# Chunks embedded / written per call when re-indexing a domain
+REINDEX_BATCH_SIZE = 500
+
+# Sources recorded on a kept chunk when its duplicates are linked
+MAX_LINKED_SOURCES = 20
 
 
 class DocumentIngestionPipeline:
@@ -28,6 +40,15 @@ class DocumentIngestionPipeline:
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        
+        # Near-duplicate suppression totals across this pipeline's ingestions
+        self.dedup_report = {
+            "chunks": 0,
+            "duplicates": 0,
+            "linked": 0,
+            "embedding_calls_avoided": 0,
+            "embedding_tokens_avoided": 0,
+        }
     
     def load_document(self, file_path: str) -> List[str]:
         """Load document from file and split into chunks."""
@@ -50,9 +71,15 @@ class DocumentIngestionPipeline:
         file_path: str,
         domain: str,
         source: Optional[str] = None,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        persist: bool = True
     ) -> int:
-        """Ingest a document into a specific agent domain."""
+        """
+        Ingest a document into a specific agent domain; returns the chunks stored.
+        
+        With persist=False the on-disk side indexes are only written by
+        flush_indexes(), so a run over many files writes them once.
+        """
         if domain not in AGENT_DOMAINS:
             raise ValueError(f"Invalid domain: {domain}")
         
@@ -78,14 +105,248 @@ class DocumentIngestionPipeline:
             chunk_metadata["chunk_index"] = i
             metadatas.append(chunk_metadata)
         
-        self.vector_store.add_documents(
-            domain=domain,
-            texts=chunks,
-            metadatas=metadatas,
-            ids=ids
+        keep = list(range(len(chunks)))
+        if settings.ingestion_dedup != "off":
+            keep = self._suppress_duplicates(domain, ids, chunks, metadatas)
+        
+        if keep:
+            ids = [ids[i] for i in keep]
+            chunks = [chunks[i] for i in keep]
+            self.vector_store.add_documents(
+                domain=domain,
+                texts=chunks,
+                metadatas=[metadatas[i] for i in keep],
+                ids=ids,
+                persist=persist
+            )
+            self.vector_store.lexical_index.add_documents(domain, ids, chunks, persist=persist)
+            if settings.ingestion_dedup != "off":
+                self.vector_store.duplicate_index.add_documents(domain, ids, chunks, persist=persist)
+        
+        return len(keep)
+    
+    def flush_indexes(self, domain: str):
+        """Write the side indexes deferred by ingest_document(persist=False)."""
+        self.vector_store.lexical_index.flush(domain)
+        self.vector_store.duplicate_index.flush(domain)
+        self.vector_store.flush_quantized_index(domain)
+    
+    def _suppress_duplicates(
+        self,
+        domain: str,
+        ids: List[str],
+        chunks: List[str],
+        metadatas: List[dict]
+    ) -> List[int]:
+        """
+        Drop chunks that near-duplicate earlier chunks of the domain.
+        
+        In "link" mode each dropped chunk's source is recorded on the chunk
+        it duplicates (duplicate_count, duplicate_sources). Returns the
+        positions of the chunks to embed.
+        """
+        matches = self.vector_store.duplicate_index.find_duplicates(domain, ids, chunks)
+        keep = [i for i, match in enumerate(matches) if match is None]
+        duplicates = [(i, match[0]) for i, match in enumerate(matches) if match is not None]
+        
+        self.dedup_report["chunks"] += len(chunks)
+        if duplicates:
+            tokens = sum(count_tokens(chunks[i]) for i, _ in duplicates)
+            self.dedup_report["duplicates"] += len(duplicates)
+            self.dedup_report["embedding_tokens_avoided"] += tokens
+            metrics.increment("ingestion.duplicate_chunks", len(duplicates))
+            metrics.increment("ingestion.embedding_tokens_avoided", tokens)
+            if not keep:
+                self.dedup_report["embedding_calls_avoided"] += 1
+            if settings.ingestion_dedup == "link":
+                self._link_duplicates(domain, ids, metadatas, duplicates)
+        return keep
+    
+    def _link_duplicates(self, domain: str, ids: List[str], metadatas: List[dict], duplicates: list):
+        """Record dropped duplicates on the chunks they duplicate."""
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        stored_ids = list(dict.fromkeys(canonical for _, canonical in duplicates if canonical not in positions))
+        stored = self.vector_store.get_documents(domain, stored_ids) if stored_ids else {"ids": [], "metadatas": []}
+        targets = {
+            doc_id: dict(metadata or {})
+            for doc_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+        
+        for i, canonical in duplicates:
+            target = metadatas[positions[canonical]] if canonical in positions else targets.get(canonical)
+            if target is None:
+                continue  # Deleted since it was indexed
+            sources = [source for source in target.get("duplicate_sources", "").split(",") if source]
+            if metadatas[i]["source"] not in sources and len(sources) < MAX_LINKED_SOURCES:
+                sources.append(metadatas[i]["source"])
+            target["duplicate_count"] = target.get("duplicate_count", 0) + 1
+            target["duplicate_sources"] = ",".join(sources)
+            self.dedup_report["linked"] += 1
+        
+        if targets:
+            self.vector_store.get_collection(domain).update(
+                ids=list(targets), metadatas=list(targets.values())
+            )
+            self.vector_store.bump_generation(domain)
+    
+    def rebuild_lexical_index(self, domain: str) -> int:
+        """Rebuild a domain's BM25 index from its vector store collection."""
+        if domain not in AGENT_DOMAINS:
+            raise ValueError(f"Invalid domain: {domain}")
+        
+        results = self.vector_store.get_collection(domain).get(include=["documents"])
+        self.vector_store.lexical_index.reset(domain)
+        indexed = self.vector_store.lexical_index.add_documents(
+            domain, results["ids"], results["documents"]
         )
+        self.vector_store.bump_generation(domain)
+        return indexed
+    
+    def rebuild_duplicate_index(self, domain: str) -> int:
+        """Rebuild a domain's near-duplicate index from its vector store collection."""
+        if domain not in AGENT_DOMAINS:
+            raise ValueError(f"Invalid domain: {domain}")
+        
+        collection = self.vector_store.get_collection(domain)
+        ids = collection.get(include=[])["ids"]
+        self.vector_store.duplicate_index.reset(domain)
+        indexed = 0
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            batch = collection.get(ids=ids[start:start + REINDEX_BATCH_SIZE], include=["documents"])
+            indexed += self.vector_store.duplicate_index.add_documents(
+                domain, batch["ids"], batch["documents"], persist=False
+            )
+        self.vector_store.duplicate_index.flush(domain)
+        return indexed
+    
+    def rebuild_quantized_index(self, domain: str) -> int:
+        """
+        Rebuild a domain's quantized vector index from its vector store collection.
+        
+        A domain whose vectors are still in ChromaDB is first copied over to
+        placeholders plus a vector sidecar. An IVF-PQ index is retrained on a
+        random sample of the domain. Vectors are read in batches, so memory
+        stays bounded for large domains.
+        """
+        if domain not in AGENT_DOMAINS:
+            raise ValueError(f"Invalid domain: {domain}")
+        index = self.vector_store.quantized_index
+        if index is None:
+            raise ValueError("Vector quantization is disabled (set VECTOR_QUANTIZATION)")
         
-        return len(chunks)
+        current = self.vector_store.stored_dimensions(domain)
+        if current is not None and not self.vector_store.vectors_in_sidecar(domain):
+            # Written before quantization was on: move its vectors out of ChromaDB
+            self._copy_domain(domain, current, lambda batch: batch["embeddings"])
+        
+        collection = self.vector_store.get_collection(domain)
+        ids = collection.get(include=[])["ids"]
+        index.reset(domain)
+        if isinstance(index, IVFPQIndexManager) and ids:
+            sample_ids = random.sample(ids, min(len(ids), index.train_size))
+            sample = []
+            for start in range(0, len(sample_ids), REINDEX_BATCH_SIZE):
+                batch = self.vector_store.get_documents(
+                    domain, sample_ids[start:start + REINDEX_BATCH_SIZE], include_embeddings=True
+                )
+                sample.extend(batch["embeddings"])
+            index.train(domain, sample)
+        
+        indexed = 0
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            batch = self.vector_store.get_documents(
+                domain, ids[start:start + REINDEX_BATCH_SIZE], include_embeddings=True
+            )
+            indexed += index.add_documents(domain, batch["ids"], batch["embeddings"], persist=False)
+        index.flush(domain)
+        self.vector_store.bump_generation(domain)
+        return indexed
+    
+    def rebuild_shards(self, domain: str) -> int:
+        """
+        Rebuild a domain's vector shards from its vector store collection.
+        
+        Vectors are read in batches, so memory stays bounded for large domains.
+        """
+        if domain not in AGENT_DOMAINS:
+            raise ValueError(f"Invalid domain: {domain}")
+        index = self.vector_store.sharded_index(domain)
+        if index is None:
+            raise ValueError(
+                f"Domain {domain} is not sharded (set VECTOR_SHARDS and VECTOR_SHARDED_DOMAINS)"
+            )
+        
+        collection = self.vector_store.get_collection(domain)
+        ids = collection.get(include=[])["ids"]
+        index.reset(domain)
+        indexed = 0
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            batch = self.vector_store.get_documents(
+                domain, ids[start:start + REINDEX_BATCH_SIZE], include_embeddings=True
+            )
+            indexed += index.add_documents(domain, batch["ids"], batch["embeddings"])
+        self.vector_store.bump_generation(domain)
+        return indexed
+    
+    def reindex_domain(self, domain: str) -> dict:
+        """
+        Rebuild a domain at the configured embedding dimensionality.
+        
+        Shortening is done locally by truncating the stored vectors; growing
+        them requires re-embedding every chunk. Chunks are copied in batches
+        into a staging collection that replaces the domain's only once it is
+        complete, so a failed run leaves the domain as it was. Quantized and
+        sharded indexes are then rebuilt from the new vectors.
+        """
+        if domain not in AGENT_DOMAINS:
+            raise ValueError(f"Invalid domain: {domain}")
+        
+        target = configured_dimensions()
+        current = self.vector_store.stored_dimensions(domain)
+        report = {"chunks": 0, "from_dimensions": current, "to_dimensions": target, "embedding_calls": 0}
+        if current is None or current == target:
+            return report
+        
+        def convert(batch):
+            if target < current:
+                return truncate_embeddings(batch["embeddings"], target)
+            report["embedding_calls"] += 1
+            return self.vector_store.embedding_model.embed_documents(batch["documents"])
+        
+        report["chunks"] = self._copy_domain(domain, target, convert)
+        if self.vector_store.quantized_index is not None:
+            self.rebuild_quantized_index(domain)
+        if self.vector_store.sharded_index(domain) is not None:
+            self.rebuild_shards(domain)
+        return report
+    
+    def _copy_domain(self, domain: str, dimensions: int, convert) -> int:
+        """
+        Copy a domain into a staging collection and swap it in.
+        
+        convert(batch) returns the new embeddings of each batch read from
+        the domain. Chunks are copied in batches, and the domain is replaced
+        only once the copy is complete. Returns the number of chunks copied.
+        """
+        ids = self.vector_store.get_collection(domain).get(include=[])["ids"]
+        staging = self.vector_store.staging_collection(domain, dimensions)
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            batch = self.vector_store.get_documents(
+                domain, ids[start:start + REINDEX_BATCH_SIZE], include_embeddings=True
+            )
+            staging.add(
+                ids=batch["ids"], documents=batch["documents"], metadatas=batch["metadatas"],
+                embeddings=convert(batch)
+            )
+            # The text indexes skip IDs they already hold
+            self.vector_store.lexical_index.add_documents(domain, batch["ids"], batch["documents"], persist=False)
+            if settings.ingestion_dedup != "off":
+                self.vector_store.duplicate_index.add_documents(
+                    domain, batch["ids"], batch["documents"], persist=False
+                )
+        self.vector_store.swap_collection(domain, staging)
+        self.flush_indexes(domain)
+        return len(ids)
     
     def ingest_directory(
         self,
@@ -111,12 +372,24 @@ class DocumentIngestionPipeline:
         results = {
             "files_processed": 0,
             "total_chunks": 0,
+            "duplicate_chunks": 0,
             "files": []
         }
         
+        try:
+            self._ingest_files(files, domain, results)
+        finally:
+            self.flush_indexes(domain)
+        
+        return results
+    
+    def _ingest_files(self, files: List[Path], domain: str, results: dict):
+        """Ingest files one by one, recording each outcome in results."""
         for file_path in files:
             try:
-                chunks = self.ingest_document(str(file_path), domain=domain, source=file_path.stem)
+                duplicates = self.dedup_report["duplicates"]
+                chunks = self.ingest_document(str(file_path), domain=domain, source=file_path.stem, persist=False)
+                results["duplicate_chunks"] += self.dedup_report["duplicates"] - duplicates
                 results["files_processed"] += 1
                 results["total_chunks"] += chunks
                 results["files"].append({
@@ -130,8 +403,6 @@ class DocumentIngestionPipeline:
                     "status": "error",
                     "error": str(e)
                 })
-        
-        return results
 
 
 def get_ingestion_pipeline() -> DocumentIngestionPipeline:
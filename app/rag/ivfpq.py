@@ -0,0 +1,589 @@
+"""IVF-PQ Vector Index for Large Domains
+
+For domains with hundreds of thousands of chunks, an IVF-PQ index bounds
+the work per query: it partitions the vectors into `nlist` coarse clusters
+(inverted lists) and encodes each vector as `subquantizers` one-byte
+product-quantization codes of its residual from the cluster centroid, 32
+bytes instead of 6 KB at 1536 dims with 32 subquantizers. A query scans
+only the `nprobe` nearest lists, scoring codes with per-subspace distance
+tables.
+
+As with the float16/int8 indexes (see quantization.py), the shortlist is
+rescored against the float32 vectors in the memory-mapped vector sidecar,
+which replaces ChromaDB's copy of them.
+
+The centroids and codebooks are trained with k-means on a sample of the
+domain's vectors. Each index lives in its own directory:
+
+    meta.json       format version, shape parameters and vector count
+    centroids.npy   (nlist, d) float32 coarse centroids
+    codebooks.npy   (subquantizers, 256, d / subquantizers) float32
+    codes.bin       raw uint8 codes, one row of `subquantizers` per vector
+    lists.bin       raw int32 inverted list of each vector
+    ids.txt         one document ID per line
+
+The binary files are append-only and memory-mapped on load; meta.json is
+replaced last, so a partially written append is ignored.
+"""
+
+import copy
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+PQ_CENTROIDS = 256  # 8-bit codes
+KMEANS_ITERATIONS = 20
+INDEX_FORMAT_VERSION = 1
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 4096) -> np.ndarray:
+    """
+    Assign each vector to its nearest centroid by squared L2 distance.
+
+    Args:
+        vectors: Array of shape (n, d)
+        centroids: Array of shape (k, d)
+        block_size: Vectors compared per step (bounds temporary memory)
+
+    Returns:
+        int32 array of centroid indices, shape (n,)
+    """
+    centroid_norms = (centroids * centroids).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        # ||x||^2 is the same for every centroid and can be left out
+        assignments[start:start + block_size] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return assignments
+
+
+def kmeans(vectors, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means.
+
+    Args:
+        vectors: Training vectors of shape (n, d)
+        k: Number of clusters (capped at n)
+        iterations: Assignment/update rounds
+        seed: Random seed for initialization
+
+    Returns:
+        Centroids of shape (min(k, n), d)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(vectors[np.argsort(assignments, kind="stable")], starts, axis=0)
+        centroids[filled] = sums / counts[filled][:, None]
+
+        # Re-seed empty clusters from random training vectors
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantized residuals for one domain."""
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray, directory: Optional[Path] = None):
+        """
+        Initialize an empty index from trained parameters.
+
+        Args:
+            centroids: Coarse centroids, shape (nlist, d)
+            codebooks: PQ codebooks, shape (subquantizers, codes, d / subquantizers)
+            directory: Index directory for disk-backed indexes (None keeps
+                       everything in memory)
+        """
+        self.centroids = centroids
+        self.codebooks = codebooks
+        self.directory = directory
+        # For distance tables: ||r - c||^2 = ||r||^2 - 2 r.c + ||c||^2
+        self._codebooks_t = np.ascontiguousarray(codebooks.transpose(0, 2, 1))
+        self._codeword_norms = (codebooks * codebooks).sum(axis=2)
+        self.ids: list[str] = []
+        self.lists = np.empty(0, dtype=np.int32)
+        self.codes = np.empty((0, self.subquantizers), dtype=np.uint8)
+        self._known: set[str] = set()
+        self._order: Optional[np.ndarray] = None  # Vector positions grouped by list
+        self._offsets: Optional[np.ndarray] = None  # Start of each list in _order
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def subquantizers(self) -> int:
+        return len(self.codebooks)
+
+    @property
+    def dimensions(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the per-vector codes and list assignments."""
+        return len(self.ids) * (self.subquantizers + self.lists.itemsize)
+
+    @classmethod
+    def train(
+        cls,
+        sample,
+        nlist: int,
+        subquantizers: int,
+        directory: Optional[Path] = None,
+        seed: int = 0
+    ) -> "IVFPQIndex":
+        """
+        Train coarse centroids and PQ codebooks on a sample of vectors.
+
+        Args:
+            sample: Training vectors of shape (n, d)
+            nlist: Number of inverted lists (capped at n)
+            subquantizers: Number of subspaces; must divide d
+            directory: Index directory (written empty, ready for add())
+            seed: Random seed
+
+        Returns:
+            Empty trained IVFPQIndex
+
+        Raises:
+            ValueError: If subquantizers does not divide the dimensionality
+        """
+        sample = np.asarray(sample, dtype=np.float32)
+        dimensions = sample.shape[1]
+        if dimensions % subquantizers:
+            raise ValueError(f"{subquantizers} subquantizers do not divide {dimensions} dimensions")
+
+        centroids = kmeans(sample, nlist, seed=seed)
+        residuals = sample - centroids[nearest_centroids(sample, centroids)]
+        width = dimensions // subquantizers
+        codebooks = np.stack([
+            kmeans(residuals[:, j * width:(j + 1) * width], PQ_CENTROIDS, seed=seed + j)
+            for j in range(subquantizers)
+        ])
+
+        index = cls(centroids, codebooks, directory)
+        if directory is not None:
+            index._create_files()
+        return index
+
+    def encode(self, vectors) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Quantize vectors.
+
+        Args:
+            vectors: Array of shape (n, d)
+
+        Returns:
+            Tuple of (inverted list per vector, PQ codes of shape (n, subquantizers))
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lists = nearest_centroids(vectors, self.centroids)
+        residuals = vectors - self.centroids[lists]
+        width = self.dimensions // self.subquantizers
+        codes = np.empty((len(vectors), self.subquantizers), dtype=np.uint8)
+        for j in range(self.subquantizers):
+            codes[:, j] = nearest_centroids(residuals[:, j * width:(j + 1) * width], self.codebooks[j])
+        return lists, codes
+
+    def add(self, ids: list[str], vectors) -> int:
+        """
+        Encode and add vectors (appended to the index files if disk-backed).
+
+        IDs already in the index are skipped, matching the vector store.
+
+        Args:
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+        """
+        new = [(doc_id, vector) for doc_id, vector in zip(ids, vectors) if doc_id not in self._known]
+        if not new:
+            return 0
+
+        new_ids = [doc_id for doc_id, _ in new]
+        lists, codes = self.encode([vector for _, vector in new])
+        self.ids.extend(new_ids)
+        self._known.update(new_ids)
+        self.lists = np.concatenate([self.lists, lists])
+        self._order = self._offsets = None
+
+        if self.directory is None:
+            self.codes = np.concatenate([self.codes, codes])
+        else:
+            with open(self.directory / "codes.bin", "ab") as f:
+                f.write(codes.tobytes())
+            with open(self.directory / "lists.bin", "ab") as f:
+                f.write(lists.tobytes())
+            with open(self.directory / "ids.txt", "a", encoding="utf-8") as f:
+                f.writelines(f"{doc_id}\n" for doc_id in new_ids)
+            self._write_meta()
+            self.codes = self._map_codes()
+        return len(new)
+
+    def _build_lists(self):
+        """Group vector positions by inverted list."""
+        if self._order is None:
+            self._order = np.argsort(self.lists, kind="stable").astype(np.int32)
+            self._offsets = np.searchsorted(self.lists[self._order], np.arange(self.nlist + 1))
+
+    def snapshot(self) -> "IVFPQIndex":
+        """
+        Get a view of the vectors indexed so far, safe to search during add().
+
+        add() only appends to `ids` and rebinds the arrays, so the view keeps
+        the layout it was taken with.
+
+        Returns:
+            Shallow copy of the index with its inverted lists built
+        """
+        self._build_lists()
+        return copy.copy(self)
+
+    def search(self, query, k: int, nprobe: int) -> list[tuple[str, float]]:
+        """
+        Find the approximate nearest vectors.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            nprobe: Inverted lists to scan
+
+        Returns:
+            List of (document ID, approximate squared L2 distance), nearest first
+        """
+        if not self.ids:
+            return []
+        self._build_lists()
+
+        query = np.asarray(query, dtype=np.float32)
+        coarse = ((self.centroids - query) ** 2).sum(axis=1)
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        width = self.dimensions // self.subquantizers
+        subspaces = np.arange(self.subquantizers)
+        positions, distances = [], []
+        for probe in probes:
+            members = self._order[self._offsets[probe]:self._offsets[probe + 1]]
+            if not len(members):
+                continue
+            # Distance from the query residual to every codeword, per subspace
+            residual = (query - self.centroids[probe]).reshape(self.subquantizers, 1, width)
+            cross = np.matmul(residual, self._codebooks_t)[:, 0, :]
+            tables = self._codeword_norms - 2 * cross + (residual * residual).sum(axis=2)
+            codes = np.asarray(self.codes[members])
+            positions.append(members)
+            distances.append(tables[subspaces, codes].sum(axis=1))
+
+        if not positions:
+            return []
+        positions = np.concatenate(positions)
+        distances = np.concatenate(distances)
+        k = min(k, len(positions))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(self.ids[positions[i]], float(distances[i])) for i in top]
+
+    def _create_files(self):
+        """Write the trained parameters and empty data files."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.directory / "centroids.npy", self.centroids)
+        np.save(self.directory / "codebooks.npy", self.codebooks)
+        for name in ("codes.bin", "lists.bin", "ids.txt"):
+            (self.directory / name).write_bytes(b"")
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "dimensions": self.dimensions,
+            "nlist": self.nlist,
+            "subquantizers": self.subquantizers,
+            "count": len(self.ids),
+        }
+        tmp_path = self.directory / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        tmp_path.replace(self.directory / "meta.json")
+
+    def _map_codes(self) -> np.ndarray:
+        if not self.ids:
+            return np.empty((0, self.subquantizers), dtype=np.uint8)
+        return np.memmap(
+            self.directory / "codes.bin", dtype=np.uint8, mode="r",
+            shape=(len(self.ids), self.subquantizers)
+        )
+
+    @classmethod
+    def load(cls, directory: Path) -> "IVFPQIndex":
+        """
+        Open a disk-backed index; codes are memory-mapped, not read.
+
+        Args:
+            directory: Index directory
+
+        Returns:
+            IVFPQIndex instance
+        """
+        meta = json.loads((directory / "meta.json").read_text())
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported IVF-PQ index version at {directory}: {meta.get('version')}")
+
+        index = cls(np.load(directory / "centroids.npy"), np.load(directory / "codebooks.npy"), directory)
+        count = meta["count"]
+        with open(directory / "ids.txt", encoding="utf-8") as f:
+            index.ids = [line.rstrip("\n") for _, line in zip(range(count), f)]
+        index._known = set(index.ids)
+        index.lists = np.fromfile(directory / "lists.bin", dtype=np.int32, count=count)
+        index.codes = index._map_codes()
+        return index
+
+
+class IVFPQIndexManager:
+    """
+    Trains, loads, updates and persists the IVF-PQ index of each domain.
+
+    Vectors added before a domain has `train_size` of them are buffered
+    (and persisted) unindexed; the buffer is the training sample. Until
+    then the domain has no index and is searched by the vector store.
+    Each buffered batch is its own file, so adding to the buffer writes
+    only the new vectors. An index is reloaded when another process (e.g.
+    ingestion) changes it. Safe to share between the agent worker threads;
+    searches run on a snapshot, outside the lock.
+    """
+
+    def __init__(self, directory: str, nlist: int, subquantizers: int, nprobe: int, train_size: int):
+        """
+        Initialize IVF-PQ index manager.
+
+        Args:
+            directory: Directory holding one index per domain
+            nlist: Inverted lists per index
+            subquantizers: PQ bytes per vector
+            nprobe: Inverted lists scanned per query
+            train_size: Vectors needed (and sampled) to train an index
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.nlist = nlist
+        self.subquantizers = subquantizers
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self._indexes: dict[str, Optional[IVFPQIndex]] = {}
+        self._pending: dict[str, set[str]] = {}  # Buffered IDs per domain
+        self._mtimes: dict[str, Optional[int]] = {}  # meta.json version each loaded index reflects
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.ivfpq"
+
+    def _pending_path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.ivfpq-pending"
+
+    def _pending_ids(self, domain: str) -> set[str]:
+        # Caller holds the lock
+        if domain not in self._pending:
+            buffered = set()
+            for batch in sorted(self._pending_path(domain).glob("*.npz")):
+                with np.load(batch) as data:
+                    buffered.update(data["ids"].tolist())
+            self._pending[domain] = buffered
+        return self._pending[domain]
+
+    def _load_pending(self, domain: str) -> tuple[list[str], np.ndarray]:
+        # Caller holds the lock
+        ids, vectors = [], []
+        for batch in sorted(self._pending_path(domain).glob("*.npz")):
+            with np.load(batch) as data:
+                ids.extend(data["ids"].tolist())
+                vectors.append(data["vectors"])
+        return ids, np.concatenate(vectors)
+
+    def _clear_pending(self, domain: str):
+        # Caller holds the lock
+        self._pending.pop(domain, None)
+        shutil.rmtree(self._pending_path(domain), ignore_errors=True)
+
+    def _mtime(self, domain: str) -> Optional[int]:
+        try:
+            return (self._path(domain) / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _get(self, domain: str) -> Optional[IVFPQIndex]:
+        # Caller holds the lock. meta.json is replaced on every change, so
+        # a new mtime means another process (e.g. ingestion) wrote the index
+        mtime = self._mtime(domain)
+        if domain not in self._indexes or mtime != self._mtimes.get(domain):
+            self._indexes[domain] = IVFPQIndex.load(self._path(domain)) if mtime is not None else None
+            self._mtimes[domain] = mtime
+            self._pending.pop(domain, None)
+        return self._indexes[domain]
+
+    def _committed(self, domain: str):
+        # Caller holds the lock; records this process's own write
+        self._mtimes[domain] = self._mtime(domain)
+
+    def train(self, domain: str, sample) -> None:
+        """
+        (Re)train a domain's index on a sample, replacing any existing index.
+
+        Args:
+            domain: Agent domain
+            sample: Training vectors
+        """
+        with self._lock:
+            self._train(domain, sample)
+
+    def _train(self, domain: str, sample) -> IVFPQIndex:
+        # Caller holds the lock
+        shutil.rmtree(self._path(domain), ignore_errors=True)
+        index = IVFPQIndex.train(sample, self.nlist, self.subquantizers, self._path(domain))
+        self._indexes[domain] = index
+        self._committed(domain)
+        return index
+
+    def add_documents(self, domain: str, ids: list[str], vectors, persist: bool = True) -> int:
+        """
+        Index vectors for a domain, training the index once enough are buffered.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+            persist: Unused; IVF-PQ additions are appended to disk right away
+
+        Returns:
+            Number of vectors indexed (0 while buffering for training)
+        """
+        with self._lock:
+            index = self._get(domain)
+            if index is not None and len(ids) and index.dimensions != len(vectors[0]):
+                # Trained at another EMBEDDING_DIMENSIONS; train anew
+                self._indexes[domain] = index = None
+                shutil.rmtree(self._path(domain), ignore_errors=True)
+                self._committed(domain)
+            if index is not None:
+                added = index.add(ids, vectors)
+                self._committed(domain)
+                return added
+
+            buffered = self._pending_ids(domain)
+            new_ids, new_vectors = [], []
+            for doc_id, vector in zip(ids, vectors):
+                if doc_id not in buffered:
+                    buffered.add(doc_id)
+                    new_ids.append(doc_id)
+                    new_vectors.append(vector)
+
+            if new_ids:
+                # Named by buffer size so batches sort in insertion order
+                pending_path = self._pending_path(domain)
+                pending_path.mkdir(parents=True, exist_ok=True)
+                tmp_path = pending_path / "batch.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, ids=np.array(new_ids), vectors=np.array(new_vectors, dtype=np.float32))
+                tmp_path.replace(pending_path / f"{len(buffered) - len(new_ids):010d}.npz")
+
+            if len(buffered) < self.train_size:
+                return 0
+
+            pending_ids, pending_vectors = self._load_pending(domain)
+            index = self._train(domain, pending_vectors)
+            added = index.add(pending_ids, pending_vectors)
+            self._committed(domain)
+            self._clear_pending(domain)
+            return added
+
+    def search(self, domain: str, query, k: int) -> list[tuple[str, float]]:
+        """
+        Find a domain's approximate nearest vectors.
+
+        Args:
+            domain: Agent domain
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (document ID, approximate squared L2 distance), nearest first
+        """
+        with self._lock:
+            index = self._get(domain)
+            if index is None:
+                return []
+            # Additions after this are not searched
+            snapshot = index.snapshot()
+        return snapshot.search(query, k, self.nprobe)
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of indexed vectors for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of vectors in the IVF-PQ index (0 before training)
+        """
+        with self._lock:
+            index = self._get(domain)
+            return len(index) if index is not None else 0
+
+    def clear(self, domain: str):
+        """
+        Delete a domain's vectors and training buffer, but not its training.
+
+        The centroids and codebooks are kept, so new vectors are indexed
+        right away instead of being buffered for retraining.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            index = self._get(domain)
+            self._clear_pending(domain)
+            if index is None:
+                return
+            shutil.rmtree(self._path(domain), ignore_errors=True)
+            self._indexes[domain] = IVFPQIndex(index.centroids, index.codebooks, self._path(domain))
+            self._indexes[domain]._create_files()
+            self._committed(domain)
+
+    def flush(self, domain: Optional[str] = None):
+        """
+        Nothing to write: IVF-PQ additions are appended to disk right away.
+
+        Args:
+            domain: Agent domain (all domains if None)
+        """
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's index and training buffer.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._indexes[domain] = None
+            shutil.rmtree(self._path(domain), ignore_errors=True)
+            self._mtimes[domain] = None
+            self._clear_pending(domain)
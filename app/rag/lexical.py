@@ -0,0 +1,328 @@
+"""Lexical (BM25) Index for Hybrid Retrieval
+
+Embeddings are weak at exact identifiers such as project names, error codes
+and people. Each domain also gets an in-process BM25 inverted index, built at
+ingestion time and persisted next to the vector stores as gzip-compressed
+JSON with delta-encoded postings. Hybrid retrieval fuses the BM25 and vector
+rankings with reciprocal rank fusion.
+"""
+
+import gzip
+import json
+import math
+import threading
+from collections import Counter
+from pathlib import Path
+from app.utils.text import index_terms
+
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+INDEX_FORMAT_VERSION = 1
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the chunks of one domain.
+
+    Postings are kept as parallel lists of document positions and term
+    frequencies; documents are only ever appended, so positions stay sorted.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.ids: list[str] = []
+        self.lengths: list[int] = []
+        self.postings: dict[str, tuple[list[int], list[int]]] = {}
+        self.total_length = 0
+        self._positions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def add(self, ids: list[str], texts: list[str]) -> int:
+        """
+        Index documents.
+
+        IDs already in the index are skipped, matching the vector store,
+        which ignores re-added IDs.
+
+        Args:
+            ids: Document IDs (same IDs as in the vector store)
+            texts: Document texts
+
+        Returns:
+            Number of documents added
+        """
+        added = 0
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self._positions:
+                continue
+
+            position = len(self.ids)
+            terms = index_terms(text)
+            self.ids.append(doc_id)
+            self.lengths.append(len(terms))
+            self.total_length += len(terms)
+            self._positions[doc_id] = position
+
+            for term, frequency in Counter(terms).items():
+                docs, frequencies = self.postings.setdefault(term, ([], []))
+                docs.append(position)
+                frequencies.append(frequency)
+            added += 1
+
+        return added
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        """
+        Rank documents against a query with BM25.
+
+        Args:
+            query: Search query
+            limit: Maximum number of results
+
+        Returns:
+            List of (document ID, BM25 score), best first; documents sharing
+            no term with the query are not returned
+        """
+        if not self.ids:
+            return []
+
+        n_docs = len(self.ids)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: dict[int, float] = {}
+
+        for term in set(index_terms(query)):
+            if term not in self.postings:
+                continue
+            docs, frequencies = self.postings[term]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for position, frequency in zip(docs, frequencies):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(self.ids[position], score) for position, score in ranked]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the index.
+
+        Document positions in each posting list are delta-encoded and
+        interleaved with their term frequencies, so most values are small
+        integers that compress well.
+
+        Returns:
+            gzip-compressed JSON
+        """
+        postings = {}
+        for term, (docs, frequencies) in self.postings.items():
+            encoded = []
+            previous = 0
+            for position, frequency in zip(docs, frequencies):
+                encoded.append(position - previous)
+                encoded.append(frequency)
+                previous = position
+            postings[term] = encoded
+
+        payload = {
+            "version": INDEX_FORMAT_VERSION,
+            "ids": self.ids,
+            "lengths": self.lengths,
+            "postings": postings,
+        }
+        return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LexicalIndex":
+        """
+        Deserialize an index written by to_bytes().
+
+        Args:
+            data: gzip-compressed JSON
+
+        Returns:
+            LexicalIndex instance
+
+        Raises:
+            ValueError: If the data was written by an unknown format version
+        """
+        payload = json.loads(gzip.decompress(data))
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {payload.get('version')}")
+
+        index = cls()
+        index.ids = payload["ids"]
+        index.lengths = payload["lengths"]
+        index.total_length = sum(index.lengths)
+        index._positions = {doc_id: i for i, doc_id in enumerate(index.ids)}
+
+        for term, encoded in payload["postings"].items():
+            docs, frequencies = [], []
+            position = 0
+            for i in range(0, len(encoded), 2):
+                position += encoded[i]
+                docs.append(position)
+                frequencies.append(encoded[i + 1])
+            index.postings[term] = (docs, frequencies)
+
+        return index
+
+
+class LexicalIndexManager:
+    """
+    Loads, updates and persists the lexical index of each domain.
+
+    Indexes are loaded lazily on first use and reloaded when the file
+    changes on disk (e.g. after an ingestion run in another process).
+    Updates are written back immediately, or batched until flush() when
+    added with persist=False (one write per ingestion run instead of one
+    per document). Safe to share between the agent worker threads.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize lexical index manager.
+
+        Args:
+            directory: Directory holding one index file per domain
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._indexes: dict[str, LexicalIndex] = {}
+        self._mtimes: dict[str, int | None] = {}  # File version each loaded index reflects
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.bm25.json.gz"
+
+    def _mtime(self, domain: str) -> int | None:
+        try:
+            return self._path(domain).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _get(self, domain: str) -> LexicalIndex:
+        # Caller holds the lock. Unsaved additions win over the file
+        index = self._indexes.get(domain)
+        if domain in self._dirty:
+            return index
+        mtime = self._mtime(domain)
+        if index is None or mtime != self._mtimes.get(domain):
+            path = self._path(domain)
+            index = LexicalIndex.from_bytes(path.read_bytes()) if mtime is not None else LexicalIndex()
+            self._indexes[domain] = index
+            self._mtimes[domain] = mtime
+        return index
+
+    def _write(self, domain: str):
+        # Caller holds the lock. Write to a temporary file first so a crash
+        # never leaves a torn index
+        path = self._path(domain)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(self._indexes[domain].to_bytes())
+        tmp_path.replace(path)
+        self._mtimes[domain] = self._mtime(domain)
+        self._dirty.discard(domain)
+
+    def add_documents(self, domain: str, ids: list[str], texts: list[str], persist: bool = True) -> int:
+        """
+        Index documents for a domain.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            texts: Document texts
+            persist: Write the index now; False defers the write to flush()
+
+        Returns:
+            Number of documents added
+        """
+        with self._lock:
+            added = self._get(domain).add(ids, texts)
+            if added:
+                self._dirty.add(domain)
+            if persist and domain in self._dirty:
+                self._write(domain)
+            return added
+
+    def flush(self, domain: str | None = None):
+        """
+        Write indexes with unsaved additions.
+
+        Args:
+            domain: Agent domain (all domains if None)
+        """
+        with self._lock:
+            for name in [domain] if domain is not None else list(self._dirty):
+                if name in self._dirty:
+                    self._write(name)
+
+    def search(self, domain: str, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        """
+        Rank a domain's documents against a query with BM25.
+
+        Args:
+            domain: Agent domain
+            query: Search query
+            limit: Maximum number of results
+
+        Returns:
+            List of (document ID, BM25 score), best first
+        """
+        with self._lock:
+            return self._get(domain).search(query, limit)
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of indexed documents for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of documents in the lexical index
+        """
+        with self._lock:
+            return len(self._get(domain))
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's lexical index.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._indexes[domain] = LexicalIndex()
+            self._dirty.discard(domain)
+            self._path(domain).unlink(missing_ok=True)
+            self._mtimes[domain] = None
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """
+    Fuse several rankings with reciprocal rank fusion.
+
+    Each list contributes 1 / (k + rank) for every ID it contains, so only
+    ranks matter and BM25 and vector scores need no common scale.
+
+    Args:
+        rankings: Lists of IDs, best first
+        k: Rank constant (higher flattens the contribution of top ranks)
+
+    Returns:
+        List of (ID, fused score), best first
+    """
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,87 @@
+"""Maximal Marginal Relevance (MMR) Diversity Selection
+
+Neighbouring chunks overlap (chunk_overlap), so the nearest few results are
+often near-duplicates. MMR picks the final documents greedily from a larger
+candidate pool, trading relevance to the query against similarity to the
+documents already picked:
+
+    MMR(d) = lambda * relevance(d) - (1 - lambda) * max_{s in selected} sim(d, s)
+
+The candidate similarity matrix is computed once and each greedy step is a
+single vectorized update, so selection is O(n * k) NumPy work.
+"""
+
+import numpy as np
+
+
+def cosine_similarity_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity between every row of a and every row of b.
+
+    Args:
+        a: Array of shape (n, d)
+        b: Array of shape (m, d)
+
+    Returns:
+        Array of shape (n, m)
+    """
+    a_norm = np.linalg.norm(a, axis=1, keepdims=True)
+    b_norm = np.linalg.norm(b, axis=1, keepdims=True)
+    a = a / np.where(a_norm == 0, 1.0, a_norm)
+    b = b / np.where(b_norm == 0, 1.0, b_norm)
+    return a @ b.T
+
+
+def maximal_marginal_relevance(
+    query_embedding,
+    embeddings,
+    k: int,
+    lambda_mult: float = 0.7,
+    relevance=None
+) -> list[int]:
+    """
+    Select k diverse, relevant candidates.
+
+    Args:
+        query_embedding: Query embedding of shape (d,)
+        embeddings: Candidate embeddings of shape (n, d)
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+        relevance: Optional relevance per candidate, higher is better
+                   (defaults to cosine similarity with the query)
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        relevance = cosine_similarity_matrix(candidates, query)[:, 0]
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+
+    similarity = cosine_similarity_matrix(candidates, candidates)
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+
+    # Highest similarity of each candidate to anything selected so far
+    max_similarity = similarity[:, first].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[:, best])
+
+    return selected
+
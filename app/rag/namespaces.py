@@ -0,0 +1,53 @@
+"""Per-user vector store namespaces.
+
+With settings.vector_namespaces_enabled, every user gets their own
+collections and side indexes for each agent domain. The user of the
+current request is stored in a contextvar (set by run_workflow, or by the
+ingestion script), so the vector store resolves the right namespace
+without a user parameter on every retrieval call. Worker threads see the
+same namespace because agent runs are submitted with a copy of the
+caller's context.
+"""
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_namespace: ContextVar[Optional[str]] = ContextVar("vector_namespace", default=None)
+
+
+@contextmanager
+def namespace_scope(user_id: Optional[str]) -> Iterator[None]:
+    """
+    Route vector store calls to a user's namespace for the duration of a block.
+
+    Args:
+        user_id: User identifier, or None for the global knowledge base
+    """
+    token = _namespace.set(user_id)
+    try:
+        yield
+    finally:
+        _namespace.reset(token)
+
+
+def current_namespace() -> Optional[str]:
+    """Get the user whose namespace the current request uses, if any."""
+    return _namespace.get()
+
+
+def namespace_key(user_id: str) -> str:
+    """
+    Derive a storage-safe key from a user ID.
+
+    Collection names only allow a restricted character set, so user IDs
+    are hashed rather than embedded.
+
+    Args:
+        user_id: User identifier
+
+    Returns:
+        16-character hex key
+    """
+    return hashlib.sha1(user_id.encode()).hexdigest()[:16]
@@ -0,0 +1,211 @@
+"""Context Packing for RAG Prompts
+
+RAG context is the largest variable part of an agent prompt. Before the
+retrieved chunks are formatted, they are packed:
+
+1. Exact and near-duplicate chunks are dropped (domain and shared memory
+   can hold the same text).
+2. Adjacent chunks of the same source (consecutive chunk_index) are merged
+   and the overlap added by the text splitter is removed.
+3. The rest is trimmed to a token budget, best score first.
+"""
+
+from dataclasses import dataclass, field, replace
+
+from app.utils.text import content_tokens
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+# Longest splitter overlap searched for when merging neighbours (characters)
+MAX_CHUNK_OVERLAP = 200
+
+
+@dataclass
+class PackedContext:
+    """Result of packing retrieved documents into a token budget."""
+    documents: list = field(default_factory=list)  # RetrievedDocuments, best first
+    tokens: int = 0  # Tokens of the packed documents, headers included
+    tokens_saved: int = 0  # Compared to formatting every input document in full
+    duplicates: int = 0
+    merged: int = 0
+    dropped: int = 0
+
+
+def document_header(position: int, doc) -> str:
+    """
+    Format the header line introducing a document in the context.
+
+    Args:
+        position: 1-based position in the context
+        doc: RetrievedDocument
+
+    Returns:
+        Header line
+    """
+    source = doc.metadata.get('source', 'Unknown')
+    memory_type = "Shared Memory" if doc.domain == "shared" else f"{doc.domain.title()} Domain"
+    return f"[Document {position} - {memory_type} - Source: {source}]"
+
+
+def document_tokens(position: int, doc) -> int:
+    """
+    Count the tokens a document adds to the context.
+
+    Args:
+        position: 1-based position in the context
+        doc: RetrievedDocument
+
+    Returns:
+        Tokens of the header and content
+    """
+    return count_tokens(document_header(position, doc)) + count_tokens(doc.content)
+
+
+def _is_near_duplicate(tokens: set[str], kept: list[set[str]], threshold: float) -> bool:
+    """Check whether most of one chunk's words are covered by a kept chunk (either way round)."""
+    for other in kept:
+        smaller, larger = (tokens, other) if len(tokens) <= len(other) else (other, tokens)
+        if smaller and len(smaller & larger) / len(smaller) >= threshold:
+            return True
+    return False
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    for size in range(min(len(left), len(right), MAX_CHUNK_OVERLAP), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def remove_duplicates(documents: list, threshold: float = 0.9) -> tuple[list, int]:
+    """
+    Drop exact and near-duplicate documents, keeping the best-scored copy.
+
+    Args:
+        documents: RetrievedDocuments, best first
+        threshold: Share of the smaller chunk's words that must appear in a
+                   kept chunk for it to count as a near-duplicate
+
+    Returns:
+        Tuple of (kept documents, number dropped)
+    """
+    kept = []
+    kept_tokens = []
+    seen = set()
+
+    for doc in documents:
+        key = " ".join(doc.content.split()).lower()
+        tokens = content_tokens(doc.content)
+        if key in seen or _is_near_duplicate(tokens, kept_tokens, threshold):
+            continue
+        seen.add(key)
+        kept.append(doc)
+        kept_tokens.append(tokens)
+
+    return kept, len(documents) - len(kept)
+
+
+def merge_adjacent(documents: list) -> tuple[list, int]:
+    """
+    Merge chunks of the same source with consecutive chunk_index.
+
+    The merged document keeps the best score of its parts and the metadata
+    of its first chunk.
+
+    Args:
+        documents: RetrievedDocuments, best first
+
+    Returns:
+        Tuple of (documents best first, number of merges)
+    """
+    groups: dict[tuple, list] = {}
+    passthrough = []
+    for doc in documents:
+        index = doc.metadata.get("chunk_index")
+        if isinstance(index, int) and "source" in doc.metadata:
+            groups.setdefault((doc.domain, doc.metadata["source"]), []).append(doc)
+        else:
+            passthrough.append(doc)
+
+    result = list(passthrough)
+    merges = 0
+    for chunks in groups.values():
+        chunks.sort(key=lambda doc: doc.metadata["chunk_index"])
+        current = chunks[0]
+        last_index = current.metadata["chunk_index"]
+
+        for doc in chunks[1:]:
+            index = doc.metadata["chunk_index"]
+            if index == last_index + 1:
+                overlap = _overlap(current.content, doc.content)
+                separator = "" if overlap else "\n"
+                current = replace(
+                    current,
+                    content=current.content + separator + doc.content[overlap:],
+                    score=min(current.score, doc.score)
+                )
+                merges += 1
+            else:
+                result.append(current)
+                current = doc
+            last_index = index
+        result.append(current)
+
+    result.sort(key=lambda doc: doc.score)
+    return result, merges
+
+
+def pack_context(
+    documents: list,
+    token_budget: int,
+    duplicate_threshold: float = 0.9
+) -> PackedContext:
+    """
+    De-duplicate, merge and trim retrieved documents to a token budget.
+
+    Documents are taken best score first; one that does not fit is skipped
+    so smaller, lower-scored ones can still use the remaining budget. The
+    best document is truncated rather than dropped if it alone exceeds it.
+
+    Args:
+        documents: RetrievedDocuments (lower score is better)
+        token_budget: Maximum tokens for documents and their headers
+        duplicate_threshold: Near-duplicate threshold (see remove_duplicates)
+
+    Returns:
+        PackedContext with the documents to format, best first
+    """
+    original_tokens = sum(document_tokens(i, doc) for i, doc in enumerate(documents, 1))
+
+    ranked = sorted(documents, key=lambda doc: doc.score)
+    unique, duplicates = remove_duplicates(ranked, duplicate_threshold)
+    merged_docs, merged = merge_adjacent(unique)
+
+    packed = []
+    used = 0
+    dropped = 0
+    for doc in merged_docs:
+        cost = document_tokens(len(packed) + 1, doc)
+        if used + cost <= token_budget:
+            packed.append(doc)
+            used += cost
+            continue
+
+        if not packed:
+            header_tokens = count_tokens(document_header(1, doc))
+            content = truncate_to_tokens(doc.content, token_budget - header_tokens)
+            if content:
+                doc = replace(doc, content=content)
+                packed.append(doc)
+                used += document_tokens(1, doc)
+                continue
+        dropped += 1
+
+    return PackedContext(
+        documents=packed,
+        tokens=used,
+        tokens_saved=max(0, original_tokens - used),
+        duplicates=duplicates,
+        merged=merged,
+        dropped=dropped
+    )
@@ -0,0 +1,391 @@
+"""Quantized Embedding Search
+
+text-embedding-3-small vectors are 1536 float32 values (6 KB each). A
+quantized index keeps a copy of each domain's vectors as float16 (2 bytes
+per value) or scalar int8 with a per-vector scale (1 byte per value + 4
+bytes), and searches them in process. The best candidates are then
+rescored against the full-precision vectors, so the final ranking is
+exact over the shortlist.
+
+With quantization on, the float32 vectors are not given to ChromaDB: they
+live in the memory-mapped vector sidecar (see sidecar.py), and ChromaDB
+holds only documents, metadata and a placeholder embedding. Memory then
+holds the codes, not an HNSW graph over the full vectors; disk use stays
+about the same, as the sidecar replaces ChromaDB's copy. Domains written
+before quantization was turned on are moved over by
+`scripts/ingest_documents.py --rebuild-quantized`.
+"""
+
+import copy
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+QUANTIZATION_TYPES = ("float16", "int8")
+SEARCH_BLOCK_SIZE = 8192  # Rows dequantized at a time while searching
+
+
+def quantize(vectors, dtype: str) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantize vectors.
+
+    Args:
+        vectors: Array of shape (n, d)
+        dtype: "float16" or "int8"
+
+    Returns:
+        Tuple of (codes, per-vector scales or None for float16)
+
+    Raises:
+        ValueError: If dtype is not a supported quantization type
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unsupported quantization type: {dtype}. Must be one of {QUANTIZATION_TYPES}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Reconstruct float32 vectors from quantized codes.
+
+    Args:
+        codes: Quantized vectors of shape (n, d)
+        scales: Per-vector scales (int8) or None (float16)
+
+    Returns:
+        Array of shape (n, d)
+    """
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def squared_l2(query, vectors) -> np.ndarray:
+    """
+    Squared Euclidean distance from a query to each vector (the vector
+    store's default distance).
+
+    Args:
+        query: Array of shape (d,)
+        vectors: Array of shape (n, d)
+
+    Returns:
+        Array of shape (n,)
+    """
+    query = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return (vectors * vectors).sum(axis=1) - 2 * (vectors @ query) + query @ query
+
+
+class QuantizedIndex:
+    """Flat quantized vector index for one domain."""
+
+    def __init__(self, dtype: str):
+        """
+        Initialize an empty index.
+
+        Args:
+            dtype: "float16" or "int8"
+        """
+        if dtype not in QUANTIZATION_TYPES:
+            raise ValueError(f"Unsupported quantization type: {dtype}. Must be one of {QUANTIZATION_TYPES}")
+        self.dtype = dtype
+        self.ids: list[str] = []
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.norms: Optional[np.ndarray] = None  # Squared norms of the dequantized vectors
+        self._positions: dict[str, int] = {}
+        # Arrays above are views of these, which grow by doubling
+        self._buffers: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the codes and scales."""
+        if self.codes is None:
+            return 0
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def add(self, ids: list[str], vectors) -> int:
+        """
+        Quantize and add vectors.
+
+        IDs already in the index are skipped, matching the vector store.
+        Rows are appended in place into over-allocated arrays, so a run of
+        small additions does not copy the whole index each time.
+
+        Args:
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+        """
+        new = [(doc_id, vector) for doc_id, vector in zip(ids, vectors) if doc_id not in self._positions]
+        if not new:
+            return 0
+
+        codes, scales = quantize([vector for _, vector in new], self.dtype)
+        restored = dequantize(codes, scales)
+        norms = (restored * restored).sum(axis=1)
+
+        start, end = len(self.ids), len(self.ids) + len(new)
+        if self._buffers is None or end > len(self._buffers[0]):
+            self._grow(max(end, 2 * start), codes.shape[1])
+        buffer_codes, buffer_scales, buffer_norms = self._buffers
+        buffer_codes[start:end] = codes
+        buffer_norms[start:end] = norms
+        if buffer_scales is not None:
+            buffer_scales[start:end] = scales
+
+        for doc_id, _ in new:
+            self._positions[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+        # Rebind rather than mutate, so snapshots keep their own length
+        self.codes = buffer_codes[:end]
+        self.norms = buffer_norms[:end]
+        self.scales = buffer_scales[:end] if buffer_scales is not None else None
+        return len(new)
+
+    def _grow(self, capacity: int, dimensions: int):
+        """Move the rows into larger buffers."""
+        count = len(self.ids)
+        codes = np.empty((capacity, dimensions), dtype=self.dtype)
+        norms = np.empty(capacity, dtype=np.float32)
+        scales = np.empty(capacity, dtype=np.float32) if self.dtype == "int8" else None
+        if count:
+            codes[:count] = self.codes
+            norms[:count] = self.norms
+            if scales is not None:
+                scales[:count] = self.scales
+        self._buffers = (codes, scales, norms)
+
+    def snapshot(self) -> "QuantizedIndex":
+        """
+        Get a view of the vectors indexed so far, safe to search during add().
+
+        Returns:
+            Shallow copy of the index
+        """
+        return copy.copy(self)
+
+    def search(self, query, k: int) -> list[tuple[str, float]]:
+        """
+        Find the approximate nearest vectors.
+
+        Codes are dequantized SEARCH_BLOCK_SIZE rows at a time, so the
+        float32 working set stays bounded however large the index is.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (document ID, approximate squared L2 distance), nearest first
+        """
+        count = len(self.codes) if self.codes is not None else 0
+        if not count:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        dots = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_SIZE):
+            block = slice(start, start + SEARCH_BLOCK_SIZE)
+            dots[block] = self.codes[block].astype(np.float32) @ query
+        if self.scales is not None:
+            dots *= self.scales
+        distances = self.norms - 2 * dots + query @ query
+
+        k = min(k, count)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(self.ids[i], float(distances[i])) for i in top]
+
+    def save(self, path: Path):
+        """
+        Write the index to an .npz file.
+
+        Args:
+            path: Target file (written atomically)
+        """
+        arrays = {"ids": np.array(self.ids, dtype=str), "codes": self.codes}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, dtype: str) -> "QuantizedIndex":
+        """
+        Read an index written by save().
+
+        Args:
+            path: Index file
+            dtype: Expected quantization type
+
+        Returns:
+            QuantizedIndex instance
+        """
+        index = cls(dtype)
+        with np.load(path) as data:
+            ids = data["ids"].tolist()
+            codes = data["codes"]
+            scales = data["scales"] if "scales" in data else None
+        if codes.dtype != np.dtype(dtype):
+            raise ValueError(f"Index at {path} holds {codes.dtype}, expected {dtype}")
+
+        index.ids = ids
+        index.codes = codes
+        index.scales = scales
+        index.norms = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SEARCH_BLOCK_SIZE):
+            block = slice(start, start + SEARCH_BLOCK_SIZE)
+            restored = dequantize(codes[block], scales[block] if scales is not None else None)
+            index.norms[block] = (restored * restored).sum(axis=1)
+        index._positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        index._buffers = (codes, scales, index.norms)
+        return index
+
+
+class QuantizedIndexManager:
+    """
+    Loads, updates and persists the quantized index of each domain.
+
+    Indexes are loaded lazily on first use and reloaded when the file
+    changes on disk (e.g. after an ingestion run in another process).
+    Updates are written back immediately, or batched until flush() when
+    added with persist=False. Safe to share between the agent worker
+    threads; searches run on a snapshot, outside the lock.
+    """
+
+    def __init__(self, directory: str, dtype: str):
+        """
+        Initialize quantized index manager.
+
+        Args:
+            directory: Directory holding one index file per domain
+            dtype: "float16" or "int8"
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self._indexes: dict[str, QuantizedIndex] = {}
+        self._mtimes: dict[str, int | None] = {}  # File version each loaded index reflects
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.{self.dtype}.npz"
+
+    def _mtime(self, domain: str) -> int | None:
+        try:
+            return self._path(domain).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _get(self, domain: str) -> QuantizedIndex:
+        # Caller holds the lock. Unsaved additions win over the file
+        index = self._indexes.get(domain)
+        if domain in self._dirty:
+            return index
+        mtime = self._mtime(domain)
+        if index is None or mtime != self._mtimes.get(domain):
+            path = self._path(domain)
+            index = QuantizedIndex.load(path, self.dtype) if mtime is not None else QuantizedIndex(self.dtype)
+            self._indexes[domain] = index
+            self._mtimes[domain] = mtime
+        return index
+
+    def _write(self, domain: str):
+        # Caller holds the lock
+        self._indexes[domain].save(self._path(domain))
+        self._mtimes[domain] = self._mtime(domain)
+        self._dirty.discard(domain)
+
+    def add_documents(self, domain: str, ids: list[str], vectors, persist: bool = True) -> int:
+        """
+        Quantize and index vectors for a domain.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+            persist: Write the index now; False defers the write to flush()
+
+        Returns:
+            Number of vectors added
+        """
+        with self._lock:
+            added = self._get(domain).add(ids, vectors)
+            if added:
+                self._dirty.add(domain)
+            if persist and domain in self._dirty:
+                self._write(domain)
+            return added
+
+    def flush(self, domain: Optional[str] = None):
+        """
+        Write indexes with unsaved additions.
+
+        Args:
+            domain: Agent domain (all domains if None)
+        """
+        with self._lock:
+            for name in [domain] if domain is not None else list(self._dirty):
+                if name in self._dirty:
+                    self._write(name)
+
+    def search(self, domain: str, query, k: int) -> list[tuple[str, float]]:
+        """
+        Find a domain's approximate nearest vectors.
+
+        Args:
+            domain: Agent domain
+            query: Query embedding
+            k: Number of results
+
+        Returns:
+            List of (document ID, approximate squared L2 distance), nearest first
+        """
+        with self._lock:
+            # Additions after this are not searched
+            snapshot = self._get(domain).snapshot()
+        return snapshot.search(query, k)
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of indexed vectors for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of vectors in the quantized index
+        """
+        with self._lock:
+            return len(self._get(domain))
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's quantized index.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._indexes[domain] = QuantizedIndex(self.dtype)
+            self._dirty.discard(domain)
+            self._path(domain).unlink(missing_ok=True)
+            self._mtimes[domain] = None
@@ -4,29 +4,52 @@ Provides retrieval functions for querying vector stores and
 augmenting agent prompts with relevant context.
 """
 
-from typing import Optional, List, Dict
+import json
+import logging
+from typing import Optional, List, Tuple
 from dataclasses import dataclass
 
+from app.config.settings import settings
+from app.rag.lexical import reciprocal_rank_fusion
+from app.rag.mmr import maximal_marginal_relevance
+from app.rag.packing import document_header, pack_context
 from app.rag.stores import get_vector_store_manager
+from app.utils.cache import LRUCache
+from app.utils.memo import memoized
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
 class RetrievedDocument:
     """Represents a retrieved document with metadata."""
     content: str
-    score: float  # Distance/similarity score (lower is better for distance)
+    score: float  # Lower is better: vector distance, or 1 - normalized RRF score in hybrid mode
     metadata: dict
     domain: str
 
 
+# (document ID, document, embedding or None) before final selection
+Candidate = Tuple[str, RetrievedDocument, Optional[List[float]]]
+
+
+def _freeze(metadata_filter: Optional[dict]) -> Optional[str]:
+    """Make a metadata filter usable as part of a cache key."""
+    if not metadata_filter:
+        return None
+    return json.dumps(metadata_filter, sort_keys=True, default=str)
+
+
 class Retriever:
     """
     Handles retrieval from vector stores for RAG.
     """
     
     def __init__(self):
-        """Initialize retriever with vector store manager."""
+        """Initialize retriever with vector store manager and result cache."""
         self.vector_store = get_vector_store_manager()
+        self.cache = LRUCache(settings.retrieval_cache_size, name="retrieval_cache")
     
     def retrieve(
         self,
@@ -34,76 +57,281 @@ class Retriever:
         domain: str,
         top_k: int = 3,
         metadata_filter: Optional[dict] = None,
-        include_shared: bool = True
+        include_shared: bool = True,
+        query_embedding: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
     ) -> List[RetrievedDocument]:
         """
         Retrieve relevant documents for a query.
         
+        The query is embedded at most once, even when both the agent domain
+        and shared memory are searched. In hybrid mode the vector and BM25
+        rankings of each searched domain are fused with reciprocal rank
+        fusion, so exact identifiers are found without raising top_k.
+        
+        When diversity selection is on for the domain, more candidates are
+        fetched (with their embeddings) and the final top_k are picked by
+        Maximal Marginal Relevance, so overlapping neighbour chunks do not
+        fill every slot.
+        
+        Results are cached per (query, domain, top_k, metadata_filter, ...),
+        the vector store namespace and the generation of every searched
+        domain, so a write to a domain invalidates its cached results. Within a request, identical calls
+        are also deduplicated by the request memo.
+        
         Args:
             query: Search query
             domain: Agent domain to search in
             top_k: Number of documents to retrieve
             metadata_filter: Optional metadata filters
             include_shared: If True, also search shared memory (default: True)
+            query_embedding: Precomputed embedding of the query
+            mode: "vector" or "hybrid" (defaults to settings.retrieval_mode)
+            mmr_lambda: MMR relevance/diversity trade-off (defaults to the
+                        domain's setting; 1.0 disables diversity selection)
             
         Returns:
             List of retrieved documents
         """
-        all_documents = []
+        mode = mode or settings.retrieval_mode
+        if mmr_lambda is None:
+            mmr_lambda = self.mmr_lambda(domain)
+        search_domains = [domain, "shared"] if include_shared else [domain]
         
-        # Query agent-specific domain
-        count = self.vector_store.count_documents(domain)
-        if count > 0:
-            results = self.vector_store.query(
-                domain=domain,
-                query_text=query,
-                n_results=top_k,
-                metadata_filter=metadata_filter
-            )
+        key = (
+            query, domain, top_k, _freeze(metadata_filter), include_shared, mode, mmr_lambda,
+            self.vector_store.namespace().name,
+            tuple(self.vector_store.generation(d) for d in search_domains)
+        )
+        
+        def search() -> tuple:
+            if self.cache.maxsize > 0:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            documents = tuple(self._search(
+                query, search_domains, top_k, metadata_filter, query_embedding, mode, mmr_lambda
+            ))
+            self.cache.put(key, documents)
+            return documents
+        
+        # Identical retrievals within one request run once
+        return list(memoized("retrieval", key, search))
+    
+    def _search(
+        self,
+        query: str,
+        search_domains: List[str],
+        top_k: int,
+        metadata_filter: Optional[dict],
+        query_embedding: Optional[List[float]],
+        mode: str,
+        mmr_lambda: float
+    ) -> List[RetrievedDocument]:
+        """
+        Search the given domains and select the final top_k documents.
+        
+        Returns:
+            Up to top_k documents, best first
+        """
+        diversify = mmr_lambda < 1.0
+        fetch_k = max(top_k, settings.mmr_fetch_k) if diversify else top_k
+        candidates = []
+        
+        for search_domain in search_domains:
+            if self.vector_store.count_documents(search_domain) == 0:
+                continue
+            if query_embedding is None:
+                query_embedding = self.vector_store.embed_query(query)
             
-            # Parse results from agent domain
-            if results['documents'] and len(results['documents']) > 0:
-                for i in range(len(results['documents'][0])):
-                    doc = RetrievedDocument(
-                        content=results['documents'][0][i],
-                        score=results['distances'][0][i] if 'distances' in results else 0.0,
-                        metadata=results['metadatas'][0][i] if results['metadatas'] else {},
-                        domain=domain
-                    )
-                    all_documents.append(doc)
-        
-        # Query shared memory if enabled
-        if include_shared:
-            shared_count = self.vector_store.count_documents("shared")
-            if shared_count > 0:
-                shared_results = self.vector_store.query(
-                    domain="shared",
-                    query_text=query,
-                    n_results=top_k,
-                    metadata_filter=metadata_filter
+            search = self._hybrid_search if mode == "hybrid" else self._vector_search
+            candidates.extend(search(
+                query, search_domain, fetch_k, metadata_filter, query_embedding,
+                include_embeddings=diversify
+            ))
+        
+        # Sort by score (lower is better)
+        candidates.sort(key=lambda candidate: candidate[1].score)
+        candidates = candidates[:fetch_k]
+        
+        if diversify and len(candidates) > top_k:
+            candidates = self._diversify(candidates, query_embedding, top_k, mmr_lambda, mode)
+        
+        return [doc for _, doc, _ in candidates[:top_k]]
+    
+    def mmr_lambda(self, domain: str) -> float:
+        """
+        Get the MMR trade-off configured for an agent domain.
+        
+        Args:
+            domain: Agent domain
+            
+        Returns:
+            Lambda in [0, 1] (1.0 means diversity selection is off)
+        """
+        if not settings.mmr_enabled:
+            return 1.0
+        return settings.mmr_domain_lambdas.get(domain, settings.mmr_lambda)
+    
+    def _vector_search(
+        self,
+        query: str,
+        domain: str,
+        n_results: int,
+        metadata_filter: Optional[dict],
+        query_embedding: List[float],
+        include_embeddings: bool = False
+    ) -> List[Candidate]:
+        """
+        Query one domain's vector store.
+        
+        Returns:
+            List of (document ID, document, embedding or None), nearest first
+        """
+        results = self.vector_store.query(
+            domain=domain,
+            query_text=query,
+            n_results=n_results,
+            metadata_filter=metadata_filter,
+            query_embedding=query_embedding,
+            include_embeddings=include_embeddings
+        )
+        
+        hits = []
+        if results['documents'] and len(results['documents']) > 0:
+            for i in range(len(results['documents'][0])):
+                doc = RetrievedDocument(
+                    content=results['documents'][0][i],
+                    score=results['distances'][0][i] if 'distances' in results else 0.0,
+                    metadata=results['metadatas'][0][i] if results['metadatas'] else {},
+                    domain=domain
                 )
-                
-                # Parse results from shared memory
-                if shared_results['documents'] and len(shared_results['documents']) > 0:
-                    for i in range(len(shared_results['documents'][0])):
-                        doc = RetrievedDocument(
-                            content=shared_results['documents'][0][i],
-                            score=shared_results['distances'][0][i] if 'distances' in shared_results else 0.0,
-                            metadata=shared_results['metadatas'][0][i] if shared_results['metadatas'] else {},
-                            domain="shared"
-                        )
-                        all_documents.append(doc)
-        
-        # Sort by score (lower is better for distance) and return top_k
-        all_documents.sort(key=lambda x: x.score)
-        return all_documents[:top_k]
+                embedding = results['embeddings'][0][i] if include_embeddings else None
+                hits.append((results['ids'][0][i], doc, embedding))
+        return hits
     
-    def format_context(self, documents: List[RetrievedDocument]) -> str:
+    def _hybrid_search(
+        self,
+        query: str,
+        domain: str,
+        top_k: int,
+        metadata_filter: Optional[dict],
+        query_embedding: List[float],
+        include_embeddings: bool = False
+    ) -> List[Candidate]:
+        """
+        Fuse one domain's vector and BM25 rankings.
+        
+        Documents found only by BM25 are fetched from the vector store by ID
+        (which also applies the metadata filter). Scores are 1 minus the RRF
+        score normalized by its maximum, so lower stays better.
+        
+        Returns:
+            Up to top_k (document ID, document, embedding or None), best first
+        """
+        depth = max(top_k, settings.hybrid_candidates)
+        vector_hits = self._vector_search(
+            query, domain, depth, metadata_filter, query_embedding, include_embeddings
+        )
+        lexical_hits = self.vector_store.lexical_index.search(domain, query, depth)
+        
+        k = settings.hybrid_rrf_k
+        fused = reciprocal_rank_fusion(
+            [[doc_id for doc_id, _, _ in vector_hits], [doc_id for doc_id, _ in lexical_hits]],
+            k=k
+        )[:top_k]
+        
+        candidates = {doc_id: (doc, embedding) for doc_id, doc, embedding in vector_hits}
+        missing = [doc_id for doc_id, _ in fused if doc_id not in candidates]
+        if missing:
+            fetched = self.vector_store.get_documents(
+                domain, missing, metadata_filter, include_embeddings=include_embeddings
+            )
+            for i, doc_id in enumerate(fetched['ids']):
+                doc = RetrievedDocument(
+                    content=fetched['documents'][i],
+                    score=0.0,
+                    metadata=fetched['metadatas'][i] or {},
+                    domain=domain
+                )
+                candidates[doc_id] = (doc, fetched['embeddings'][i] if include_embeddings else None)
+            metrics.increment("retrieval.lexical_only", len(fetched['ids']))
+        
+        best = 2.0 / (k + 1)
+        results = []
+        for doc_id, fused_score in fused:
+            if doc_id not in candidates:
+                continue  # Filtered out by metadata_filter
+            doc, embedding = candidates[doc_id]
+            doc.score = 1.0 - fused_score / best
+            results.append((doc_id, doc, embedding))
+        return results
+    
+    def _diversify(
+        self,
+        candidates: List[Candidate],
+        query_embedding: List[float],
+        top_k: int,
+        mmr_lambda: float,
+        mode: str
+    ) -> List[Candidate]:
+        """
+        Pick top_k candidates by Maximal Marginal Relevance.
+        
+        In hybrid mode relevance is the fused score, so BM25 matches keep
+        their boost; in vector mode it is cosine similarity to the query.
+        
+        Returns:
+            Selected candidates, still ordered by score
+        """
+        relevance = None
+        if mode == "hybrid":
+            relevance = [1.0 - doc.score for _, doc, _ in candidates]
+        
+        selected = maximal_marginal_relevance(
+            query_embedding,
+            [embedding for _, _, embedding in candidates],
+            k=top_k,
+            lambda_mult=mmr_lambda,
+            relevance=relevance
+        )
+        selected.sort()
+        if selected != list(range(top_k)):
+            metrics.increment("retrieval.mmr_reranked")
+        return [candidates[i] for i in selected]
+    
+    def has_documents(self, domain: str, include_shared: bool = True) -> bool:
+        """
+        Check whether a retrieval for this domain would search anything.
+        
+        Args:
+            domain: Agent domain
+            include_shared: Whether shared memory is searched too
+            
+        Returns:
+            True if the domain (or shared memory) has documents
+        """
+        if self.vector_store.count_documents(domain) > 0:
+            return True
+        return include_shared and self.vector_store.count_documents("shared") > 0
+    
+    def format_context(
+        self,
+        documents: List[RetrievedDocument],
+        token_budget: Optional[int] = None
+    ) -> str:
         """
         Format retrieved documents into a context string for LLM.
         
+        With context packing on, duplicates are dropped, adjacent chunks
+        merged and the documents trimmed to the token budget first; the
+        tokens saved are counted in the context.tokens_saved metric.
+        
         Args:
             documents: List of retrieved documents
+            token_budget: Token budget for the documents (defaults to
+                          settings.context_token_budget)
             
         Returns:
             Formatted context string
@@ -111,12 +339,25 @@ class Retriever:
         if not documents:
             return ""
         
+        if settings.context_packing_enabled:
+            packed = pack_context(
+                documents,
+                token_budget=token_budget or settings.context_token_budget,
+                duplicate_threshold=settings.context_duplicate_threshold
+            )
+            metrics.increment("context.tokens_in", packed.tokens + packed.tokens_saved)
+            metrics.increment("context.tokens_saved", packed.tokens_saved)
+            if packed.tokens_saved:
+                logger.debug(
+                    f"Packed context: {packed.tokens} tokens, saved {packed.tokens_saved} "
+                    f"({packed.duplicates} duplicates, {packed.merged} merges, {packed.dropped} over budget)"
+                )
+            documents = packed.documents
+        
         context_parts = ["Retrieved Context:"]
         
         for i, doc in enumerate(documents, 1):
-            source = doc.metadata.get('source', 'Unknown')
-            memory_type = "Shared Memory" if doc.domain == "shared" else f"{doc.domain.title()} Domain"
-            context_parts.append(f"\n[Document {i} - {memory_type} - Source: {source}]")
+            context_parts.append(f"\n{document_header(i, doc)}")
             context_parts.append(doc.content)
         
         return "\n".join(context_parts)
@@ -127,7 +368,10 @@ class Retriever:
         domain: str,
         top_k: int = 3,
         metadata_filter: Optional[dict] = None,
-        include_shared: bool = True
+        include_shared: bool = True,
+        query_embedding: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
     ) -> str:
         """
         Retrieve documents and format them as context string.
@@ -140,6 +384,9 @@ class Retriever:
             top_k: Number of documents to retrieve
             metadata_filter: Optional metadata filters
             include_shared: If True, also search shared memory (default: True)
+            query_embedding: Precomputed embedding of the query
+            mode: "vector" or "hybrid" (defaults to settings.retrieval_mode)
+            mmr_lambda: MMR trade-off (defaults to the domain's setting)
             
         Returns:
             Formatted context string
@@ -149,7 +396,10 @@ class Retriever:
             domain=domain,
             top_k=top_k,
             metadata_filter=metadata_filter,
-            include_shared=include_shared
+            include_shared=include_shared,
+            query_embedding=query_embedding,
+            mode=mode,
+            mmr_lambda=mmr_lambda
         )
         
         return self.format_context(documents)
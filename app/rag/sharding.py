@@ -0,0 +1,467 @@
+"""Sharded Exact Vector Search Across Worker Processes
+
+One Python process searching a large collection is CPU-bound and holds the
+GIL. In sharded mode a domain's vectors are split across N shards, each
+served by its own worker process: a batch of queries is scattered to every
+shard, each worker returns its local top-k, and the results are merged
+(gathered) in the calling process. Shard i of every domain is always
+served by worker i, so each worker keeps only its own shards mapped.
+
+Each domain's shards live in one directory:
+
+    meta.json       format version, dimensions, epoch and per-shard counts
+    shard-<i>.f32   raw float32 vectors, appended
+    shard-<i>.ids   one document ID per line, appended
+
+meta.json is replaced last, so a partially written append is ignored.
+New vectors go to the least-filled shards; rebalancing rewrites the
+domain evenly (optionally into a different number of shards) and bumps
+the epoch so workers drop their cached copies. A domain recreated after a
+reset starts at a random epoch, so it never reuses the cache key of the
+shards it replaces.
+"""
+
+import json
+import multiprocessing
+import random
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.utils.deadline import DeadlineExceeded, remaining
+
+SHARD_FORMAT_VERSION = 1
+WORKER_CACHE_SIZE = 16  # Shards kept mapped per worker process
+
+# Worker-process state: (shard path, epoch, dimensions) -> (count, ids, vectors, norms)
+_open_shards: dict[tuple[str, int, int], tuple] = {}
+
+
+def new_epoch() -> int:
+    """Get a random starting epoch for a newly created domain index."""
+    return random.getrandbits(62)
+
+
+def _shard_data(base: str, epoch: int, count: int, dimensions: int) -> tuple:
+    """Map a shard in a worker process (cached until it grows or is rewritten)."""
+    key = (base, epoch, dimensions)
+    cached = _open_shards.get(key)
+    if cached is not None and cached[0] == count:
+        return cached
+
+    vectors = np.memmap(f"{base}.f32", dtype=np.float32, mode="r", shape=(count, dimensions))
+    with open(f"{base}.ids", encoding="utf-8") as f:
+        ids = [line.rstrip("\n") for _, line in zip(range(count), f)]
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+
+    _open_shards.pop(key, None)
+    while len(_open_shards) >= WORKER_CACHE_SIZE:
+        _open_shards.pop(next(iter(_open_shards)))
+    _open_shards[key] = (count, ids, vectors, norms)
+    return _open_shards[key]
+
+
+def search_shard(
+    base: str,
+    epoch: int,
+    count: int,
+    dimensions: int,
+    queries: np.ndarray,
+    k: int
+) -> list[list[tuple[str, float]]]:
+    """
+    Exact top-k search of one shard (runs in a worker process).
+
+    Args:
+        base: Shard file path without extension
+        epoch: Layout epoch of the shard's domain
+        count: Number of committed vectors in the shard
+        dimensions: Vector size
+        queries: Query embeddings, shape (q, dimensions)
+        k: Results per query
+
+    Returns:
+        Per query, a list of (document ID, squared L2 distance), nearest first
+    """
+    if count == 0:
+        return [[] for _ in queries]
+
+    _, ids, vectors, norms = _shard_data(base, epoch, count, dimensions)
+    queries = np.asarray(queries, dtype=np.float32)
+    distances = norms[None, :] - 2 * (queries @ vectors.T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    k = min(k, count)
+    results = []
+    for row in distances:
+        top = np.argpartition(row, k - 1)[:k]
+        top = top[np.argsort(row[top])]
+        results.append([(ids[i], float(row[i])) for i in top])
+    return results
+
+
+def _warm_up() -> None:
+    """No-op task that makes a worker process start (and import) eagerly."""
+
+
+class ShardWorkerPool:
+    """N single-process executors; shard i is always served by worker i mod N."""
+
+    def __init__(self, workers: int):
+        """
+        Start the worker processes.
+
+        Args:
+            workers: Number of worker processes
+        """
+        self.workers = workers
+        context = multiprocessing.get_context("spawn")  # No fork of a threaded server
+        self._executors = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(workers)]
+        for executor in self._executors:
+            executor.submit(_warm_up)
+
+    def submit(self, shard: int, *args) -> Future:
+        """
+        Run search_shard on the worker serving a shard.
+
+        Args:
+            shard: Shard index
+            *args: search_shard arguments
+
+        Returns:
+            Future of the shard's results
+        """
+        return self._executors[shard % self.workers].submit(search_shard, *args)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardedIndex:
+    """The shards of one domain, as seen by the coordinating process."""
+
+    def __init__(self, directory: Path, counts: list[int], dimensions: int, epoch: int = 0):
+        """
+        Initialize a sharded index.
+
+        Args:
+            directory: Shard directory
+            counts: Committed vectors per shard
+            dimensions: Vector size
+            epoch: Layout epoch (bumped on rebalance)
+        """
+        self.directory = directory
+        self.counts = counts
+        self.dimensions = dimensions
+        self.epoch = epoch
+        self._known: set[str] = set()
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def shards(self) -> int:
+        return len(self.counts)
+
+    def _base(self, shard: int) -> Path:
+        return self.directory / f"shard-{shard}"
+
+    @classmethod
+    def create(cls, directory: Path, shards: int, dimensions: int, epoch: int = 0) -> "ShardedIndex":
+        """
+        Create an empty sharded index on disk.
+
+        Args:
+            directory: Shard directory (created)
+            shards: Number of shards
+            dimensions: Vector size
+            epoch: Layout epoch
+
+        Returns:
+            ShardedIndex instance
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        index = cls(directory, [0] * shards, dimensions, epoch)
+        for shard in range(shards):
+            for suffix in (".f32", ".ids"):
+                Path(f"{index._base(shard)}{suffix}").write_bytes(b"")
+        index._write_meta()
+        return index
+
+    @classmethod
+    def load(cls, directory: Path) -> "ShardedIndex":
+        """
+        Open a sharded index.
+
+        Args:
+            directory: Shard directory
+
+        Returns:
+            ShardedIndex instance
+        """
+        meta = json.loads((directory / "meta.json").read_text())
+        if meta.get("version") != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format version at {directory}: {meta.get('version')}")
+        index = cls(directory, meta["counts"], meta["dimensions"], meta["epoch"])
+        for shard, count in enumerate(index.counts):
+            index._known.update(index.shard_ids(shard, count))
+        return index
+
+    def shard_ids(self, shard: int, count: Optional[int] = None) -> list[str]:
+        """Read the committed IDs of a shard."""
+        count = self.counts[shard] if count is None else count
+        with open(f"{self._base(shard)}.ids", encoding="utf-8") as f:
+            return [line.rstrip("\n") for _, line in zip(range(count), f)]
+
+    def shard_vectors(self, shard: int) -> np.ndarray:
+        """Map the committed vectors of a shard."""
+        if not self.counts[shard]:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        return np.memmap(
+            f"{self._base(shard)}.f32", dtype=np.float32, mode="r",
+            shape=(self.counts[shard], self.dimensions)
+        )
+
+    def _write_meta(self):
+        meta = {
+            "version": SHARD_FORMAT_VERSION,
+            "dimensions": self.dimensions,
+            "epoch": self.epoch,
+            "counts": self.counts,
+        }
+        tmp_path = self.directory / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        tmp_path.replace(self.directory / "meta.json")
+
+    def add(self, ids: list[str], vectors) -> int:
+        """
+        Append vectors to the least-filled shards.
+
+        IDs already in the index are skipped, matching the vector store.
+
+        Args:
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+        """
+        new = [(doc_id, vector) for doc_id, vector in zip(ids, vectors) if doc_id not in self._known]
+        if not new:
+            return 0
+
+        # Fill shards towards equal size
+        counts = list(self.counts)
+        assignments: dict[int, list] = {}
+        for doc_id, vector in new:
+            shard = counts.index(min(counts))
+            counts[shard] += 1
+            assignments.setdefault(shard, []).append((doc_id, vector))
+
+        for shard, rows in assignments.items():
+            with open(f"{self._base(shard)}.f32", "ab") as f:
+                f.write(np.asarray([vector for _, vector in rows], dtype=np.float32).tobytes())
+            with open(f"{self._base(shard)}.ids", "a", encoding="utf-8") as f:
+                f.writelines(f"{doc_id}\n" for doc_id, _ in rows)
+
+        self.counts = counts
+        self._known.update(doc_id for doc_id, _ in new)
+        self._write_meta()
+        return len(new)
+
+    def search(self, pool: ShardWorkerPool, queries, k: int) -> list[list[tuple[str, float]]]:
+        """
+        Scatter a batch of queries to every shard and gather the top-k.
+
+        Args:
+            pool: Worker pool serving the shards
+            queries: Query embeddings
+            k: Results per query
+
+        Returns:
+            Per query, a list of (document ID, squared L2 distance), nearest first
+
+        Raises:
+            DeadlineExceeded: If the request deadline passes while waiting
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        futures = [
+            pool.submit(shard, str(self._base(shard)), self.epoch, count, self.dimensions, queries, k)
+            for shard, count in enumerate(self.counts)
+            if count
+        ]
+        merged: list[list[tuple[str, float]]] = [[] for _ in queries]
+        try:
+            for future in futures:
+                for hits, shard_hits in zip(merged, future.result(timeout=remaining())):
+                    hits.extend(shard_hits)
+        except FutureTimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded waiting for vector shards") from None
+        return [sorted(hits, key=lambda hit: hit[1])[:k] for hits in merged]
+
+    def rebalance(self, shards: Optional[int] = None) -> "ShardedIndex":
+        """
+        Rewrite the index with vectors spread evenly over the shards.
+
+        The new layout is written next to the old one and swapped in, with
+        the epoch bumped so worker processes drop cached shards.
+
+        Args:
+            shards: New number of shards (default: keep the current number)
+
+        Returns:
+            The rebalanced ShardedIndex
+        """
+        shards = shards or self.shards
+        staging = self.directory.with_name(self.directory.name + ".rebalance")
+        shutil.rmtree(staging, ignore_errors=True)
+        rebalanced = ShardedIndex.create(staging, shards, self.dimensions, self.epoch + 1)
+        for shard in range(self.shards):
+            rebalanced.add(self.shard_ids(shard), self.shard_vectors(shard))
+
+        retired = self.directory.with_name(self.directory.name + ".old")
+        shutil.rmtree(retired, ignore_errors=True)
+        self.directory.rename(retired)
+        staging.rename(self.directory)
+        shutil.rmtree(retired, ignore_errors=True)
+
+        rebalanced.directory = self.directory
+        return rebalanced
+
+
+class ShardedIndexManager:
+    """
+    Loads, updates and rebalances the sharded index of each domain.
+
+    Safe to share between the agent worker threads.
+    """
+
+    def __init__(self, directory: str, shards: int, pool: ShardWorkerPool):
+        """
+        Initialize sharded index manager.
+
+        Args:
+            directory: Directory holding one shard directory per domain
+            shards: Shards for newly created domain indexes
+            pool: Worker processes serving the shards
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shards = shards
+        self.pool = pool
+        self._indexes: dict[str, Optional[ShardedIndex]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.shards"
+
+    def _get(self, domain: str) -> Optional[ShardedIndex]:
+        # Caller holds the lock
+        if domain not in self._indexes:
+            path = self._path(domain)
+            self._indexes[domain] = ShardedIndex.load(path) if (path / "meta.json").exists() else None
+        return self._indexes[domain]
+
+    def add_documents(self, domain: str, ids: list[str], vectors) -> int:
+        """
+        Add vectors to a domain's shards.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+        """
+        if not ids:
+            return 0
+        with self._lock:
+            index = self._get(domain)
+            if index is None:
+                index = ShardedIndex.create(self._path(domain), self.shards, len(vectors[0]), new_epoch())
+                self._indexes[domain] = index
+            return index.add(ids, vectors)
+
+    def search_batch(self, domain: str, queries, k: int) -> list[list[tuple[str, float]]]:
+        """
+        Exact top-k search of a domain for a batch of queries.
+
+        Args:
+            domain: Agent domain
+            queries: Query embeddings
+            k: Results per query
+
+        Returns:
+            Per query, a list of (document ID, squared L2 distance), nearest first
+        """
+        with self._lock:
+            index = self._get(domain)
+            if index is None:
+                return [[] for _ in queries]
+            # Snapshot the committed layout; appends after this are not searched
+            snapshot = ShardedIndex(index.directory, list(index.counts), index.dimensions, index.epoch)
+        return snapshot.search(self.pool, queries, k)
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of sharded vectors for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of vectors across all shards
+        """
+        with self._lock:
+            index = self._get(domain)
+            return len(index) if index is not None else 0
+
+    def shard_counts(self, domain: str) -> list[int]:
+        """
+        Get the number of vectors in each of a domain's shards.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Vectors per shard (empty if the domain is not sharded yet)
+        """
+        with self._lock:
+            index = self._get(domain)
+            return list(index.counts) if index is not None else []
+
+    def rebalance(self, domain: str, shards: Optional[int] = None) -> list[int]:
+        """
+        Spread a domain's vectors evenly, optionally over a new number of shards.
+
+        Args:
+            domain: Agent domain
+            shards: New number of shards (default: the manager's setting)
+
+        Returns:
+            Vectors per shard after rebalancing
+        """
+        with self._lock:
+            index = self._get(domain)
+            if index is None:
+                return []
+            index = index.rebalance(shards or self.shards)
+            self._indexes[domain] = index
+            return list(index.counts)
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's shards.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._indexes[domain] = None
+            shutil.rmtree(self._path(domain), ignore_errors=True)
@@ -0,0 +1,368 @@
+"""Full-Precision Vector Sidecar
+
+With vector quantization enabled, ChromaDB keeps only the documents and
+metadata of a domain (each record gets a one-value placeholder embedding),
+and the float32 vectors live here instead. They are memory-mapped, so
+rescoring a quantized shortlist pages in only the shortlisted rows, and
+ChromaDB no longer holds an HNSW graph over every full vector in memory.
+
+Each domain's vectors live in one directory:
+
+    meta.json       format version, dimensions and vector count
+    vectors.f32     raw float32 vectors, appended
+    ids.txt         one document ID per line, appended
+
+meta.json is replaced last, so a partially written append is ignored.
+"""
+
+import copy
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+SIDECAR_FORMAT_VERSION = 1
+SCAN_BLOCK_SIZE = 8192  # Rows scored at a time by exact search
+
+
+class VectorSidecar:
+    """Append-only float32 vectors of one domain, addressed by document ID."""
+
+    def __init__(self, directory: Path, dimensions: int):
+        """
+        Initialize an empty sidecar.
+
+        Args:
+            directory: Sidecar directory
+            dimensions: Vector size
+        """
+        self.directory = directory
+        self.dimensions = dimensions
+        self.ids: list[str] = []
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._positions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def create(cls, directory: Path, dimensions: int) -> "VectorSidecar":
+        """
+        Create an empty sidecar on disk, replacing any existing one.
+
+        Args:
+            directory: Sidecar directory
+            dimensions: Vector size
+
+        Returns:
+            VectorSidecar instance
+        """
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        for name in ("vectors.f32", "ids.txt"):
+            (directory / name).write_bytes(b"")
+        sidecar = cls(directory, dimensions)
+        sidecar._write_meta()
+        return sidecar
+
+    @classmethod
+    def load(cls, directory: Path) -> "VectorSidecar":
+        """
+        Open a sidecar; vectors are memory-mapped, not read.
+
+        Args:
+            directory: Sidecar directory
+
+        Returns:
+            VectorSidecar instance
+        """
+        meta = json.loads((directory / "meta.json").read_text())
+        if meta.get("version") != SIDECAR_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector sidecar version at {directory}: {meta.get('version')}")
+
+        sidecar = cls(directory, meta["dimensions"])
+        count = meta["count"]
+        with open(directory / "ids.txt", encoding="utf-8") as f:
+            sidecar.ids = [line.rstrip("\n") for _, line in zip(range(count), f)]
+        sidecar._positions = {doc_id: i for i, doc_id in enumerate(sidecar.ids)}
+        sidecar.vectors = sidecar._map(count)
+        return sidecar
+
+    def _map(self, count: int) -> np.ndarray:
+        if not count:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        return np.memmap(
+            self.directory / "vectors.f32", dtype=np.float32, mode="r", shape=(count, self.dimensions)
+        )
+
+    def _write_meta(self):
+        meta = {"version": SIDECAR_FORMAT_VERSION, "dimensions": self.dimensions, "count": len(self.ids)}
+        tmp_path = self.directory / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        tmp_path.replace(self.directory / "meta.json")
+
+    def add(self, ids: list[str], vectors) -> int:
+        """
+        Append vectors.
+
+        IDs already stored are skipped, matching the vector store.
+
+        Args:
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+
+        Raises:
+            ValueError: If the vectors are not of the sidecar's size
+        """
+        new = [(doc_id, vector) for doc_id, vector in zip(ids, vectors) if doc_id not in self._positions]
+        if not new:
+            return 0
+        rows = np.asarray([vector for _, vector in new], dtype=np.float32)
+        if rows.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {rows.shape[1]}")
+
+        with open(self.directory / "vectors.f32", "ab") as f:
+            f.write(rows.tobytes())
+        with open(self.directory / "ids.txt", "a", encoding="utf-8") as f:
+            f.writelines(f"{doc_id}\n" for doc_id, _ in new)
+        for doc_id, _ in new:
+            self._positions[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+        self._write_meta()
+        self.vectors = self._map(len(self.ids))
+        return len(new)
+
+    def get(self, ids: list[str]) -> list[Optional[np.ndarray]]:
+        """
+        Read vectors by document ID.
+
+        Args:
+            ids: Document IDs
+
+        Returns:
+            One float32 vector per ID (None for unknown IDs)
+        """
+        count = len(self.vectors)
+        rows = [self._positions.get(doc_id) for doc_id in ids]
+        return [
+            np.array(self.vectors[row]) if row is not None and row < count else None
+            for row in rows
+        ]
+
+    def snapshot(self) -> "VectorSidecar":
+        """
+        Get a view of the vectors stored so far, safe to search during add().
+
+        Returns:
+            Shallow copy of the sidecar
+        """
+        return copy.copy(self)
+
+    def search(self, query, k: int, ids: Optional[list[str]] = None) -> list[tuple[str, float]]:
+        """
+        Exact nearest-neighbour search, scanning SCAN_BLOCK_SIZE rows at a time.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            ids: Only consider these document IDs (None for all)
+
+        Returns:
+            List of (document ID, squared L2 distance), nearest first
+        """
+        count = len(self.vectors)
+        if ids is None:
+            rows = np.arange(count)
+        else:
+            rows = np.array(
+                [row for row in map(self._positions.get, ids) if row is not None and row < count],
+                dtype=np.int64
+            )
+        if not len(rows):
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        distances = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SCAN_BLOCK_SIZE):
+            block = np.asarray(self.vectors[rows[start:start + SCAN_BLOCK_SIZE]])
+            distances[start:start + len(block)] = ((block - query) ** 2).sum(axis=1)
+
+        k = min(k, len(rows))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [(self.ids[rows[i]], float(distances[i])) for i in top]
+
+
+class VectorSidecarManager:
+    """
+    Stores, loads and swaps the vector sidecar of each domain.
+
+    A sidecar is reloaded when another process (e.g. ingestion) changes it.
+    Safe to share between the agent worker threads; searches run on a
+    snapshot, outside the lock.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize vector sidecar manager.
+
+        Args:
+            directory: Directory holding one sidecar per domain
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sidecars: dict[str, Optional[VectorSidecar]] = {}
+        self._mtimes: dict[str, Optional[int]] = {}  # meta.json version each loaded sidecar reflects
+        self._lock = threading.Lock()
+
+    def _path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.vectors"
+
+    def _staging_path(self, domain: str) -> Path:
+        return self.directory / f"{domain}.vectors.staging"
+
+    def _mtime(self, domain: str) -> Optional[int]:
+        try:
+            return (self._path(domain) / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _get(self, domain: str) -> Optional[VectorSidecar]:
+        # Caller holds the lock
+        mtime = self._mtime(domain)
+        if domain not in self._sidecars or mtime != self._mtimes.get(domain):
+            self._sidecars[domain] = VectorSidecar.load(self._path(domain)) if mtime is not None else None
+            self._mtimes[domain] = mtime
+        return self._sidecars[domain]
+
+    def add_documents(self, domain: str, ids: list[str], vectors) -> int:
+        """
+        Store vectors for a domain.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            vectors: Embeddings, one per ID
+
+        Returns:
+            Number of vectors added
+        """
+        if not len(ids):
+            return 0
+        with self._lock:
+            sidecar = self._get(domain)
+            if sidecar is None:
+                sidecar = VectorSidecar.create(self._path(domain), len(vectors[0]))
+                self._sidecars[domain] = sidecar
+            added = sidecar.add(ids, vectors)
+            self._mtimes[domain] = self._mtime(domain)
+            return added
+
+    def get_vectors(self, domain: str, ids: list[str]) -> list[Optional[np.ndarray]]:
+        """
+        Read a domain's vectors by document ID.
+
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+
+        Returns:
+            One float32 vector per ID (None for unknown IDs)
+        """
+        with self._lock:
+            sidecar = self._get(domain)
+            snapshot = sidecar.snapshot() if sidecar is not None else None
+        return snapshot.get(ids) if snapshot is not None else [None] * len(ids)
+
+    def search(self, domain: str, query, k: int, ids: Optional[list[str]] = None) -> list[tuple[str, float]]:
+        """
+        Exact search of a domain's vectors.
+
+        Args:
+            domain: Agent domain
+            query: Query embedding
+            k: Number of results
+            ids: Only consider these document IDs (None for all)
+
+        Returns:
+            List of (document ID, squared L2 distance), nearest first
+        """
+        with self._lock:
+            sidecar = self._get(domain)
+            if sidecar is None:
+                return []
+            # Additions after this are not searched
+            snapshot = sidecar.snapshot()
+        return snapshot.search(query, k, ids)
+
+    def dimensions(self, domain: str) -> Optional[int]:
+        """
+        Get the size of a domain's stored vectors.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Vector size, or None if nothing is stored
+        """
+        with self._lock:
+            sidecar = self._get(domain)
+            return sidecar.dimensions if sidecar is not None and len(sidecar) else None
+
+    def count_documents(self, domain: str) -> int:
+        """
+        Get the number of stored vectors for a domain.
+
+        Args:
+            domain: Agent domain
+
+        Returns:
+            Number of vectors
+        """
+        with self._lock:
+            sidecar = self._get(domain)
+            return len(sidecar) if sidecar is not None else 0
+
+    def stage(self, domain: str, dimensions: int) -> VectorSidecar:
+        """
+        Create an empty sidecar to rebuild a domain into (see swap()).
+
+        Args:
+            domain: Agent domain
+            dimensions: Vector size
+
+        Returns:
+            Empty staging VectorSidecar
+        """
+        return VectorSidecar.create(self._staging_path(domain), dimensions)
+
+    def swap(self, domain: str):
+        """
+        Replace a domain's sidecar with its filled staging sidecar.
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            shutil.rmtree(self._path(domain), ignore_errors=True)
+            self._staging_path(domain).rename(self._path(domain))
+            self._sidecars.pop(domain, None)
+
+    def reset(self, domain: str):
+        """
+        Delete a domain's sidecar (and any staging sidecar).
+
+        Args:
+            domain: Agent domain
+        """
+        with self._lock:
+            self._sidecars[domain] = None
+            shutil.rmtree(self._path(domain), ignore_errors=True)
+            shutil.rmtree(self._staging_path(domain), ignore_errors=True)
+            self._mtimes[domain] = None
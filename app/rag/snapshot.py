@@ -0,0 +1,242 @@
+"""Vector Store Snapshots
+
+A snapshot holds one domain's documents and vectors in a single file, so
+a new replica can be loaded without re-running ingestion or paying for a
+single embedding. The layout is columnar:
+
+    magic       8 bytes, b"VSNAP01\\n"
+    vectors     float32 matrix (count x dimensions), 64-byte aligned and
+                never compressed, so it can be memory-mapped in place
+    row groups  up to SNAPSHOT_GROUP_SIZE rows each; per group one chunk
+                per column (ids, documents, metadatas), each a uint32
+                length array followed by the UTF-8 values, optionally
+                zlib-compressed
+    footer      JSON: format version, domain, embedding model, counts,
+                compression and the offset and sizes of every group
+    trailer     footer length (uint64) and the magic again
+
+Writing and reading proceed one row group at a time, so memory stays
+bounded by the group size whatever the domain's size.
+"""
+
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+SNAPSHOT_MAGIC = b"VSNAP01\n"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_GROUP_SIZE = 1000  # Rows per row group (the unit of streaming)
+COMPRESSION_TYPES = ("none", "zlib")
+
+_VECTORS_OFFSET = 64
+_TRAILER = struct.Struct("<Q8s")
+_COLUMNS = ("ids", "documents", "metadatas")
+
+
+def _encode_column(values: list[str], compression: str) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    chunk = np.array([len(value) for value in encoded], dtype="<u4").tobytes() + b"".join(encoded)
+    return zlib.compress(chunk, 6) if compression == "zlib" else chunk
+
+
+def _decode_column(chunk: bytes, rows: int, compression: str) -> list[str]:
+    if compression == "zlib":
+        chunk = zlib.decompress(chunk)
+    lengths = np.frombuffer(chunk, dtype="<u4", count=rows)
+    values = []
+    position = rows * 4
+    for length in lengths.tolist():
+        values.append(chunk[position:position + length].decode("utf-8"))
+        position += length
+    return values
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot file one batch of rows at a time.
+
+    The file is written to a temporary path and moved into place by
+    close(), so an interrupted export never leaves a truncated snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        domain: str,
+        count: int,
+        dimensions: int,
+        compression: str = "zlib",
+        embedding_model: Optional[str] = None
+    ):
+        """
+        Start a snapshot.
+
+        Args:
+            path: Output file
+            domain: Agent domain being exported
+            count: Number of rows that will be written
+            dimensions: Vector size
+            compression: "zlib" or "none" (applies to the text columns)
+            embedding_model: Model that produced the vectors (checked on import)
+        """
+        if compression not in COMPRESSION_TYPES:
+            raise ValueError(f"Unsupported compression: {compression}. Must be one of {COMPRESSION_TYPES}")
+        self.path = Path(path)
+        self.count = count
+        self.dimensions = dimensions
+        self.compression = compression
+        self._footer = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "domain": domain,
+            "embedding_model": embedding_model,
+            "count": count,
+            "dimensions": dimensions,
+            "compression": compression,
+            "vectors_offset": _VECTORS_OFFSET,
+            "groups": [],
+        }
+        self._written = 0
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(SNAPSHOT_MAGIC)
+
+        # Reserve the vector region; row groups follow it
+        self._groups_offset = _VECTORS_OFFSET + count * dimensions * 4
+        self._file.truncate(self._groups_offset)
+
+    def write(self, ids: list[str], documents: list[str], metadatas: list[Optional[dict]], vectors) -> None:
+        """
+        Append rows (split into row groups of SNAPSHOT_GROUP_SIZE).
+
+        Args:
+            ids: Document IDs
+            documents: Document texts
+            metadatas: Metadata for each document
+            vectors: Embeddings, one per document
+        """
+        vectors = np.asarray(vectors, dtype="<f4").reshape(len(ids), self.dimensions)
+        if self._written + len(ids) > self.count:
+            raise ValueError(f"Snapshot was declared with {self.count} rows")
+
+        self._file.seek(_VECTORS_OFFSET + self._written * self.dimensions * 4)
+        self._file.write(vectors.tobytes())
+
+        for start in range(0, len(ids), SNAPSHOT_GROUP_SIZE):
+            end = start + SNAPSHOT_GROUP_SIZE
+            columns = {
+                "ids": ids[start:end],
+                "documents": [document or "" for document in documents[start:end]],
+                "metadatas": [json.dumps(metadata) for metadata in metadatas[start:end]],
+            }
+            chunks = [_encode_column(columns[name], self.compression) for name in _COLUMNS]
+            self._file.seek(self._groups_offset)
+            for chunk in chunks:
+                self._file.write(chunk)
+            self._footer["groups"].append({
+                "offset": self._groups_offset,
+                "rows": len(columns["ids"]),
+                "sizes": [len(chunk) for chunk in chunks],
+            })
+            self._groups_offset += sum(len(chunk) for chunk in chunks)
+        self._written += len(ids)
+
+    def close(self) -> int:
+        """
+        Finish the snapshot and move it into place.
+
+        Returns:
+            Size of the snapshot file in bytes
+        """
+        if self._written != self.count:
+            self.abort()
+            raise ValueError(f"Snapshot expected {self.count} rows, got {self._written}")
+        footer = json.dumps(self._footer).encode()
+        self._file.seek(self._groups_offset)
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(len(footer), SNAPSHOT_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path.stat().st_size
+
+    def abort(self) -> None:
+        """Discard a partially written snapshot."""
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class SnapshotReader:
+    """Reads a snapshot file; vectors are memory-mapped, text is streamed."""
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot.
+
+        Args:
+            path: Snapshot file
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported version
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not a vector store snapshot: {path}")
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            footer_size, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Truncated vector store snapshot: {path}")
+            f.seek(-_TRAILER.size - footer_size, os.SEEK_END)
+            self.footer = json.loads(f.read(footer_size))
+        if self.footer["version"] != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version: {self.footer['version']}")
+
+    def __len__(self) -> int:
+        return self.footer["count"]
+
+    @property
+    def domain(self) -> str:
+        return self.footer["domain"]
+
+    @property
+    def dimensions(self) -> int:
+        return self.footer["dimensions"]
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.footer["embedding_model"]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All vectors, memory-mapped read-only from the snapshot file."""
+        if not len(self):
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        return np.memmap(
+            self.path, dtype="<f4", mode="r",
+            offset=self.footer["vectors_offset"], shape=(len(self), self.dimensions)
+        )
+
+    def batches(self) -> Iterator[tuple[list[str], list[str], list[dict], np.ndarray]]:
+        """
+        Stream the rows one row group at a time.
+
+        Yields:
+            (ids, documents, metadatas, vectors) of each row group; vectors
+            are a view of the memory-mapped matrix
+        """
+        vectors = self.vectors
+        start = 0
+        with open(self.path, "rb") as f:
+            for group in self.footer["groups"]:
+                f.seek(group["offset"])
+                ids, documents, metadatas = [
+                    _decode_column(f.read(size), group["rows"], self.footer["compression"])
+                    for size in group["sizes"]
+                ]
+                end = start + group["rows"]
+                yield ids, documents, [json.loads(metadata) for metadata in metadatas], vectors[start:end]
+                start = end
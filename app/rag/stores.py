@@ -11,12 +11,36 @@ import warnings
 # Suppress Pydantic V1 warnings for Python 3.14
 warnings.filterwarnings('ignore', category=UserWarning, message='.*Pydantic V1.*')
 
+import json
+import threading
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
+from chromadb.errors import NotFoundError
 from pathlib import Path
 from typing import Optional
 
-from app.rag.embeddings import get_embedding_model
+from app.config.settings import settings
+from app.rag.dedup import DuplicateIndexManager
+from app.rag.embeddings import (
+    EmbeddingBatcher,
+    configured_dimensions,
+    embedding_kwargs,
+    get_embedding_model,
+    truncate_embeddings,
+)
+from app.rag.ivfpq import IVFPQIndexManager
+from app.rag.lexical import LexicalIndexManager
+from app.rag.namespaces import current_namespace, namespace_key, namespace_scope
+from app.rag.quantization import QuantizedIndexManager, squared_l2
+from app.rag.sharding import ShardedIndexManager, ShardWorkerPool
+from app.rag.sidecar import VectorSidecar, VectorSidecarManager
+from app.rag.snapshot import SNAPSHOT_GROUP_SIZE, SnapshotReader, SnapshotWriter
+from app.utils.batching import MicroBatcher
+from app.utils.cache import LRUCache
+from app.utils.deadline import check_deadline
+from app.utils.memo import memoized
+from app.utils.metrics import metrics
 
 
 # Agent domains
@@ -29,12 +53,135 @@ AGENT_DOMAINS = [
     "shared"  # Shared memory across all agents
 ]
 
+# Snapshot rows buffered before the BM25 index is persisted during an import
+SNAPSHOT_LEXICAL_FLUSH_ROWS = 20000
+
+# Query result fields holding one entry per query embedding
+_PER_QUERY_FIELDS = {"ids", "embeddings", "documents", "uris", "data", "metadatas", "distances"}
+
+# Embedding given to ChromaDB for records whose vector is kept in the sidecar
+_PLACEHOLDER_EMBEDDING = [0.0]
+
+
+def collection_name(domain: str, namespace: Optional[str] = None) -> str:
+    """
+    Get the ChromaDB collection name of a domain.
+    
+    Args:
+        domain: Agent domain
+        namespace: User ID of a per-user namespace (None for the global one)
+        
+    Returns:
+        Collection name
+    """
+    if namespace is None:
+        return f"{domain}_kb"
+    return f"{domain}_kb_{namespace_key(namespace)}"
+
+
+class VectorNamespace:
+    """
+    Collections and side indexes of one knowledge base.
+    
+    The global knowledge base keeps its indexes in the persist directory;
+    per-user namespaces keep theirs under namespaces/<key>/. Collections
+    are opened on first use.
+    """
+    
+    def __init__(self, name: Optional[str], directory: Path, shard_pool: Optional[ShardWorkerPool] = None):
+        """
+        Initialize a namespace.
+        
+        Args:
+            name: User ID (None for the global knowledge base)
+            directory: Directory for the namespace's side indexes
+            shard_pool: Worker processes for sharded search (None disables it)
+        """
+        self.name = name
+        self.collections = {}
+        
+        # One append-only file per domain whose size is the domain's
+        # generation, so writes from other processes (CLI ingestion) are seen
+        self.generations_directory = directory / "generations"
+        
+        # BM25 indexes for hybrid retrieval, kept next to the collections
+        self.lexical_index = LexicalIndexManager(str(directory / "lexical"))
+        
+        # MinHash signatures for near-duplicate suppression at ingestion
+        self.duplicate_index = DuplicateIndexManager(
+            str(directory / "minhash"),
+            permutations=settings.ingestion_dedup_permutations,
+            threshold=settings.ingestion_dedup_threshold
+        )
+        
+        # Full-precision vectors of domains whose ChromaDB records only hold
+        # placeholders (created with vector quantization on)
+        self.vector_sidecar = VectorSidecarManager(str(directory / "vectors"))
+        
+        # Optional compressed search index (float16/int8 or IVF-PQ); shortlists
+        # are rescored at full precision
+        self.quantized_index: Optional[QuantizedIndexManager | IVFPQIndexManager] = None
+        quantized_directory = str(directory / "quantized")
+        if settings.vector_quantization == "ivfpq":
+            self.quantized_index = IVFPQIndexManager(
+                quantized_directory,
+                nlist=settings.ivfpq_nlist,
+                subquantizers=settings.ivfpq_subquantizers,
+                nprobe=settings.ivfpq_nprobe,
+                train_size=settings.ivfpq_train_size
+            )
+        elif settings.vector_quantization != "none":
+            self.quantized_index = QuantizedIndexManager(quantized_directory, settings.vector_quantization)
+        
+        # Optional exact search of large domains, split across worker processes
+        self.sharded_index: Optional[ShardedIndexManager] = None
+        if shard_pool is not None:
+            self.sharded_index = ShardedIndexManager(str(directory / "shards"), shard_pool.workers, shard_pool)
+
+
+class StagedCollection:
+    """
+    A domain being rebuilt, from VectorStoreManager.staging_collection().
+    
+    Rows go to a staging collection (and a staging vector sidecar when the
+    vectors are kept outside ChromaDB) until swap_collection().
+    """
+    
+    def __init__(self, collection, sidecar: Optional[VectorSidecar] = None):
+        """
+        Initialize a staged collection.
+        
+        Args:
+            collection: Staging ChromaDB collection
+            sidecar: Staging vector sidecar (None keeps vectors in ChromaDB)
+        """
+        self.collection = collection
+        self.sidecar = sidecar
+    
+    def add(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings):
+        """
+        Add rows to the staged domain.
+        
+        Args:
+            ids: Document IDs
+            documents: Document texts
+            metadatas: Metadata for each document
+            embeddings: Embeddings, one per ID
+        """
+        if self.sidecar is not None:
+            self.sidecar.add(ids, embeddings)
+            embeddings = [_PLACEHOLDER_EMBEDDING] * len(ids)
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
 
 class VectorStoreManager:
     """
     Manages vector stores for all agent domains.
     
     Now includes a shared memory collection accessible by all agents.
+    With per-user namespaces enabled, calls made under namespace_scope(user_id)
+    use that user's collections; namespaces are opened lazily and kept in
+    a bounded LRU, so memory scales with active rather than total users.
     """
     
     def __init__(self, persist_directory: Optional[str] = None):
@@ -49,7 +196,8 @@ class VectorStoreManager:
             persist_directory = str(Path(__file__).parent.parent.parent / "data" / "vector_stores")
         
         # Create directory if it doesn't exist
-        Path(persist_directory).mkdir(parents=True, exist_ok=True)
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -61,7 +209,25 @@ class VectorStoreManager:
         )
         
         self.embedding_model = get_embedding_model()
-        self.collections = {}
+        self.embedding_batcher = EmbeddingBatcher(
+            lambda texts: self.embedding_model.embed_documents(texts, **embedding_kwargs()),
+            max_batch_size=settings.embedding_batch_max_size,
+            window_ms=settings.embedding_batch_window_ms
+        )
+        self.query_coalescer = MicroBatcher(
+            self._query_group,
+            max_batch_size=settings.query_batch_max_size,
+            window_ms=settings.query_batch_window_ms,
+            name="query_batch"
+        )
+        
+        # Worker processes serving sharded domains, shared by all namespaces
+        self.shard_pool = ShardWorkerPool(settings.vector_shards) if settings.vector_shards > 0 else None
+        
+        # Global knowledge base, plus an LRU of open per-user namespaces
+        self.default_namespace = VectorNamespace(None, self.persist_directory, self.shard_pool)
+        self._namespaces = LRUCache(settings.vector_namespace_cache_size, name="vector_namespaces")
+        self._namespace_lock = threading.Lock()
         
         # Initialize collections for each domain
         self._initialize_collections()
@@ -69,15 +235,67 @@ class VectorStoreManager:
     def _initialize_collections(self):
         """Create or get existing collections for each agent domain."""
         for domain in AGENT_DOMAINS:
-            collection_name = f"{domain}_kb"
-            
-            # Get or create collection
-            collection = self.client.get_or_create_collection(
-                name=collection_name,
-                metadata={"domain": domain}
-            )
+            self._open_collection(self.default_namespace, domain)
+    
+    def _open_collection(self, namespace: VectorNamespace, domain: str):
+        """Get or create a domain's collection in a namespace."""
+        collection = self.client.get_or_create_collection(
+            name=collection_name(domain, namespace.name),
+            metadata={"domain": domain}
+        )
+        namespace.collections[domain] = collection
+        return collection
+    
+    def namespace(self) -> VectorNamespace:
+        """
+        Get the namespace of the current request.
+        
+        Returns:
+            The current user's namespace (opened on first use), or the
+            global knowledge base when namespaces are disabled or no user
+            is set
+        """
+        user_id = current_namespace()
+        if user_id is None or not settings.vector_namespaces_enabled:
+            return self.default_namespace
+        
+        with self._namespace_lock:
+            namespace = self._namespaces.get(user_id)
+            if namespace is None:
+                namespace = VectorNamespace(
+                    user_id, self.persist_directory / "namespaces" / namespace_key(user_id), self.shard_pool
+                )
+                self._namespaces.put(user_id, namespace)
+            return namespace
+    
+    @property
+    def lexical_index(self) -> LexicalIndexManager:
+        """BM25 indexes of the current namespace."""
+        return self.namespace().lexical_index
+    
+    @property
+    def duplicate_index(self) -> DuplicateIndexManager:
+        """Near-duplicate indexes of the current namespace."""
+        return self.namespace().duplicate_index
+    
+    @property
+    def quantized_index(self) -> Optional[QuantizedIndexManager | IVFPQIndexManager]:
+        """Compressed search indexes of the current namespace (if enabled)."""
+        return self.namespace().quantized_index
+    
+    def sharded_index(self, domain: str) -> Optional[ShardedIndexManager]:
+        """
+        Get the sharded index serving a domain in the current namespace.
+        
+        Args:
+            domain: Agent domain
             
-            self.collections[domain] = collection
+        Returns:
+            ShardedIndexManager, or None if the domain is not sharded
+        """
+        if domain not in settings.vector_sharded_domains:
+            return None
+        return self.namespace().sharded_index
     
     def get_collection(self, domain: str):
         """
@@ -95,14 +313,20 @@ class VectorStoreManager:
         if domain not in AGENT_DOMAINS:
             raise ValueError(f"Invalid domain: {domain}. Must be one of {AGENT_DOMAINS}")
         
-        return self.collections[domain]
+        namespace = self.namespace()
+        collection = namespace.collections.get(domain)
+        if collection is None:
+            collection = self._open_collection(namespace, domain)
+        return collection
     
     def add_documents(
         self,
         domain: str,
         texts: list[str],
         metadatas: list[dict],
-        ids: list[str]
+        ids: list[str],
+        embeddings: Optional[list[list[float]]] = None,
+        persist: bool = True
     ):
         """
         Add documents to a domain's vector store.
@@ -112,53 +336,403 @@ class VectorStoreManager:
             texts: Document texts
             metadatas: Metadata for each document
             ids: Unique IDs for each document
+            embeddings: Precomputed embeddings (skips the embedding call);
+                        must match the configured dimensionality
+            persist: Write the quantized index now; False defers it to
+                     flush_quantized_index()
+                        
+        Raises:
+            ValueError: If the domain holds vectors of another size (it
+                        needs re-indexing after EMBEDDING_DIMENSIONS changed)
         """
         collection = self.get_collection(domain)
         
         # Generate embeddings
-        embeddings = self.embedding_model.embed_documents(texts)
+        if embeddings is None:
+            embeddings = self.embedding_model.embed_documents(texts)
         
-        # Add to collection
+        if len(embeddings):
+            dimensions = len(embeddings[0])
+            stored = self.stored_dimensions(domain)
+            if stored is None:
+                # New domains keep their vectors out of ChromaDB when quantized
+                self._record_dimensions(collection, dimensions, sidecar=self.quantized_index is not None)
+            elif stored != dimensions:
+                raise ValueError(
+                    f"The {domain} domain holds {stored}-dimensional vectors, not {dimensions}; "
+                    f"run scripts/ingest_documents.py --domain {domain} --reindex"
+                )
+        
+        # Add to collection (the sidecar first, so a stored record always has its vector)
+        in_sidecar = self.vectors_in_sidecar(domain)
+        if in_sidecar:
+            self.namespace().vector_sidecar.add_documents(domain, ids, embeddings)
         collection.add(
-            embeddings=embeddings,
+            embeddings=[_PLACEHOLDER_EMBEDDING] * len(ids) if in_sidecar else embeddings,
             documents=texts,
             metadatas=metadatas,
             ids=ids
         )
+        quantized_index = self.quantized_index
+        if quantized_index is not None:
+            quantized_index.add_documents(domain, ids, embeddings, persist=persist)
+        sharded_index = self.sharded_index(domain)
+        if sharded_index is not None:
+            sharded_index.add_documents(domain, ids, embeddings)
+        self.bump_generation(domain)
+    
+    def flush_quantized_index(self, domain: str):
+        """
+        Write a domain's quantized index additions deferred by add_documents(persist=False).
+        
+        Args:
+            domain: Agent domain
+        """
+        quantized_index = self.quantized_index
+        if quantized_index is not None:
+            quantized_index.flush(domain)
+    
+    def generation(self, domain: str) -> int:
+        """
+        Get a domain's generation counter.
+        
+        The counter changes whenever the domain's documents change
+        (add_documents, reset_collection), in this or any other process
+        sharing the persist directory. Reading it is a single stat() call.
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+            
+        Returns:
+            Current generation
+        """
+        try:
+            return (self.namespace().generations_directory / f"{domain}.gen").stat().st_size
+        except FileNotFoundError:
+            return 0
+    
+    def bump_generation(self, domain: str):
+        """
+        Invalidate cached retrieval results for a domain.
+        
+        Appends one byte to the domain's generation file; appends are
+        atomic, so concurrent writers in several processes never lose a bump.
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+        """
+        directory = self.namespace().generations_directory
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / f"{domain}.gen", "ab") as f:
+            f.write(b".")
     
     def query(
         self,
         domain: str,
         query_text: str,
         n_results: int = 3,
-        metadata_filter: Optional[dict] = None
+        metadata_filter: Optional[dict] = None,
+        query_embedding: Optional[list[float]] = None,
+        include_embeddings: bool = False
     ) -> dict:
         """
         Query a domain's vector store.
         
+        Concurrent queries against the same collection (with the same
+        n_results, filter and fields) are coalesced into one multi-query
+        call when query batching is enabled.
+        
         Args:
             domain: Agent domain
             query_text: Query string
             n_results: Number of results to return
             metadata_filter: Optional metadata filters
+            query_embedding: Precomputed embedding of query_text (skips
+                             the embedding call)
+            include_embeddings: Also return the stored embeddings
             
         Returns:
             Query results with documents, distances, and metadata
+            
+        Raises:
+            DeadlineExceeded: If the request deadline passes before a step
         """
-        collection = self.get_collection(domain)
+        self.get_collection(domain)  # Validate the domain before embedding
         
         # Generate query embedding
-        query_embedding = self.embedding_model.embed_query(query_text)
+        if query_embedding is None:
+            query_embedding = self.embed_query(query_text)
         
         # Query collection
+        check_deadline("vector query")
+        if settings.query_batch_enabled:
+            filter_key = json.dumps(metadata_filter, sort_keys=True) if metadata_filter else None
+            return self.query_coalescer.submit(
+                query_embedding,
+                key=(self.namespace().name, domain, n_results, filter_key, include_embeddings)
+            )
+        return self.query_batch(
+            domain, [query_embedding], n_results, metadata_filter, include_embeddings
+        )[0]
+    
+    def query_batch(
+        self,
+        domain: str,
+        query_embeddings: list[list[float]],
+        n_results: int = 3,
+        metadata_filter: Optional[dict] = None,
+        include_embeddings: bool = False
+    ) -> list[dict]:
+        """
+        Run several queries against a domain's collection in one call.
+        
+        Unfiltered queries on a sharded domain are scattered to the shard
+        worker processes. Otherwise, with vector quantization enabled,
+        unfiltered queries search the quantized index and rescore its
+        shortlist at full precision. Domains whose vectors are kept in the
+        sidecar are otherwise searched exactly there.
+        
+        Args:
+            domain: Agent domain
+            query_embeddings: Query embeddings
+            n_results: Number of results per query
+            metadata_filter: Optional metadata filters (applied to all)
+            include_embeddings: Also return the stored embeddings
+            
+        Returns:
+            One result per query, each shaped like a single-query result
+            
+        Raises:
+            ValueError: If the domain's vectors are longer than the queries
+        """
+        collection = self.get_collection(domain)
+        query_embeddings = self._fit_dimensions(domain, query_embeddings)
+        if metadata_filter is None and self._sharded_index_ready(domain):
+            hits = self.sharded_index(domain).search_batch(domain, query_embeddings, n_results)
+            metrics.increment("sharded.queries", len(query_embeddings))
+            return self._hydrate_results(domain, query_embeddings, hits, n_results, include_embeddings, rescore=False)
+        if metadata_filter is None and self._quantized_index_ready(domain):
+            return self._quantized_query_batch(domain, query_embeddings, n_results, include_embeddings)
+        if self.vectors_in_sidecar(domain):
+            return self._sidecar_query_batch(domain, query_embeddings, n_results, metadata_filter, include_embeddings)
+        
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
         results = collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=list(query_embeddings),
             n_results=n_results,
-            where=metadata_filter
+            where=metadata_filter,
+            include=include
         )
         
+        # Per-query fields are lists with one entry per query embedding
+        return [
+            {
+                key: [value[i]] if key in _PER_QUERY_FIELDS and value is not None else value
+                for key, value in results.items()
+            }
+            for i in range(len(query_embeddings))
+        ]
+    
+    def _fit_dimensions(self, domain: str, query_embeddings: list[list[float]]) -> list[list[float]]:
+        """
+        Fit query embeddings to the size a domain's vectors were stored at.
+        
+        Domains not yet re-indexed after EMBEDDING_DIMENSIONS was lowered keep
+        working: text-embedding-3 vectors can be truncated to a shorter size.
+        """
+        stored = self.stored_dimensions(domain)
+        if stored is None or not len(query_embeddings) or len(query_embeddings[0]) == stored:
+            return query_embeddings
+        if len(query_embeddings[0]) < stored:
+            raise ValueError(
+                f"The {domain} domain holds {stored}-dimensional vectors, queries have "
+                f"{len(query_embeddings[0])}; run scripts/ingest_documents.py --domain {domain} --reindex"
+            )
+        metrics.increment("embedding.truncated_queries", len(query_embeddings))
+        return truncate_embeddings(query_embeddings, stored)
+    
+    def _sharded_index_ready(self, domain: str) -> bool:
+        """Whether the domain's shards cover its whole collection."""
+        sharded_index = self.sharded_index(domain)
+        if sharded_index is None:
+            return False
+        indexed = sharded_index.count_documents(domain)
+        return indexed > 0 and indexed == self.get_collection(domain).count()
+    
+    def _quantized_index_ready(self, domain: str) -> bool:
+        """Whether the domain's quantized index covers its whole collection."""
+        quantized_index = self.quantized_index
+        if quantized_index is None:
+            return False
+        indexed = quantized_index.count_documents(domain)
+        return indexed > 0 and indexed == self.get_collection(domain).count()
+    
+    def _quantized_query_batch(
+        self,
+        domain: str,
+        query_embeddings: list[list[float]],
+        n_results: int,
+        include_embeddings: bool
+    ) -> list[dict]:
+        """
+        Search the quantized index, then rescore the shortlists exactly.
+        
+        Each query's shortlist (n_results x quantization_rescore_factor) is
+        re-ranked by exact distance. With a rescore factor of 0 the
+        approximate ranking is returned and no stored embeddings are read.
+        """
+        rescore = settings.quantization_rescore_factor > 0
+        shortlist_size = n_results * max(settings.quantization_rescore_factor, 1)
+        quantized_index = self.quantized_index
+        shortlists = [
+            quantized_index.search(domain, embedding, shortlist_size)
+            for embedding in query_embeddings
+        ]
+        return self._hydrate_results(domain, query_embeddings, shortlists, n_results, include_embeddings, rescore)
+    
+    def _sidecar_query_batch(
+        self,
+        domain: str,
+        query_embeddings: list[list[float]],
+        n_results: int,
+        metadata_filter: Optional[dict],
+        include_embeddings: bool
+    ) -> list[dict]:
+        """
+        Search a domain's sidecar vectors exactly.
+        
+        Used for filtered queries and while the quantized index does not
+        cover the domain. ChromaDB resolves a metadata filter to candidate
+        IDs first, so only their vectors are read.
+        """
+        candidates = None
+        if metadata_filter is not None:
+            candidates = self.get_collection(domain).get(where=metadata_filter, include=[])["ids"]
+        sidecar = self.namespace().vector_sidecar
+        hits = [sidecar.search(domain, embedding, n_results, candidates) for embedding in query_embeddings]
+        metrics.increment("sidecar.queries", len(query_embeddings))
+        return self._hydrate_results(domain, query_embeddings, hits, n_results, include_embeddings, rescore=False)
+    
+    def _hydrate_results(
+        self,
+        domain: str,
+        query_embeddings: list[list[float]],
+        shortlists: list[list[tuple[str, float]]],
+        n_results: int,
+        include_embeddings: bool,
+        rescore: bool
+    ) -> list[dict]:
+        """
+        Turn ranked (ID, distance) lists from a side index into query results.
+        
+        Documents and metadata of all shortlisted IDs are fetched from the
+        collection in one call for the whole batch. With rescore, each
+        shortlist is re-ranked by exact squared L2 distance, the
+        collection's metric.
+        """
+        candidate_ids = list(dict.fromkeys(doc_id for shortlist in shortlists for doc_id, _ in shortlist))
+        with_embeddings = rescore or include_embeddings
+        fetched = self.get_documents(domain, candidate_ids, include_embeddings=with_embeddings)
+        stored_embeddings = fetched["embeddings"] if with_embeddings else [None] * len(fetched["ids"])
+        rows = {
+            doc_id: (document, metadata, embedding)
+            for doc_id, document, metadata, embedding in zip(
+                fetched["ids"], fetched["documents"], fetched["metadatas"], stored_embeddings
+            )
+        }
+        if rescore:
+            metrics.increment("quantized.rescored", len(candidate_ids))
+        
+        results = []
+        for embedding, shortlist in zip(query_embeddings, shortlists):
+            hits = [
+                (doc_id, distance) for doc_id, distance in shortlist
+                if doc_id in rows and not (rescore and rows[doc_id][2] is None)
+            ]
+            if rescore and hits:
+                exact = squared_l2(embedding, np.array([rows[doc_id][2] for doc_id, _ in hits]))
+                hits = sorted(
+                    ((doc_id, float(distance)) for (doc_id, _), distance in zip(hits, exact)),
+                    key=lambda hit: hit[1]
+                )
+            ranked = [doc_id for doc_id, _ in hits[:n_results]]
+            results.append({
+                "ids": [ranked],
+                "documents": [[rows[doc_id][0] for doc_id in ranked]],
+                "metadatas": [[rows[doc_id][1] for doc_id in ranked]],
+                "distances": [[distance for _, distance in hits[:n_results]]],
+                "embeddings": [[rows[doc_id][2] for doc_id in ranked]] if include_embeddings else None,
+            })
+        return results
+    
+    def _query_group(self, key: tuple, query_embeddings: list[list[float]]) -> list[dict]:
+        """Run a coalesced group of queries (see query())."""
+        namespace, domain, n_results, filter_key, include_embeddings = key
+        metadata_filter = json.loads(filter_key) if filter_key else None
+        with namespace_scope(namespace):
+            return self.query_batch(domain, query_embeddings, n_results, metadata_filter, include_embeddings)
+    
+    def get_documents(
+        self,
+        domain: str,
+        ids: list[str],
+        metadata_filter: Optional[dict] = None,
+        include_embeddings: bool = False
+    ) -> dict:
+        """
+        Fetch documents of a domain by ID.
+        
+        Args:
+            domain: Agent domain
+            ids: Document IDs
+            metadata_filter: Optional metadata filters
+            include_embeddings: Also return the stored embeddings (from the
+                                vector sidecar if the domain keeps them there)
+            
+        Returns:
+            Results with ids, documents, and metadata (documents not
+            matching the filter are left out)
+        """
+        collection = self.get_collection(domain)
+        check_deadline("vector fetch")
+        in_sidecar = self.vectors_in_sidecar(domain)
+        include = ["documents", "metadatas"]
+        if include_embeddings and not in_sidecar:
+            include.append("embeddings")
+        results = collection.get(
+            ids=ids,
+            where=metadata_filter,
+            include=include
+        )
+        if include_embeddings and in_sidecar:
+            results["embeddings"] = self.namespace().vector_sidecar.get_vectors(domain, results["ids"])
         return results
     
+    def embed_query(self, query_text: str) -> list[float]:
+        """
+        Embed a query for use with query().
+        
+        Concurrent requests are merged into one embeddings call by the
+        micro-batcher (if enabled).
+        
+        Args:
+            query_text: Query string
+            
+        Returns:
+            Query embedding
+        """
+        check_deadline("query embedding")
+        # Identical texts are embedded once per request
+        return memoized("embedding", query_text, lambda: self._embed(query_text))
+    
+    def _embed(self, query_text: str) -> list[float]:
+        """Embed one query, through the micro-batcher if enabled."""
+        if settings.embedding_batch_enabled:
+            return self.embedding_batcher.embed(query_text)
+        return self.embedding_model.embed_query(query_text, **embedding_kwargs())
+    
     def count_documents(self, domain: str) -> int:
         """
         Get document count for a domain.
@@ -172,25 +746,257 @@ class VectorStoreManager:
         collection = self.get_collection(domain)
         return collection.count()
     
-    def reset_collection(self, domain: str):
+    def embedding_dimensions(self, domain: str) -> Optional[int]:
         """
-        Delete all documents from a domain's collection.
+        Get the dimensionality of a domain's stored embeddings.
         
         Args:
             domain: Agent domain
+            
+        Returns:
+            Vector size, or None if the collection is empty
+        """
+        if self.vectors_in_sidecar(domain):
+            return self.namespace().vector_sidecar.dimensions(domain)
+        stored = self.get_collection(domain).get(limit=1, include=["embeddings"])
+        if not stored["ids"]:
+            return None
+        return len(stored["embeddings"][0])
+    
+    def stored_dimensions(self, domain: str) -> Optional[int]:
         """
-        collection_name = f"{domain}_kb"
-        self.client.delete_collection(collection_name)
+        Get the dimensionality recorded in a domain's collection metadata.
         
-        # Recreate empty collection
-        collection = self.client.create_collection(
-            name=collection_name,
-            metadata={"domain": domain}
+        It is recorded on the first write; collections written before it
+        was recorded are probed (and recorded) once.
+        
+        Args:
+            domain: Agent domain
+            
+        Returns:
+            Vector size, or None if the collection is empty
+        """
+        collection = self.get_collection(domain)
+        dimensions = (collection.metadata or {}).get("dimensions")
+        if dimensions is None:
+            dimensions = self.embedding_dimensions(domain)
+            if dimensions is not None:
+                self._record_dimensions(collection, dimensions, sidecar=self.vectors_in_sidecar(domain))
+        return dimensions
+    
+    def _record_dimensions(self, collection, dimensions: int, sidecar: bool = False):
+        """Store a collection's vector size (and where its vectors live) in its metadata."""
+        # modify() replaces the whole metadata
+        metadata = {**(collection.metadata or {}), "dimensions": dimensions}
+        if sidecar:
+            metadata["vectors"] = "sidecar"
+        collection.modify(metadata=metadata)
+    
+    def vectors_in_sidecar(self, domain: str) -> bool:
+        """
+        Whether a domain's full-precision vectors are kept in the vector sidecar.
+        
+        Domains first written with vector quantization on keep only
+        placeholder embeddings in ChromaDB; older domains are moved over
+        by --rebuild-quantized. The sidecar itself is checked too, as the
+        collection metadata may predate a write by another process.
+        
+        Args:
+            domain: Agent domain
+            
+        Returns:
+            True if ChromaDB holds placeholders for the domain's vectors
+        """
+        if (self.get_collection(domain).metadata or {}).get("vectors") == "sidecar":
+            return True
+        return self.namespace().vector_sidecar.count_documents(domain) > 0
+    
+    def staging_collection(self, domain: str, dimensions: int) -> StagedCollection:
+        """
+        Get an empty collection to rebuild a domain into.
+        
+        Any leftover from an interrupted rebuild is dropped first. With
+        vector quantization on, the vectors are staged in a vector sidecar.
+        Pass the filled collection to swap_collection().
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+            dimensions: Size of the vectors to be added
+            
+        Returns:
+            Empty StagedCollection
+        """
+        name = f"{self.get_collection(domain).name}.staging"
+        try:
+            self.client.delete_collection(name)
+        except NotFoundError:
+            pass
+        metadata = {"domain": domain, "dimensions": dimensions}
+        if self.quantized_index is None:
+            return StagedCollection(self.client.create_collection(name=name, metadata=metadata))
+        collection = self.client.create_collection(name=name, metadata={**metadata, "vectors": "sidecar"})
+        return StagedCollection(collection, self.namespace().vector_sidecar.stage(domain, dimensions))
+    
+    def swap_collection(self, domain: str, staging):
+        """
+        Replace a domain's collection with a rebuilt staging collection.
+        
+        The old collection is only dropped here, so a rebuild that fails
+        part-way leaves the domain as it was. The BM25 and duplicate indexes
+        are keyed by ID and text and kept; quantized and sharded indexes
+        hold the old vectors and are emptied (rebuild them afterwards).
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+            staging: StagedCollection from staging_collection()
+        """
+        namespace = self.namespace()
+        name = self.get_collection(domain).name
+        self.client.delete_collection(name)
+        staging.collection.modify(name=name)
+        namespace.collections[domain] = staging.collection
+        if staging.sidecar is not None:
+            namespace.vector_sidecar.swap(domain)
+        else:
+            namespace.vector_sidecar.reset(domain)
+        if namespace.quantized_index is not None:
+            namespace.quantized_index.reset(domain)
+        if namespace.sharded_index is not None:
+            namespace.sharded_index.reset(domain)
+        self.bump_generation(domain)
+    
+    def export_domain(self, domain: str, path: str, compression: str = "zlib") -> dict:
+        """
+        Write a domain's documents and vectors to a snapshot file.
+        
+        Rows are read from the collection one row group at a time, so
+        memory stays bounded for large domains.
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+            path: Snapshot file to write
+            compression: "zlib" or "none" (applies to ids, documents and metadata)
+            
+        Returns:
+            Report with the number of chunks, dimensions and file size
+        """
+        collection = self.get_collection(domain)
+        ids = collection.get(include=[])["ids"]
+        dimensions = self.embedding_dimensions(domain) or configured_dimensions()
+        writer = SnapshotWriter(
+            path, domain, len(ids), dimensions, compression, embedding_model=settings.embedding_model
         )
-        self.collections[domain] = collection
+        try:
+            for start in range(0, len(ids), SNAPSHOT_GROUP_SIZE):
+                batch = self.get_documents(
+                    domain, ids[start:start + SNAPSHOT_GROUP_SIZE], include_embeddings=True
+                )
+                writer.write(batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"])
+        except BaseException:
+            writer.abort()
+            raise
+        size = writer.close()
+        return {"chunks": len(ids), "dimensions": dimensions, "bytes": size}
+    
+    def import_domain(self, domain: str, path: str, replace: bool = False) -> dict:
+        """
+        Load a snapshot into a domain without any embedding calls.
+        
+        Rows are streamed one row group at a time with vectors read from
+        the memory-mapped snapshot. Documents already in the collection
+        are skipped, so an interrupted import can simply be re-run. The
+        BM25 index, the near-duplicate index (when ingestion dedup is on)
+        and any quantized or sharded indexes are filled too.
+        
+        Args:
+            domain: Agent domain (in the current namespace); may differ
+                    from the domain the snapshot was exported from
+            path: Snapshot file
+            replace: Empty the domain first
+            
+        Returns:
+            Report with the number of chunks in the snapshot and imported
+            
+        Raises:
+            ValueError: If the snapshot's vectors do not match the
+                        configured embedding model or dimensionality
+        """
+        snapshot = SnapshotReader(path)
+        if snapshot.embedding_model and snapshot.embedding_model != settings.embedding_model:
+            raise ValueError(
+                f"Snapshot was embedded with {snapshot.embedding_model}, "
+                f"but EMBEDDING_MODEL is {settings.embedding_model}"
+            )
+        if len(snapshot) and snapshot.dimensions != configured_dimensions():
+            raise ValueError(
+                f"Snapshot has {snapshot.dimensions}-dimensional vectors, "
+                f"but EMBEDDING_DIMENSIONS gives {configured_dimensions()}"
+            )
+        
+        if replace:
+            self.reset_collection(domain)
+        collection = self.get_collection(domain)
+        lexical_ids, lexical_texts = [], []
+        imported = 0
+        for ids, documents, metadatas, vectors in snapshot.batches():
+            existing = set(collection.get(ids=ids, include=[])["ids"]) if not replace else set()
+            rows = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+            if rows:
+                self.add_documents(
+                    domain,
+                    texts=[documents[i] for i in rows],
+                    metadatas=[metadatas[i] for i in rows],
+                    ids=[ids[i] for i in rows],
+                    embeddings=np.asarray(vectors[rows], dtype=np.float32),
+                    persist=False
+                )
+                imported += len(rows)
+            
+            # The BM25 and duplicate indexes skip IDs they already hold
+            lexical_ids.extend(ids)
+            lexical_texts.extend(documents)
+            if len(lexical_ids) >= SNAPSHOT_LEXICAL_FLUSH_ROWS:
+                self.lexical_index.add_documents(domain, lexical_ids, lexical_texts, persist=False)
+                if settings.ingestion_dedup != "off":
+                    self.duplicate_index.add_documents(domain, lexical_ids, lexical_texts, persist=False)
+                lexical_ids, lexical_texts = [], []
+        if lexical_ids:
+            self.lexical_index.add_documents(domain, lexical_ids, lexical_texts, persist=False)
+            if settings.ingestion_dedup != "off":
+                self.duplicate_index.add_documents(domain, lexical_ids, lexical_texts, persist=False)
+        self.lexical_index.flush(domain)
+        self.flush_quantized_index(domain)
+        self.duplicate_index.flush(domain)
+        self.bump_generation(domain)
+        return {"chunks": len(snapshot), "imported": imported, "source_domain": snapshot.domain}
+    
+    def reset_collection(self, domain: str):
+        """
+        Delete all documents from a domain's collection and its indexes.
+        
+        Args:
+            domain: Agent domain (in the current namespace)
+        """
+        namespace = self.namespace()
+        self.client.delete_collection(self.get_collection(domain).name)
+        namespace.lexical_index.reset(domain)
+        namespace.duplicate_index.reset(domain)
+        namespace.vector_sidecar.reset(domain)
+        if isinstance(namespace.quantized_index, IVFPQIndexManager):
+            # The trained centroids and codebooks still fit the embedding model
+            namespace.quantized_index.clear(domain)
+        elif namespace.quantized_index is not None:
+            namespace.quantized_index.reset(domain)
+        if namespace.sharded_index is not None:
+            namespace.sharded_index.reset(domain)
+        
+        # Recreate empty collection
+        namespace.collections.pop(domain, None)
+        self._open_collection(namespace, domain)
+        self.bump_generation(domain)
     
     def reset_all(self):
-        """Delete all collections and reinitialize."""
+        """Delete all collections of the current namespace and reinitialize."""
         for domain in AGENT_DOMAINS:
             self.reset_collection(domain)
 
@@ -209,7 +209,7 @@ class ConversationService:
                 role=msg.role,
                 content=msg.content,
                 agent=msg.agent,
-                timestamp=msg.timestamp.isoformat()
+                timestamp=msg.timestamp
             )
             for msg in messages
         ]
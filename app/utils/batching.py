@@ -0,0 +1,122 @@
+"""Micro-batching of concurrent calls.
+
+Endpoints that accept many inputs per call (embeddings, multi-query vector
+search) are cheaper per input when concurrent requests share a call. A
+MicroBatcher collects items submitted from different threads for a short
+window and processes each batch with one call.
+
+The first submitter of a batch is its leader: it waits up to the window
+(or until the batch is full), runs the batch and resolves every waiter's
+future, so no background thread is needed. Items are only batched with
+others submitted under the same key.
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Hashable, Optional
+
+from app.utils.deadline import DeadlineExceeded, remaining
+from app.utils.metrics import metrics
+
+
+class _Batch:
+    """Items collected during one batching window."""
+
+    def __init__(self):
+        self.items: list = []
+        self.futures: list[Future] = []
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """Groups concurrent submissions into batched calls."""
+
+    def __init__(
+        self,
+        process: Callable[[Hashable, list], list],
+        max_batch_size: int = 16,
+        window_ms: float = 5.0,
+        name: Optional[str] = None
+    ):
+        """
+        Initialize micro-batcher.
+
+        Args:
+            process: Function taking (key, items) and returning one result
+                     per item, in order
+            max_batch_size: Items per call; a full batch is sent immediately
+            window_ms: How long the leader waits for more items
+            name: Metrics prefix; counts <name>.requests and <name>.calls
+                  when set
+        """
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.name = name
+        self._lock = threading.Lock()
+        self._batches: dict[Hashable, _Batch] = {}
+
+    def submit(self, item: Any, key: Hashable = None) -> Any:
+        """
+        Process one item, batched with concurrent submissions under the same key.
+
+        Args:
+            item: Input item
+            key: Batch key (only items with equal keys share a call)
+
+        Returns:
+            The item's result
+
+        Raises:
+            DeadlineExceeded: If the request deadline passes while waiting
+            Exception: Whatever the batch call raised
+        """
+        future: Future = Future()
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch()
+            batch.items.append(item)
+            batch.futures.append(future)
+            if len(batch.items) >= self.max_batch_size:
+                del self._batches[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+            self._flush(key, batch)
+
+        try:
+            return future.result(timeout=remaining())
+        except FutureTimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded waiting for a batched call") from None
+
+    def _flush(self, key: Hashable, batch: _Batch):
+        """Process a closed batch and resolve its futures."""
+        if self.name:
+            metrics.increment(f"{self.name}.requests", len(batch.items))
+            metrics.increment(f"{self.name}.calls")
+        try:
+            results = self.process(key, batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
+
+    def average_batch_size(self) -> float | None:
+        """
+        Get the average number of items per call.
+
+        Returns:
+            Average batch size, or None if nothing was processed yet (or
+            the batcher has no metrics name)
+        """
+        if not self.name:
+            return None
+        return metrics.ratio(f"{self.name}.requests", f"{self.name}.calls")
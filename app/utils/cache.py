@@ -0,0 +1,96 @@
+"""Bounded in-process caches.
+
+A thread-safe least-recently-used mapping with hit/miss/eviction counters
+reported through the metrics registry.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.utils.metrics import metrics
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a fixed number of entries."""
+
+    def __init__(self, maxsize: int, name: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries (0 disables caching)
+            name: Metrics prefix; counts <name>.lookups, <name>.hits and
+                  <name>.evictions when set
+        """
+        self.maxsize = maxsize
+        self.name = name
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Returned on a miss
+
+        Returns:
+            Cached value, or default
+        """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+
+        if self.name:
+            metrics.increment(f"{self.name}.lookups")
+            if value is not _MISSING:
+                metrics.increment(f"{self.name}.hits")
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store an entry, evicting the least recently used one if full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.maxsize <= 0:
+            return
+
+        evicted = 0
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+
+        if evicted and self.name:
+            metrics.increment(f"{self.name}.evictions", evicted)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def hit_rate(self) -> float | None:
+        """
+        Get the fraction of lookups that were hits.
+
+        Returns:
+            Hit rate, or None if nothing was looked up yet (or the cache
+            has no metrics name)
+        """
+        if not self.name:
+            return None
+        return metrics.ratio(f"{self.name}.hits", f"{self.name}.lookups")
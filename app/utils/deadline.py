@@ -0,0 +1,137 @@
+"""Per-request deadline propagation.
+
+The deadline of the current request is stored in a contextvar so deep calls
+(LLM, embeddings, vector queries) can bound themselves by the remaining
+budget without threading it through every signature. Deadlines are wall
+clock timestamps (time.time()) so they can also live in AgentState.
+
+A background run (e.g. a speculative agent) can also carry a cancel event;
+check_deadline() stops it at the next checkpoint once the event is set.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("run_cancel_event", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request deadline has passed."""
+
+
+class RunCancelled(DeadlineExceeded):
+    """Raised when the current background run was cancelled."""
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """
+    Set the request deadline for the duration of a block.
+
+    Args:
+        deadline: Absolute deadline (time.time() based), or None for no limit
+    """
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def cancel_scope(event: Optional[threading.Event]) -> Iterator[None]:
+    """
+    Make the current run cancellable for the duration of a block.
+
+    Args:
+        event: Event that cancels the run once set, or None
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """Get the deadline of the current request, if any."""
+    return _deadline.get()
+
+
+def remaining(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Get the remaining time budget in seconds.
+
+    Args:
+        deadline: Deadline to check (defaults to the current request deadline)
+
+    Returns:
+        Seconds left (never negative), or None if there is no deadline
+    """
+    if deadline is None:
+        deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def expired(deadline: Optional[float] = None) -> bool:
+    """Whether the deadline (default: current request deadline) has passed."""
+    left = remaining(deadline)
+    return left is not None and left <= 0.0
+
+
+def check_deadline(operation: str = "operation", deadline: Optional[float] = None) -> None:
+    """
+    Raise if the deadline has passed or the current run was cancelled.
+
+    Args:
+        operation: Description used in the error message
+        deadline: Deadline to check (defaults to the current request deadline)
+
+    Raises:
+        RunCancelled: If the current run's cancel event is set
+        DeadlineExceeded: If no time budget is left
+    """
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise RunCancelled(f"Run cancelled before {operation}")
+    if expired(deadline):
+        raise DeadlineExceeded(f"Request deadline exceeded before {operation}")
+
+
+def call_timeout(default: float) -> float:
+    """
+    Get the timeout for an outbound call, bounded by the remaining budget.
+
+    Args:
+        default: Timeout to use when there is no (or a distant) deadline
+
+    Returns:
+        Timeout in seconds
+    """
+    left = remaining()
+    if left is None:
+        return default
+    return min(default, left)
+
+
+def call_retries(timeout: float, default: int) -> int:
+    """
+    Get the retry count for an outbound call, so every attempt fits the budget.
+
+    Args:
+        timeout: Per-attempt timeout (see call_timeout())
+        default: Retries to use when there is no deadline
+
+    Returns:
+        Number of retries after the first attempt
+    """
+    left = remaining()
+    if left is None:
+        return default
+    return max(0, min(default, int(left // timeout) - 1)) if timeout > 0 else 0
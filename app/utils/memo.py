@@ -0,0 +1,114 @@
+"""Request-scoped memoization.
+
+Within one workflow run the same query can be embedded, retrieved and
+routed several times (every loop through the router, every agent, the
+shared-memory search). A RequestMemo stored in a contextvar deduplicates
+those calls for the lifetime of the run and is discarded when the run's
+memo_scope exits. Worker threads see the same memo because agent runs are
+submitted with a copy of the caller's context.
+"""
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Hashable, Iterator, Optional
+
+from app.utils.metrics import metrics
+
+_memo: ContextVar[Optional["RequestMemo"]] = ContextVar("request_memo", default=None)
+
+_MISSING = object()
+
+
+class RequestMemo:
+    """Results of the calls made during one request, by kind and key."""
+
+    def __init__(self):
+        self._values: dict[tuple[str, Hashable], Any] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()  # Calls actually executed, by kind
+        self.hits: Counter = Counter()  # Duplicate calls answered from the memo, by kind
+
+    def get_or_compute(self, kind: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the memoized result of a call, computing it on first use.
+
+        Exceptions are not memoized, so a failed call is retried.
+
+        Args:
+            kind: Call kind ("embedding", "retrieval", "routing")
+            key: Hashable call arguments
+            compute: Function performing the call
+
+        Returns:
+            Result of the call
+        """
+        with self._lock:
+            value = self._values.get((kind, key), _MISSING)
+            if value is not _MISSING:
+                self.hits[kind] += 1
+        if value is not _MISSING:
+            metrics.increment(f"memo.{kind}_hits")
+            return value
+
+        value = compute()
+        with self._lock:
+            # Concurrent agents may race on the same key; keep the first result
+            value = self._values.setdefault((kind, key), value)
+            self.calls[kind] += 1
+        return value
+
+    def summary(self) -> str:
+        """
+        Describe the dedup counts for the iteration log.
+
+        Returns:
+            E.g. "embedding: 2 of 3 calls deduplicated, routing: 1 of 2 ..."
+        """
+        kinds = sorted(set(self.calls) | set(self.hits))
+        return ", ".join(
+            f"{kind}: {self.hits[kind]} of {self.calls[kind] + self.hits[kind]} calls deduplicated"
+            for kind in kinds
+        )
+
+
+@contextmanager
+def memo_scope() -> Iterator[RequestMemo]:
+    """
+    Memoize embedding, retrieval and routing calls for the duration of a block.
+
+    Yields:
+        The RequestMemo of the block (dropped when the block exits)
+    """
+    memo = RequestMemo()
+    token = _memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _memo.reset(token)
+
+
+def current_memo() -> Optional[RequestMemo]:
+    """Get the memo of the current request, if any."""
+    return _memo.get()
+
+
+def memoized(kind: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """
+    Run a call through the current request's memo.
+
+    Outside a memo_scope the call is simply executed.
+
+    Args:
+        kind: Call kind ("embedding", "retrieval", "routing")
+        key: Hashable call arguments
+        compute: Function performing the call
+
+    Returns:
+        Result of the call
+    """
+    memo = _memo.get()
+    if memo is None:
+        return compute()
+    return memo.get_or_compute(kind, key, compute)
@@ -0,0 +1,78 @@
+"""In-process performance counters.
+
+Lightweight, thread-safe counters used to report optimization effectiveness
+(speculation hit rate, cache hits, iterations saved, ...). Exposed through
+the /api/metrics endpoint.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe registry of named integer counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Counter name (dotted, e.g. "speculation.hits")
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """
+        Get the current value of a counter.
+
+        Args:
+            name: Counter name
+
+        Returns:
+            Counter value (0 if never incremented)
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, denominator: str) -> float | None:
+        """
+        Compute the ratio between two counters.
+
+        Args:
+            numerator: Counter name for the numerator
+            denominator: Counter name for the denominator
+
+        Returns:
+            Ratio, or None if the denominator is zero
+        """
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            if total == 0:
+                return None
+            return self._counters.get(numerator, 0) / total
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Get a copy of all counters.
+
+        Returns:
+            Dictionary of counter name to value
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        with self._lock:
+            self._counters.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
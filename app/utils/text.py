@@ -0,0 +1,112 @@
+"""Lightweight text utilities shared by routing and retrieval.
+
+Pure-Python tokenization and set-similarity helpers for cheap local
+decisions (no model calls).
+"""
+
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Function words that carry no topic information
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+else few for from further had has have having he her here hers herself him himself his
+how i if in into is it its itself just let me more most my myself no nor not now of off
+on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves ok okay please thanks thank
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Tokens in order (apostrophe suffixes such as "'s" are kept)
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_token(token: str) -> str:
+    """
+    Crude stemming so singular and plural forms match.
+
+    Args:
+        token: Lowercase token
+
+    Returns:
+        Normalized token
+    """
+    if token.endswith("'s"):
+        token = token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    return token
+
+
+def content_tokens(text: str) -> set[str]:
+    """
+    Get the normalized topic-bearing tokens of a text.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Set of tokens with stopwords removed
+    """
+    return {normalize_token(token) for token in tokenize(text) if token not in STOPWORDS}
+
+
+def index_terms(text: str) -> list[str]:
+    """
+    Get the normalized search terms of a text, keeping repeats.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Terms in order with stopwords removed (for term-frequency counts)
+    """
+    return [normalize_token(token) for token in tokenize(text) if token not in STOPWORDS]
+
+
+def containment(query: set[str], reference: set[str]) -> float:
+    """
+    Fraction of the query tokens found in the reference.
+
+    Unlike Jaccard, a short query is not penalized for a long reference.
+
+    Args:
+        query: Query token set
+        reference: Reference token set
+
+    Returns:
+        Score in [0, 1] (0.0 for an empty query)
+    """
+    if not query:
+        return 0.0
+    return len(query & reference) / len(query)
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    """
+    Jaccard similarity of two token sets.
+
+    Args:
+        a: First token set
+        b: Second token set
+
+    Returns:
+        Score in [0, 1] (0.0 if both are empty)
+    """
+    union = a | b
+    if not union:
+        return 0.0
+    return len(a & b) / len(union)
@@ -0,0 +1,79 @@
+"""Token counting for prompt budgets.
+
+Uses the tiktoken encoding of the default model when it is available and
+falls back to a characters-per-token estimate otherwise (tiktoken downloads
+its encodings on first use, which fails offline).
+"""
+
+import logging
+import threading
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token for English text with OpenAI encodings
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once (None if unavailable)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    try:
+                        _encoding = tiktoken.encoding_for_model(settings.default_llm_model)
+                    except KeyError:
+                        _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Token count (estimated if tiktoken is unavailable)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to at most max_tokens tokens.
+
+    Args:
+        text: Input text
+        max_tokens: Token limit
+
+    Returns:
+        Truncated text (unchanged if it already fits)
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
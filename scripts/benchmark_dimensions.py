@@ -0,0 +1,151 @@
+"""Benchmark: Query latency and index size by embedding dimensionality
+
+Builds a throwaway Chroma collection at each dimensionality from the same
+corpus, shortened the way text-embedding-3 shortens vectors (first n values,
+re-normalized), and reports on-disk index size, query latency and recall@k
+against exact search over the full-size vectors.
+
+The corpus is read from the vector store; when it holds too few chunks, a
+synthetic corpus of clustered unit vectors whose variance decays across
+dimensions (like Matryoshka-trained embeddings) is used instead.
+
+Usage:
+    python scripts/benchmark_dimensions.py [--dimensions 256 512 1536]
+        [--k 5] [--queries 200] [--persist-dir data/vector_stores]
+        [--synthetic 10000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+
+from app.config.settings import settings
+from app.rag.embeddings import FULL_DIMENSIONS, truncate_embeddings
+from app.rag.quantization import squared_l2
+from app.rag.sidecar import VectorSidecar
+
+MIN_CORPUS = 100
+ADD_BATCH_SIZE = 1000
+
+
+def load_corpus(persist_dir: str) -> np.ndarray:
+    """Read every stored embedding from the vector store collections."""
+    if not Path(persist_dir).exists():
+        return np.empty((0, 0), dtype=np.float32)
+    client = chromadb.PersistentClient(
+        path=persist_dir, settings=ChromaSettings(anonymized_telemetry=False)
+    )
+    vectors = []
+    for collection in client.list_collections():
+        if (collection.metadata or {}).get("vectors") == "sidecar":
+            continue  # Placeholders; the vectors are read from the sidecars below
+        results = client.get_collection(collection.name).get(include=["embeddings"])
+        vectors.extend(results["embeddings"])
+    for directory in Path(persist_dir).glob("**/vectors/*.vectors"):
+        vectors.extend(VectorSidecar.load(directory).vectors)
+    return np.array(vectors, dtype=np.float32)
+
+
+def synthetic_corpus(size: int, dimensions: int, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors with most of their variance in the leading dimensions."""
+    rng = np.random.default_rng(seed)
+    decay = 1 / np.sqrt(1 + np.arange(dimensions) / 64)
+    centers = rng.normal(size=(max(size // 50, 1), dimensions)) * decay
+    noise = 0.6 * rng.normal(size=(size, dimensions)) * decay
+    vectors = centers[rng.integers(len(centers), size=size)] + noise
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def directory_size(path: Path) -> int:
+    """Total size of the files under a directory."""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def measure(corpus: np.ndarray, queries: np.ndarray, truth: list[set], dimensions: int, k: int):
+    """Return (index MB, p50 ms, p95 ms, recall@k) for one dimensionality."""
+    vectors = truncate_embeddings(corpus, dimensions)
+    query_vectors = truncate_embeddings(queries, dimensions)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(
+            path=directory, settings=ChromaSettings(anonymized_telemetry=False)
+        )
+        collection = client.create_collection(f"bench_{dimensions}")
+        ids = [str(i) for i in range(len(vectors))]
+        for start in range(0, len(vectors), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            collection.add(ids=ids[start:end], embeddings=vectors[start:end])
+
+        latencies = []
+        hits = 0
+        for query, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            results = collection.query(query_embeddings=[query], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected & {int(doc_id) for doc_id in results["ids"][0]})
+        size = directory_size(Path(directory))
+
+    latencies.sort()
+    return (
+        size / 1e6,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        hits / (len(queries) * k),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding dimensionality")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, FULL_DIMENSIONS])
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument("--persist-dir", default=settings.chroma_persist_dir, help="Vector store directory")
+    parser.add_argument(
+        "--synthetic", type=int, default=10000,
+        help=f"Synthetic corpus size when the store holds fewer than {MIN_CORPUS} chunks"
+    )
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.persist_dir)
+    source = f"vector store at {args.persist_dir}"
+    if len(corpus) < MIN_CORPUS:
+        corpus = synthetic_corpus(args.synthetic, FULL_DIMENSIONS)
+        source = f"synthetic corpus (store has fewer than {MIN_CORPUS} chunks)"
+    full = corpus.shape[1]
+    dimensions = [d for d in args.dimensions if d <= full]
+
+    # Hold out query vectors so no query finds itself
+    rng = np.random.default_rng(11)
+    held_out = rng.choice(len(corpus), size=min(args.queries, len(corpus) // 10), replace=False)
+    mask = np.ones(len(corpus), dtype=bool)
+    mask[held_out] = False
+    queries, corpus = corpus[held_out], corpus[mask]
+
+    # Ground truth: exact search at the stored (largest) dimensionality
+    truth = []
+    for query in queries:
+        distances = squared_l2(query, corpus)
+        truth.append(set(np.argpartition(distances, args.k - 1)[:args.k].tolist()))
+
+    print("=" * 64)
+    print(f"Embedding dimensionality benchmark: {source}")
+    print(f"{len(corpus)} chunks, {len(queries)} queries, k={args.k}, recall vs exact {full}-d search")
+    print("=" * 64)
+    print(f"  {'dims':>6} {'index MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+    for size in dimensions:
+        index_mb, p50, p95, recall = measure(corpus, queries, truth, size, args.k)
+        print(f"  {size:>6} {index_mb:>9.1f} {p50:>8.2f} {p95:>8.2f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
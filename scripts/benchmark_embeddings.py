@@ -0,0 +1,113 @@
+"""Benchmark: Query embeddings under concurrency, direct vs micro-batched
+
+Simulates an embeddings endpoint whose cost is a fixed per-call overhead
+(connection, TLS, queueing) plus a small per-text cost, reached through a
+bounded connection pool, and issues single query embeddings from many
+concurrent request threads. Compares one call per query with the
+EmbeddingBatcher used by VectorStoreManager.embed_query.
+
+Usage:
+    python scripts/benchmark_embeddings.py [--threads 32] [--queries 8]
+        [--call-ms 40] [--per-text-ms 0.5] [--connections 8]
+        [--window-ms 5] [--batch-size 16]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rag.embeddings import EmbeddingBatcher
+
+
+class SimulatedEndpoint:
+    """Stand-in for the embeddings API with per-call and per-text latency."""
+
+    def __init__(self, call_ms: float, per_text_ms: float, connections: int):
+        self.call_s = call_ms / 1000
+        self.per_text_s = per_text_ms / 1000
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._pool = threading.BoundedSemaphore(connections)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.calls += 1
+        with self._pool:
+            time.sleep(self.call_s + self.per_text_s * len(texts))
+        return [[float(len(text)), 0.0, 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def run(embed, threads: int, queries: int) -> tuple[float, list[float]]:
+    """Run concurrent request threads; return wall time and per-query latencies."""
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        for i in range(queries):
+            start = time.perf_counter()
+            embed(f"request {worker_id} question {i}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def report(label: str, wall: float, latencies: list[float], calls: int) -> None:
+    """Print throughput, latency percentiles and endpoint calls."""
+    total = len(latencies)
+    p50 = latencies[total // 2] * 1000
+    p95 = latencies[int(total * 0.95) - 1] * 1000
+    print(
+        f"  {label:<10} {total / wall:8.1f} queries/s   p50 {p50:6.1f} ms   "
+        f"p95 {p95:6.1f} ms   {calls:5d} endpoint calls"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query embedding micro-batching")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--queries", type=int, default=8, help="Queries per request thread")
+    parser.add_argument("--call-ms", type=float, default=40.0, help="Simulated per-call latency")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="Simulated per-text latency")
+    parser.add_argument("--connections", type=int, default=8, help="HTTP connection pool size")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="Batching window")
+    parser.add_argument("--batch-size", type=int, default=16, help="Maximum batch size")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Query embedding benchmark ({args.threads} threads x {args.queries} queries)")
+    print(
+        f"endpoint {args.call_ms} ms/call + {args.per_text_ms} ms/text, {args.connections} connections; "
+        f"window {args.window_ms} ms, batch {args.batch_size}"
+    )
+    print("=" * 60)
+
+    direct = SimulatedEndpoint(args.call_ms, args.per_text_ms, args.connections)
+    wall, latencies = run(direct.embed_query, args.threads, args.queries)
+    report("direct", wall, latencies, direct.calls)
+
+    batched = SimulatedEndpoint(args.call_ms, args.per_text_ms, args.connections)
+    batcher = EmbeddingBatcher(
+        batched.embed_documents, max_batch_size=args.batch_size, window_ms=args.window_ms
+    )
+    wall, latencies = run(batcher.embed, args.threads, args.queries)
+    report("batched", wall, latencies, batched.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: IVF-PQ recall and latency versus nprobe
+
+Trains an IVF-PQ index on a sample of the corpus (as VECTOR_QUANTIZATION=ivfpq
+does at ingestion), then sweeps nprobe and reports recall@k against exact
+search, with and without rescoring a shortlist at full precision, query
+latency, and bytes scanned per vector (the codes are stored in addition
+to ChromaDB's float32 vectors). The index is written to a temporary
+directory and searched memory-mapped, as in the vector store.
+
+The corpus comes from the vector store, or a synthetic corpus of clustered
+unit vectors when it holds too few chunks (see benchmark_quantization.py).
+
+Usage:
+    python scripts/benchmark_ivfpq.py [--nprobe 1 4 16 64] [--k 5]
+        [--nlist 1024] [--subquantizers 32] [--train-size 20000]
+        [--rescore-factor 4] [--queries 200] [--synthetic 50000]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config.settings import settings
+from app.rag.ivfpq import IVFPQIndex
+from app.rag.quantization import squared_l2
+from scripts.benchmark_quantization import MIN_CORPUS, exact_top_k, load_corpus, synthetic_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF-PQ index")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64], help="Lists scanned per query")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--nlist", type=int, default=settings.ivfpq_nlist, help="Inverted lists")
+    parser.add_argument("--subquantizers", type=int, default=settings.ivfpq_subquantizers, help="PQ bytes per vector")
+    parser.add_argument("--train-size", type=int, default=settings.ivfpq_train_size, help="Training sample size")
+    parser.add_argument(
+        "--rescore-factor", type=int, default=settings.quantization_rescore_factor,
+        help="Shortlist size as a multiple of k"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument("--persist-dir", default=settings.chroma_persist_dir, help="Vector store directory")
+    parser.add_argument(
+        "--synthetic", type=int, default=50000,
+        help=f"Synthetic corpus size when the store holds fewer than {MIN_CORPUS} chunks"
+    )
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic vector dimensions")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.persist_dir)
+    source = f"vector store at {args.persist_dir}"
+    if len(corpus) < MIN_CORPUS:
+        corpus = synthetic_corpus(args.synthetic, args.dimensions)
+        source = f"synthetic corpus (store has fewer than {MIN_CORPUS} chunks)"
+
+    # Hold out query vectors so no query finds itself
+    rng = np.random.default_rng(11)
+    held_out = rng.choice(len(corpus), size=min(args.queries, len(corpus) // 10), replace=False)
+    mask = np.ones(len(corpus), dtype=bool)
+    mask[held_out] = False
+    queries, corpus = corpus[held_out], corpus[mask]
+
+    start = time.perf_counter()
+    truth = [set(exact_top_k(corpus, query, args.k).tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    print("=" * 72)
+    print(f"IVF-PQ benchmark: {source}")
+    print(
+        f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}, "
+        f"nlist={args.nlist}, {args.subquantizers} subquantizers"
+    )
+    print("=" * 72)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        sample = corpus[rng.choice(len(corpus), size=min(args.train_size, len(corpus)), replace=False)]
+        index = IVFPQIndex.train(sample, args.nlist, args.subquantizers, Path(directory) / "bench.ivfpq")
+        trained = time.perf_counter()
+        index.add([str(i) for i in range(len(corpus))], corpus)
+        added = time.perf_counter()
+        index = IVFPQIndex.load(Path(directory) / "bench.ivfpq")
+        print(f"  train {trained - start:.1f} s on {len(sample)} vectors, encode {added - trained:.1f} s")
+        print(
+            f"  {len(corpus) * corpus.shape[1] * 4 / len(corpus):.0f} bytes/vector exact, "
+            f"{index.nbytes / len(corpus):.0f} bytes/vector IVF-PQ "
+            f"(+ {index.centroids.nbytes + index.codebooks.nbytes:,} bytes of centroids and codebooks)"
+        )
+        print(f"  exact flat search: {exact_ms:.2f} ms/query")
+        print()
+        print(f"  {'nprobe':>6} {'recall@k':>9} {'+rescore':>9} {'ms/query':>9}")
+
+        shortlist = args.k * max(args.rescore_factor, 1)
+        for nprobe in args.nprobe:
+            plain_hits = rescored_hits = 0
+            elapsed = 0.0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                hits = [int(doc_id) for doc_id, _ in index.search(query, shortlist, nprobe)]
+                elapsed += time.perf_counter() - start
+                plain_hits += len(expected & set(hits[:args.k]))
+
+                # Rescore the shortlist against the full-precision vectors
+                distances = squared_l2(query, corpus[hits]) if hits else np.empty(0)
+                rescored_hits += len(expected & {hits[i] for i in np.argsort(distances)[:args.k]})
+
+            total = len(queries) * args.k
+            print(
+                f"  {nprobe:>6} {plain_hits / total:>9.3f} {rescored_hits / total:>9.3f} "
+                f"{elapsed / len(queries) * 1000:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
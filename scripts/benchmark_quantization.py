@@ -0,0 +1,151 @@
+"""Benchmark: Recall@k versus index size for quantized embedding search
+
+Loads the stored chunk embeddings of every domain from the vector store,
+holds out a sample of them as queries, and compares exact float32 search
+with the float16 and int8 quantized indexes, with and without rescoring a
+shortlist at full precision (as VectorStoreManager does with
+VECTOR_QUANTIZATION set). The sizes are those of the scanned codes, the
+part of the index held in memory; the float32 vectors used for rescoring
+stay on disk in the memory-mapped vector sidecar.
+
+When the vector store holds too few chunks, a synthetic corpus of
+clustered unit vectors with the embedding model's dimensionality is used
+instead.
+
+Usage:
+    python scripts/benchmark_quantization.py [--k 5] [--queries 200]
+        [--rescore-factor 4] [--persist-dir data/vector_stores]
+        [--synthetic 20000] [--dimensions 1536]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config.settings import settings
+from app.rag.quantization import QuantizedIndex, squared_l2
+from app.rag.sidecar import VectorSidecar
+
+MIN_CORPUS = 100
+
+
+def load_corpus(persist_dir: str) -> np.ndarray:
+    """Read every stored embedding from the vector store collections."""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    if not Path(persist_dir).exists():
+        return np.empty((0, 0), dtype=np.float32)
+    client = chromadb.PersistentClient(
+        path=persist_dir, settings=ChromaSettings(anonymized_telemetry=False)
+    )
+    vectors = []
+    for collection in client.list_collections():
+        if (collection.metadata or {}).get("vectors") == "sidecar":
+            continue  # Placeholders; the vectors are read from the sidecars below
+        results = client.get_collection(collection.name).get(include=["embeddings"])
+        vectors.extend(results["embeddings"])
+    for directory in Path(persist_dir).glob("**/vectors/*.vectors"):
+        vectors.extend(VectorSidecar.load(directory).vectors)
+    return np.array(vectors, dtype=np.float32)
+
+
+def synthetic_corpus(size: int, dimensions: int, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors, shaped like text embeddings of related chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(size // 50, 1), dimensions))
+    vectors = centers[rng.integers(len(centers), size=size)] + 0.6 * rng.normal(size=(size, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k nearest corpus vectors by squared L2 distance."""
+    distances = squared_l2(query, corpus)
+    top = np.argpartition(distances, k - 1)[:k]
+    return top[np.argsort(distances[top])]
+
+
+def evaluate(corpus, queries, truth, dtype, k, rescore_factor):
+    """Return (recall@k, recall@k with rescoring, bytes per vector, ms per query)."""
+    index = QuantizedIndex(dtype)
+    index.add([str(i) for i in range(len(corpus))], corpus)
+
+    plain_hits = rescored_hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        expected = set(expected.tolist())
+        shortlist = [int(doc_id) for doc_id, _ in index.search(query, k * rescore_factor)]
+        plain_hits += len(expected & set(shortlist[:k]))
+
+        # Rescore the shortlist against the full-precision vectors
+        distances = squared_l2(query, corpus[shortlist])
+        rescored = [shortlist[i] for i in np.argsort(distances)[:k]]
+        rescored_hits += len(expected & set(rescored))
+    elapsed = (time.perf_counter() - start) / len(queries) * 1000
+
+    total = len(queries) * k
+    return plain_hits / total, rescored_hits / total, index.nbytes / len(corpus), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized embedding storage")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument(
+        "--rescore-factor", type=int, default=settings.quantization_rescore_factor,
+        help="Shortlist size as a multiple of k"
+    )
+    parser.add_argument("--persist-dir", default=settings.chroma_persist_dir, help="Vector store directory")
+    parser.add_argument(
+        "--synthetic", type=int, default=20000,
+        help=f"Synthetic corpus size when the store holds fewer than {MIN_CORPUS} chunks"
+    )
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic vector dimensions")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.persist_dir)
+    source = f"vector store at {args.persist_dir}"
+    if len(corpus) < MIN_CORPUS:
+        corpus = synthetic_corpus(args.synthetic, args.dimensions)
+        source = f"synthetic corpus (store has fewer than {MIN_CORPUS} chunks)"
+
+    # Hold out query vectors so no query finds itself
+    rng = np.random.default_rng(11)
+    held_out = rng.choice(len(corpus), size=min(args.queries, len(corpus) // 10), replace=False)
+    mask = np.ones(len(corpus), dtype=bool)
+    mask[held_out] = False
+    queries, corpus = corpus[held_out], corpus[mask]
+    truth = [exact_top_k(corpus, query, args.k) for query in queries]
+
+    print("=" * 72)
+    print(f"Quantized search benchmark: {source}")
+    print(
+        f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, "
+        f"k={args.k}, shortlist={args.k * args.rescore_factor}"
+    )
+    print("=" * 72)
+    float32_bytes = corpus.shape[1] * 4
+    print(
+        f"  {'codes':<9} {'bytes/vec':>10} {'total MB':>9} {'recall@k':>9} "
+        f"{'+rescore':>9} {'ms/query':>9}"
+    )
+    print(
+        f"  {'float32':<9} {float32_bytes:>10} {float32_bytes * len(corpus) / 1e6:>9.1f} "
+        f"{1.0:>9.3f} {1.0:>9.3f} {'-':>9}"
+    )
+    for dtype in ("float16", "int8"):
+        recall, rescored, per_vector, ms = evaluate(corpus, queries, truth, dtype, args.k, args.rescore_factor)
+        print(
+            f"  {dtype:<9} {per_vector:>10.0f} {per_vector * len(corpus) / 1e6:>9.1f} "
+            f"{recall:>9.3f} {rescored:>9.3f} {ms:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
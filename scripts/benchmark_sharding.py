@@ -0,0 +1,148 @@
+"""Benchmark: Sharded vector search throughput from 1 to N worker processes
+
+Splits a corpus into one shard per worker process (as VECTOR_SHARDS does)
+and measures single-query latency and the throughput of concurrent
+clients, against the same exact search run in the calling process. Each
+query is scattered to every shard and the per-shard top-k lists are
+merged, so results are exact; the benchmark checks them against a
+brute-force search.
+
+Worker counts above the machine's core count cannot scale and are marked.
+
+The corpus comes from the vector store, or a synthetic corpus of clustered
+unit vectors when it holds too few chunks (see benchmark_quantization.py).
+
+Usage:
+    python scripts/benchmark_sharding.py [--workers 1 2 4 8] [--k 5]
+        [--queries 200] [--clients 8] [--synthetic 200000]
+        [--dimensions 1536]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config.settings import settings
+from app.rag.sharding import ShardedIndex, ShardWorkerPool, search_shard
+from scripts.benchmark_quantization import MIN_CORPUS, exact_top_k, load_corpus, synthetic_corpus
+
+
+def measure(search, queries: np.ndarray, clients: int) -> tuple[float, float, float]:
+    """Return (p50 ms, p95 ms, queries per second with concurrent clients)."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        start = time.perf_counter()
+        list(executor.map(search, queries))
+        elapsed = time.perf_counter() - start
+
+    return (
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        len(queries) / elapsed,
+    )
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cores})
+    parser = argparse.ArgumentParser(description="Benchmark sharded vector search")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="Worker process counts")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query vectors")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--persist-dir", default=settings.chroma_persist_dir, help="Vector store directory")
+    parser.add_argument(
+        "--synthetic", type=int, default=200000,
+        help=f"Synthetic corpus size when the store holds fewer than {MIN_CORPUS} chunks"
+    )
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic vector dimensions")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.persist_dir)
+    source = f"vector store at {args.persist_dir}"
+    if len(corpus) < MIN_CORPUS:
+        corpus = synthetic_corpus(args.synthetic, args.dimensions)
+        source = f"synthetic corpus (store has fewer than {MIN_CORPUS} chunks)"
+
+    # Hold out query vectors so no query finds itself
+    rng = np.random.default_rng(11)
+    held_out = rng.choice(len(corpus), size=min(args.queries, len(corpus) // 10), replace=False)
+    mask = np.ones(len(corpus), dtype=bool)
+    mask[held_out] = False
+    queries, corpus = corpus[held_out], corpus[mask]
+    truth = [exact_top_k(corpus, query, args.k).tolist() for query in queries]
+    ids = [str(i) for i in range(len(corpus))]
+
+    print("=" * 72)
+    print(f"Sharded search benchmark: {source}")
+    print(
+        f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}, "
+        f"{args.clients} concurrent clients, {cores} CPU cores"
+    )
+    print("=" * 72)
+    print(f"  {'workers':>10} {'p50 ms':>8} {'p95 ms':>8} {'QPS':>8} {'speedup':>8} {'exact':>6}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Baseline: the shard search kernel over the whole corpus, in this process
+        index = ShardedIndex.create(Path(directory) / "baseline.shards", 1, corpus.shape[1])
+        index.add(ids, corpus)
+        base = str(index.directory / "shard-0")
+
+        def search(query):
+            return search_shard(base, index.epoch, len(corpus), corpus.shape[1], query[None, :], args.k)[0]
+
+        exact = all(
+            [int(doc_id) for doc_id, _ in search(query)] == expected
+            for query, expected in zip(queries, truth)
+        )
+        p50, p95, baseline_qps = measure(search, queries, args.clients)
+    print(
+        f"  {'in-process':>10} {p50:>8.2f} {p95:>8.2f} {baseline_qps:>8.1f} {1.0:>8.2f} "
+        f"{'yes' if exact else 'no':>6}"
+    )
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            index = ShardedIndex.create(Path(directory) / "bench.shards", workers, corpus.shape[1])
+            index.add(ids, corpus)
+            pool = ShardWorkerPool(workers)
+            try:
+                def search(query, index=index, pool=pool):
+                    return index.search(pool, query[None, :], args.k)[0]
+
+                # Warm up: start the workers and map every shard
+                exact = all(
+                    [int(doc_id) for doc_id, _ in search(query)] == expected
+                    for query, expected in zip(queries, truth)
+                )
+                p50, p95, qps = measure(search, queries, args.clients)
+            finally:
+                pool.shutdown()
+
+        marker = " *" if workers > cores else ""
+        print(
+            f"  {workers:>10} {p50:>8.2f} {p95:>8.2f} {qps:>8.1f} {qps / baseline_qps:>8.2f} "
+            f"{'yes' if exact else 'no':>6}{marker}"
+        )
+
+    if any(workers > cores for workers in args.workers):
+        print(f"\n  * more workers than the {cores} available cores; no further scaling expected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark: State construction for a long conversation history
+
+Compares the slotted state records used inside the graph with the Pydantic
+models used at the API boundary, for a 1,000-message history (the shape of
+ConversationService.messages_to_state_format on a long conversation).
+
+Usage:
+    python scripts/benchmark_state.py [--messages 1000] [--repeat 20]
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.models import StateMessage, state_to_api
+from app.orchestration.state import Message, create_initial_state
+from app.services.conversation import ConversationService
+
+
+def make_db_history(count: int) -> list[SimpleNamespace]:
+    """Create stand-ins for database message rows."""
+    start = datetime.now() - timedelta(hours=1)
+    return [
+        SimpleNamespace(
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"Message number {i} about Python, careers and travel plans.",
+            agent=None if i % 2 == 0 else "professional",
+            timestamp=start + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def build_state_records(rows: list) -> dict:
+    """Build a graph state from history with slotted records."""
+    state = create_initial_state("Latest question")
+    state["messages"] = ConversationService.messages_to_state_format(rows) + state["messages"]
+    return state
+
+
+def build_state_pydantic(rows: list) -> dict:
+    """Build the same history with validated Pydantic models."""
+    state = create_initial_state("Latest question")
+    state["messages"] = [
+        StateMessage(role=row.role, content=row.content, agent=row.agent, timestamp=row.timestamp)
+        for row in rows
+    ] + state["messages"]
+    return state
+
+
+def report(label: str, seconds: float, repeat: int) -> float:
+    """Print and return the per-run time in milliseconds."""
+    per_run = seconds / repeat * 1000
+    print(f"  {label:<38} {per_run:8.3f} ms")
+    return per_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark state record construction")
+    parser.add_argument("--messages", type=int, default=1000, help="History length")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+    args = parser.parse_args()
+
+    rows = make_db_history(args.messages)
+    records = [Message(role=r.role, content=r.content, agent=r.agent, timestamp=r.timestamp) for r in rows]
+    models = [StateMessage.model_validate(m) for m in records]
+
+    print("=" * 60)
+    print(f"State construction benchmark ({args.messages} messages, {args.repeat} runs)")
+    print("=" * 60)
+
+    print("\nConstruction (history -> state):")
+    records_ms = report("slotted records", timeit.timeit(lambda: build_state_records(rows), number=args.repeat), args.repeat)
+    pydantic_ms = report("pydantic models", timeit.timeit(lambda: build_state_pydantic(rows), number=args.repeat), args.repeat)
+    print(f"  speedup: {pydantic_ms / records_ms:.1f}x")
+
+    print("\nSerialization (to dicts):")
+    records_ms = report("Message.to_dict", timeit.timeit(lambda: [m.to_dict() for m in records], number=args.repeat), args.repeat)
+    pydantic_ms = report("BaseModel.model_dump", timeit.timeit(lambda: [m.model_dump() for m in models], number=args.repeat), args.repeat)
+    print(f"  speedup: {pydantic_ms / records_ms:.1f}x")
+
+    print("\nAPI boundary conversion (state_to_api):")
+    state = build_state_records(rows)
+    report("records -> pydantic", timeit.timeit(lambda: state_to_api(state), number=args.repeat), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
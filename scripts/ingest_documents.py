@@ -6,6 +6,11 @@ Manual script for ingesting documents into agent-specific vector stores.
 Usage:
     python scripts/ingest_documents.py --domain professional --file path/to/document.pdf
     python scripts/ingest_documents.py --domain communication --directory data/documents/communication/
+    python scripts/ingest_documents.py --domain professional --rebuild-lexical
+    python scripts/ingest_documents.py --domain professional --rebuild-quantized
+    python scripts/ingest_documents.py --domain professional --rebuild-dedup
+    python scripts/ingest_documents.py --domain professional --reindex
+    python scripts/ingest_documents.py --domain knowledge --user alice --file notes.txt
 """
 
 import argparse
@@ -17,6 +22,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from app.rag import get_ingestion_pipeline, AGENT_DOMAINS
+from app.rag.namespaces import namespace_scope
 
 
 def main():
@@ -47,9 +53,67 @@ def main():
         type=str,
         help="Source identifier for documents"
     )
+    parser.add_argument(
+        "--rebuild-lexical",
+        action="store_true",
+        help="Rebuild the domain's BM25 index from its vector store"
+    )
+    parser.add_argument(
+        "--rebuild-quantized",
+        action="store_true",
+        help="Rebuild the domain's quantized vector index (moving its vectors out of ChromaDB first)"
+    )
+    parser.add_argument(
+        "--rebuild-dedup",
+        action="store_true",
+        help="Rebuild the domain's near-duplicate (MinHash) index from its vector store"
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Rebuild the domain at the configured EMBEDDING_DIMENSIONS"
+    )
+    parser.add_argument(
+        "--user",
+        type=str,
+        help="User whose namespace to use (requires VECTOR_NAMESPACES_ENABLED)"
+    )
     
     args = parser.parse_args()
     
+    with namespace_scope(args.user):
+        ingest(args, parser)
+
+
+def ingest(args, parser):
+    """Run the requested ingestion or index rebuild."""
+    if args.rebuild_lexical:
+        indexed = get_ingestion_pipeline().rebuild_lexical_index(args.domain)
+        print(f"✓ Rebuilt {args.domain} lexical index: {indexed} chunks")
+        return
+    
+    if args.rebuild_quantized:
+        indexed = get_ingestion_pipeline().rebuild_quantized_index(args.domain)
+        print(f"✓ Rebuilt {args.domain} quantized index: {indexed} chunks")
+        return
+    
+    if args.rebuild_dedup:
+        indexed = get_ingestion_pipeline().rebuild_duplicate_index(args.domain)
+        print(f"✓ Rebuilt {args.domain} near-duplicate index: {indexed} chunks")
+        return
+    
+    if args.reindex:
+        report = get_ingestion_pipeline().reindex_domain(args.domain)
+        if not report["chunks"]:
+            print(f"✓ {args.domain} already at {report['to_dimensions']} dimensions (or empty)")
+        else:
+            print(
+                f"✓ Re-indexed {args.domain}: {report['chunks']} chunks, "
+                f"{report['from_dimensions']} -> {report['to_dimensions']} dimensions, "
+                f"{report['embedding_calls']} embedding calls"
+            )
+        return
+    
     # Validate arguments
     if not args.file and not args.directory:
         parser.error("Either --file or --directory must be specified")
@@ -104,6 +168,15 @@ def main():
                         error = file_info.get('error', 'Unknown error')
                         print(f"  ✗ {Path(path).name}: {error}")
         
+        report = pipeline.dedup_report
+        if report["duplicates"]:
+            print(
+                f"\nNear-duplicates: {report['duplicates']} of {report['chunks']} chunks not embedded "
+                f"({report['linked']} linked to kept chunks), "
+                f"~{report['embedding_tokens_avoided']} embedding tokens and "
+                f"{report['embedding_calls_avoided']} embedding calls avoided"
+            )
+        
         print(f"\nDocuments are now available to the {args.domain} agent!")
         
     except Exception as e:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Vector Shard Rebalancing Script
+
+Shows how a sharded domain's vectors are spread over its shards and
+rewrites them evenly, optionally into a different number of shards
+(e.g. after changing VECTOR_SHARDS). With --rebuild the shards are first
+regenerated from the vector store collection.
+
+Usage:
+    python scripts/rebalance_shards.py --domain shared
+    python scripts/rebalance_shards.py --domain shared --shards 8
+    python scripts/rebalance_shards.py --domain shared --rebuild
+    python scripts/rebalance_shards.py --domain shared --user alice
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.rag import get_ingestion_pipeline, get_vector_store_manager, AGENT_DOMAINS
+from app.rag.namespaces import namespace_scope
+
+
+def describe(counts: list[int]) -> str:
+    """Summarize shard sizes."""
+    if not counts:
+        return "not sharded yet"
+    spread = max(counts) - min(counts)
+    return f"{sum(counts)} vectors in {len(counts)} shards {counts} (spread {spread})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance a domain's vector shards")
+    parser.add_argument(
+        "--domain",
+        type=str,
+        default="shared",
+        choices=AGENT_DOMAINS,
+        help="Sharded agent domain"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="New number of shards (default: VECTOR_SHARDS)"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Regenerate the shards from the vector store before rebalancing"
+    )
+    parser.add_argument(
+        "--user",
+        type=str,
+        help="User whose namespace to use (requires VECTOR_NAMESPACES_ENABLED)"
+    )
+    
+    args = parser.parse_args()
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards must be at least 1")
+    
+    with namespace_scope(args.user):
+        vector_store = get_vector_store_manager()
+        index = vector_store.sharded_index(args.domain)
+        if index is None:
+            parser.error(f"Domain {args.domain} is not sharded (set VECTOR_SHARDS and VECTOR_SHARDED_DOMAINS)")
+        
+        if args.rebuild:
+            indexed = get_ingestion_pipeline().rebuild_shards(args.domain)
+            print(f"✓ Rebuilt {args.domain} shards from the vector store: {indexed} chunks")
+        
+        print(f"Before: {describe(index.shard_counts(args.domain))}")
+        counts = index.rebalance(args.domain, args.shards)
+        vector_store.bump_generation(args.domain)
+        print(f"After:  {describe(counts)}")
+        
+        if counts and len(counts) != index.pool.workers:
+            print(
+                f"Note: {len(counts)} shards on {index.pool.workers} workers; "
+                f"some workers serve several shards"
+            )
+        vector_store.shard_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
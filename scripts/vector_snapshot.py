@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Vector Store Snapshot Script
+
+Exports a domain's documents and vectors to a single compact snapshot
+file, or loads one into a (new) vector store without re-running ingestion
+or making any embedding calls.
+
+Usage:
+    python scripts/vector_snapshot.py export --domain shared --file shared.vsnap
+    python scripts/vector_snapshot.py export --domain shared --file shared.vsnap --compression none
+    python scripts/vector_snapshot.py import --domain shared --file shared.vsnap [--replace]
+    python scripts/vector_snapshot.py import --domain knowledge --user alice --file alice.vsnap
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.rag import get_vector_store_manager, AGENT_DOMAINS
+from app.rag.namespaces import namespace_scope
+from app.rag.snapshot import COMPRESSION_TYPES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import vector store snapshots")
+    parser.add_argument(
+        "action",
+        choices=["export", "import"],
+        help="Write a snapshot of the domain, or load one into it"
+    )
+    parser.add_argument(
+        "--domain",
+        type=str,
+        required=True,
+        choices=AGENT_DOMAINS,
+        help="Agent domain"
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        required=True,
+        help="Snapshot file"
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default="zlib",
+        choices=COMPRESSION_TYPES,
+        help="Compression of ids, documents and metadata (export only)"
+    )
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Empty the domain before importing"
+    )
+    parser.add_argument(
+        "--user",
+        type=str,
+        help="User whose namespace to use (requires VECTOR_NAMESPACES_ENABLED)"
+    )
+    
+    args = parser.parse_args()
+    
+    vector_store = get_vector_store_manager()
+    start = time.perf_counter()
+    try:
+        with namespace_scope(args.user):
+            if args.action == "export":
+                report = vector_store.export_domain(args.domain, args.file, args.compression)
+                print(
+                    f"✓ Exported {args.domain}: {report['chunks']} chunks x {report['dimensions']} dims "
+                    f"to {args.file} ({report['bytes'] / 1e6:.1f} MB)"
+                )
+            else:
+                report = vector_store.import_domain(args.domain, args.file, replace=args.replace)
+                print(
+                    f"✓ Imported {report['imported']} of {report['chunks']} chunks "
+                    f"from {report['source_domain']} snapshot into {args.domain}"
+                )
+    except (OSError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    print(f"  {time.perf_counter() - start:.1f} s, no embedding calls")
+
+
+if __name__ == "__main__":
+    main()
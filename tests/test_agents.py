@@ -8,7 +8,7 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 
-from app.orchestration.state import AgentState, Message
+from app.orchestration.state import AgentState, Message, RoutingDecision
 from app.agents.general import general_agent
 from app.agents.professional import professional_agent
 from app.agents.communication import communication_agent
@@ -253,3 +253,116 @@ class TestAllAgentsErrorHandling:
             
             assert len(result["messages"]) == 2
             assert result["messages"][-1].content == "Plain string response"
+
+
+class TestModelEscalation:
+    """Tests for the model escalation policy shared by all agents."""
+    
+    def test_no_escalation_for_confident_routing(self, base_state, mock_llm_response):
+        """Test that a confident routing decision stays on the default tier."""
+        base_state["routing_history"] = [RoutingDecision(target_agent="general", confidence=0.9)]
+        
+        with patch('app.agents.general.get_llm') as mock_get_llm, \
+                patch('app.agents.base.get_escalation_llm') as mock_escalation:
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = mock_llm_response
+            mock_get_llm.return_value = mock_llm
+            
+            result = general_agent(base_state)
+            
+            mock_escalation.assert_not_called()
+            assert result["messages"][-1].content == mock_llm_response.content
+    
+    def test_low_confidence_escalates_directly(self, base_state, mock_llm_response):
+        """Test that low routing confidence skips the small model."""
+        base_state["routing_history"] = [RoutingDecision(target_agent="general", confidence=0.3)]
+        
+        with patch('app.agents.general.get_llm') as mock_get_llm, \
+                patch('app.agents.base.get_escalation_llm') as mock_escalation:
+            mock_llm = Mock()
+            mock_get_llm.return_value = mock_llm
+            big_llm = Mock()
+            big_llm.invoke.return_value = "Escalated answer"
+            mock_escalation.return_value = big_llm
+            
+            result = general_agent(base_state)
+            
+            mock_llm.invoke.assert_not_called()
+            assert result["messages"][-1].content == "Escalated answer"
+    
+    def test_failed_answer_check_escalates(self, base_state):
+        """Test that an empty answer is retried on the escalation model."""
+        with patch('app.agents.professional.get_llm') as mock_get_llm, \
+                patch('app.agents.base.get_escalation_llm') as mock_escalation:
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = "   "
+            mock_get_llm.return_value = mock_llm
+            big_llm = Mock()
+            big_llm.invoke.return_value = "Escalated answer"
+            mock_escalation.return_value = big_llm
+            
+            result = professional_agent(base_state)
+            
+            mock_llm.invoke.assert_called_once()
+            assert result["messages"][-1].content == "Escalated answer"
+    
+    def test_escalation_disabled_keeps_default_answer(self, base_state):
+        """Test that the default answer is kept when escalation is disabled."""
+        with patch('app.agents.decision.get_llm') as mock_get_llm, \
+                patch('app.agents.base.get_escalation_llm', return_value=None):
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = ""
+            mock_get_llm.return_value = mock_llm
+            
+            result = decision_agent(base_state)
+            
+            assert result["messages"][-1].content == ""
+
+
+class TestStructuredCompletion:
+    """Tests for the structured completion signal returned by agents."""
+    
+    def test_structured_reply_is_parsed(self, base_state):
+        """Test that the answer and completion flag are taken from structured output."""
+        with patch('app.agents.knowledge.get_llm') as mock_get_llm:
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = (
+                '{"answer": "Part one of the summary.", "done": false, '
+                '"follow_up": "Summarize the second document"}'
+            )
+            mock_get_llm.return_value = mock_llm
+            
+            result = knowledge_agent(base_state)
+            
+            assert result["messages"][-1].content == "Part one of the summary."
+            assert result["agent_done"] is False
+            assert result["follow_up"] == "Summarize the second document"
+            assert "response_format" in mock_llm.invoke.call_args[1]
+    
+    def test_truncated_structured_reply_keeps_partial_answer(self, base_state):
+        """Test that a reply cut off at max_tokens yields its answer text, not the JSON."""
+        truncated = Mock()
+        truncated.content = '{"answer": "First point.\\nSecond po'
+        truncated.response_metadata = {"finish_reason": "length"}
+        
+        with patch('app.agents.professional.get_llm') as mock_get_llm, \
+                patch('app.agents.base.get_escalation_llm', return_value=None):
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = truncated
+            mock_get_llm.return_value = mock_llm
+            
+            result = professional_agent(base_state)
+            
+            assert result["messages"][-1].content == "First point.\nSecond po"
+    
+    def test_plain_text_reply_counts_as_done(self, base_state, mock_llm_response):
+        """Test that answers without structured output end the workflow."""
+        with patch('app.agents.general.get_llm') as mock_get_llm:
+            mock_llm = Mock()
+            mock_llm.invoke.return_value = mock_llm_response
+            mock_get_llm.return_value = mock_llm
+            
+            result = general_agent(base_state)
+            
+            assert result["agent_done"] is True
+            assert result["follow_up"] is None
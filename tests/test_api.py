@@ -92,6 +92,19 @@ class TestStateExampleEndpoint:
         assert "timestamp" in message
 
 
+class TestMetricsEndpoint:
+    """Tests for the /api/metrics endpoint."""
+    
+    def test_metrics_endpoint_response_format(self):
+        """Test metrics endpoint returns counters and rates."""
+        response = client.get("/api/metrics")
+        data = response.json()
+        
+        assert response.status_code == 200
+        assert "counters" in data
+        assert "speculation_hit_rate" in data["rates"]
+
+
 class TestChatEndpoint:
     """Tests for the /api/chat endpoint."""
     
@@ -268,3 +281,73 @@ class TestChatEndpointErrors:
         response = client.post("/api/chat", data="message=hello")
         
         assert response.status_code == 422
+
+
+class TestConcurrentChat:
+    """Tests for chat requests served concurrently."""
+    
+    def send_concurrently(self, fake_workflow, count=4):
+        """Post count chat requests at once, each running fake_workflow."""
+        import asyncio
+        import httpx
+        
+        async def send_all():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await asyncio.gather(*(
+                    http.post("/api/chat/graph", json={"message": f"Question {i}", "user_id": "test_user"})
+                    for i in range(count)
+                ))
+        
+        with patch("app.api.routes.run_workflow", side_effect=fake_workflow):
+            return asyncio.run(send_all())
+    
+    def answer(self, state):
+        """Finish a fake workflow run with an assistant reply."""
+        from app.orchestration.state import RoutingDecision
+        
+        state["messages"].append(Message(role="assistant", content="ok", agent="general"))
+        state["routing_history"].append(RoutingDecision(target_agent="general", confidence=0.9))
+        return state
+    
+    def test_concurrent_requests_share_embedding_calls(self):
+        """Test that concurrent requests run in parallel, so their embeddings batch."""
+        from app.rag.embeddings import EmbeddingBatcher
+        
+        calls = []
+        def embed_documents(texts):
+            calls.append(len(texts))
+            return [[1.0] for _ in texts]
+        batcher = EmbeddingBatcher(embed_documents, max_batch_size=4, window_ms=1000)
+        
+        def fake_workflow(state, thread_id=None):
+            batcher.embed(state["user_query"])
+            return self.answer(state)
+        
+        responses = self.send_concurrently(fake_workflow)
+        
+        assert [response.status_code for response in responses] == [200] * 4
+        assert calls == [4]
+    
+    def test_concurrent_requests_coalesce_vector_queries(self, tmp_path):
+        """Test that concurrent requests' vector queries share one collection call."""
+        from app.rag.stores import VectorStoreManager
+        from app.utils.metrics import metrics
+        
+        manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.get_collection("knowledge").add(
+            ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["first", "second"]
+        )
+        manager.query_coalescer.max_batch_size = 4
+        manager.query_coalescer.window = 1.0
+        metrics.reset()
+        
+        def fake_workflow(state, thread_id=None):
+            manager.query("knowledge", state["user_query"], n_results=1, query_embedding=[1.0, 0.0])
+            return self.answer(state)
+        
+        responses = self.send_concurrently(fake_workflow)
+        
+        assert [response.status_code for response in responses] == [200] * 4
+        assert metrics.get("query_batch.requests") == 4
+        assert metrics.get("query_batch.calls") == 1
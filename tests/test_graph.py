@@ -0,0 +1,699 @@
+"""
+Unit tests for the LangGraph workflow.
+
+Agents and the LLM router are replaced with fakes so the graph logic can be
+exercised without API calls.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.orchestration import graph
+from app.agents.router import RouteResult
+from app.orchestration.state import AgentState, Message, create_initial_state
+from app.utils.metrics import metrics
+
+
+def make_fake_agent(name: str, calls: list):
+    """Create a fake agent that records calls and answers with its name."""
+    def fake_agent(state: AgentState) -> AgentState:
+        calls.append(name)
+        new_state = state.copy()
+        new_state["messages"] = state["messages"] + [
+            Message(role="assistant", content=f"Answer from {name}", agent=name)
+        ]
+        new_state["current_agent"] = name
+        return new_state
+
+    fake_agent.__name__ = f"{name}_agent"
+    return fake_agent
+
+
+@pytest.fixture
+def fake_agents():
+    """Replace all specialized agents with fakes; yields the call log."""
+    calls = []
+    fakes = {name: make_fake_agent(name, calls) for name in graph.AGENT_FUNCTIONS}
+    with patch.dict(graph.AGENT_FUNCTIONS, fakes):
+        yield calls
+
+
+def wait_for_metric(name: str, timeout: float = 5.0) -> int:
+    """Wait for a counter set from a worker thread to become non-zero."""
+    import time
+
+    end = time.time() + timeout
+    while not metrics.get(name) and time.time() < end:
+        time.sleep(0.01)
+    return metrics.get(name)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start each test with empty counters."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestSpeculativeExecution:
+    """Tests for speculative agent execution alongside the router."""
+
+    def test_speculation_hit_commits_without_rerunning_agent(self, fake_agents):
+        """Test that agreement between prediction and router skips the agent node."""
+        workflow = graph.create_workflow(speculative=True)
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            final_state = workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert fake_agents == ["professional"]
+        assert final_state["messages"][-1].content == "Answer from professional"
+        assert final_state["iterations"] == 1
+        assert metrics.get("speculation.hits") == 1
+        assert any(log.action == "Committed speculative response" for log in final_state["iteration_log"])
+
+    def test_speculation_miss_runs_routed_agent(self, fake_agents):
+        """Test that disagreement discards the speculative run."""
+        from app.orchestration.speculation import speculation_hit_rate
+
+        workflow = graph.create_workflow(speculative=True)
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("decision", 0.9, "LLM: trade-off")):
+            final_state = workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert final_state["messages"][-1].content == "Answer from decision"
+        assert metrics.get("speculation.misses") == 1
+        assert speculation_hit_rate() == 0.0
+
+    def test_speculation_miss_stops_run_before_llm_call(self, fake_agents):
+        """Test that a miss decided during retrieval cancels the speculative LLM call."""
+        import threading
+        from app.utils.deadline import check_deadline
+
+        release = threading.Event()
+        llm_calls = []
+
+        def slow_agent(state):
+            release.wait(5)  # Still retrieving when the router decides
+            check_deadline("LLM call")
+            llm_calls.append("professional")
+            return state
+
+        workflow = graph.create_workflow(speculative=True)
+        with patch.dict(graph.AGENT_FUNCTIONS, {"professional": slow_agent}), \
+             patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("decision", 0.9, "LLM: trade-off")):
+            final_state = workflow.invoke(create_initial_state("Help me debug my Python code"))
+            release.set()
+
+        assert final_state["messages"][-1].content == "Answer from decision"
+        assert wait_for_metric("speculation.cancelled") == 1
+        assert llm_calls == []
+        assert metrics.get("speculation.wasted_calls") == 0
+
+    def test_finished_miss_is_counted_as_wasted(self, fake_agents):
+        """Test that a speculative run that finished before the miss is recorded."""
+        import threading
+
+        finished = threading.Event()
+        fake = graph.AGENT_FUNCTIONS["professional"]
+
+        def fast_agent(state):
+            try:
+                return fake(state)
+            finally:
+                finished.set()
+
+        def route(*args, **kwargs):
+            finished.wait(5)
+            return RouteResult("decision", 0.9, "LLM: trade-off")
+
+        workflow = graph.create_workflow(speculative=True)
+        with patch.dict(graph.AGENT_FUNCTIONS, {"professional": fast_agent}), \
+             patch.object(graph, "route_query_with_fallback", side_effect=route):
+            workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert wait_for_metric("speculation.wasted_calls") == 1
+        assert metrics.get("speculation.cancelled") == 0
+
+    def test_non_speculative_workflow_does_not_speculate(self, fake_agents):
+        """Test that the default workflow only runs the routed agent."""
+        workflow = graph.create_workflow(speculative=False)
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert fake_agents == ["professional"]
+        assert metrics.get("speculation.attempts") == 0
+
+
+class TestFanOut:
+    """Tests for multi-domain fan-out."""
+
+    def test_multi_domain_query_runs_agents_concurrently(self, fake_agents):
+        """Test that secondary agents above threshold run in the same iteration."""
+        workflow = graph.create_workflow(speculative=False)
+        decision = RouteResult("decision", 0.85, "LLM: job + email", also={"communication": 0.8})
+
+        with patch.object(graph, "route_query_with_fallback", return_value=decision):
+            final_state = workflow.invoke(create_initial_state(
+                "Should I take this Python job, and draft the email to accept?"
+            ))
+
+        assert sorted(fake_agents) == ["communication", "decision"]
+        assert final_state["iterations"] == 1
+        response = final_state["messages"][-1]
+        assert response.agent == "decision"
+        assert response.content.index("Answer from decision") < response.content.index("Answer from communication")
+        assert final_state["fanout_agents"] == []
+
+    def test_secondary_agent_below_threshold_is_ignored(self, fake_agents):
+        """Test that weak secondary agents do not trigger fan-out."""
+        workflow = graph.create_workflow(speculative=False)
+        decision = RouteResult("decision", 0.9, "LLM: choice", also={"communication": 0.3})
+
+        with patch.object(graph, "route_query_with_fallback", return_value=decision):
+            final_state = workflow.invoke(create_initial_state("Should I move to Berlin?"))
+
+        assert fake_agents == ["decision"]
+        assert final_state["messages"][-1].content == "Answer from decision"
+
+    def test_fanout_respects_max_agents(self):
+        """Test that fan-out is capped at settings.fanout_max_agents."""
+        from app.config.settings import settings
+        from app.orchestration.fanout import select_fanout_agents
+
+        decision = RouteResult("decision", 0.9, "x", also={
+            "communication": 0.9, "professional": 0.85, "knowledge": 0.8, "general": 0.75
+        })
+
+        agents = select_fanout_agents(decision)
+
+        assert agents[0] == "decision"
+        assert len(agents) == settings.fanout_max_agents
+
+
+class TestDeadline:
+    """Tests for per-request deadline propagation."""
+
+    def test_agent_deadline_error_ends_run_gracefully(self, fake_agents):
+        """Test that an agent hitting the deadline stops the workflow without raising."""
+        from app.utils.deadline import DeadlineExceeded
+
+        def slow_agent(state):
+            raise DeadlineExceeded("Request deadline exceeded before LLM call")
+        slow_agent.__name__ = "professional_agent"
+
+        with patch.dict(graph.AGENT_FUNCTIONS, {"professional": slow_agent}), \
+             patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert final_state["should_continue"] is False
+        assert "deadline" in final_state["error"]
+        assert final_state["messages"][-1].role == "user"
+        assert metrics.get("deadline.expired") == 1
+
+    def test_exhausted_budget_stops_iterating(self):
+        """Test that should_continue ends when another iteration would not fit."""
+        import time
+        from datetime import datetime, timedelta
+
+        state = create_initial_state("Hello", deadline=time.time() + 1)
+        state["iterations"] = 1
+        state["started_at"] = datetime.now() - timedelta(seconds=10)
+        state["should_continue"] = True
+
+        assert graph.should_continue(state) == "end"
+        assert state["iteration_log"][-1].action == "Stopped: Deadline budget exhausted"
+
+    def test_run_workflow_sets_default_deadline(self, fake_agents):
+        """Test that run_workflow bounds every request by the configured timeout."""
+        from app.config.settings import settings
+
+        state = create_initial_state("Help me debug my Python code")
+        with patch.object(graph, "workflow_app", graph.create_workflow(speculative=False)), \
+             patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            final_state = graph.run_workflow(state)
+
+        assert final_state["deadline"] is not None
+        assert final_state["deadline"] <= final_state["started_at"].timestamp() + settings.request_timeout_seconds + 1
+        assert final_state["messages"][-1].content == "Answer from professional"
+
+    def test_llm_retries_fit_remaining_budget(self):
+        """Test that LLM retries are capped so every attempt fits before the deadline."""
+        import time
+        from app.config.llm import LLM_MAX_RETRIES, get_llm
+        from app.utils.deadline import deadline_scope
+
+        with patch("app.config.llm.settings.tool_timeout_seconds", 30):
+            assert get_llm().max_retries == LLM_MAX_RETRIES
+            with deadline_scope(time.time() + 50):
+                llm = get_llm()
+
+        assert llm.request_timeout == 30
+        assert llm.max_retries == 0
+
+    def test_embedding_calls_are_bounded_by_deadline(self, tmp_path):
+        """Test that query embedding requests carry the remaining budget as their timeout."""
+        import time
+        from unittest.mock import MagicMock
+        from app.rag.stores import VectorStoreManager
+        from app.utils.deadline import deadline_scope
+
+        manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.embedding_model = MagicMock()
+        with patch("app.rag.stores.settings.embedding_batch_enabled", False), \
+             deadline_scope(time.time() + 5):
+            manager._embed("debug python")
+
+        timeout = manager.embedding_model.embed_query.call_args.kwargs["timeout"]
+        assert 0 < timeout <= 5
+
+
+class TestRequestMemo:
+    """Tests for request-scoped memoization."""
+
+    def test_duplicate_calls_in_one_run_execute_once(self, fake_agents):
+        """Test that identical calls share one result and the saving is logged."""
+        from app.utils.memo import memoized
+
+        embed_calls = []
+
+        def embedding_agent(state):
+            for _ in range(3):
+                memoized("embedding", "debug python", lambda: embed_calls.append(1) or [0.1])
+            return make_fake_agent("professional", fake_agents)(state)
+        embedding_agent.__name__ = "professional_agent"
+
+        with patch.dict(graph.AGENT_FUNCTIONS, {"professional": embedding_agent}), \
+             patch.object(graph, "workflow_app", graph.create_workflow(speculative=False)), \
+             patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            final_state = graph.run_workflow(create_initial_state("Help me debug my Python code"))
+
+        assert len(embed_calls) == 1
+        log = final_state["iteration_log"][-1]
+        assert log.action == "Memo: 2 duplicate calls skipped"
+        assert log.reasoning == "embedding: 2 of 3 calls deduplicated"
+        assert metrics.get("memo.embedding_hits") == 2
+
+    def test_memo_is_cleared_between_runs(self):
+        """Test that nothing is memoized outside (or across) workflow runs."""
+        from app.utils.memo import current_memo, memo_scope, memoized
+
+        calls = []
+        with memo_scope():
+            memoized("routing", "q", lambda: calls.append(1))
+        with memo_scope():
+            memoized("routing", "q", lambda: calls.append(1))
+        memoized("routing", "q", lambda: calls.append(1))
+
+        assert len(calls) == 3
+        assert current_memo() is None
+
+    def test_routing_is_memoized(self):
+        """Test that repeated routing of the same message calls the LLM once."""
+        from app.agents import router
+        from app.utils.memo import memo_scope
+
+        decision = RouteResult("knowledge", 0.9, "docs", also={"decision": 0.8})
+        with patch.object(router, "route_query", return_value=decision) as route, memo_scope():
+            first = router.route_query_with_fallback("Explain CAP theorem")
+            second = router.route_query_with_fallback("Explain CAP theorem")
+            router.route_query_with_fallback("Explain CAP theorem", exclude=["knowledge"])
+
+        assert route.call_count == 2
+        assert first.reasoning == second.reasoning == "LLM: docs"
+        assert first is not second
+
+
+class TestCompletionSignal:
+    """Tests for looping on the structured completion signal."""
+
+    def test_polite_offer_does_not_trigger_another_iteration(self, fake_agents):
+        """Test that continuation phrases alone no longer loop, and are counted as saved."""
+        def polite_agent(state):
+            new_state = state.copy()
+            new_state["messages"] = state["messages"] + [
+                Message(role="assistant", content="Here it is. Would you like more examples?", agent="general")
+            ]
+            new_state["agent_done"] = True
+            return new_state
+        polite_agent.__name__ = "general_agent"
+
+        with patch.dict(graph.AGENT_FUNCTIONS, {"general": polite_agent}), \
+             patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("general", 0.9, "LLM: chat")):
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(create_initial_state("Show me an example"))
+
+        assert final_state["iterations"] == 1
+        assert metrics.get("completion.iterations_saved") == 1
+
+    def test_follow_up_runs_another_iteration(self, fake_agents):
+        """Test that an agent reporting more work loops and routes the follow-up."""
+        replies = iter([(False, "Draft the acceptance email"), (True, None)])
+
+        def multi_step_agent(state):
+            done, follow_up = next(replies)
+            new_state = state.copy()
+            new_state["messages"] = state["messages"] + [
+                Message(role="assistant", content="Step answer", agent="decision")
+            ]
+            new_state["agent_done"] = done
+            new_state["follow_up"] = follow_up
+            return new_state
+        multi_step_agent.__name__ = "decision_agent"
+
+        route = RouteResult("decision", 0.9, "LLM: choice")
+        with patch.dict(graph.AGENT_FUNCTIONS, {"decision": multi_step_agent}), \
+             patch.object(graph, "route_query_with_fallback", return_value=route) as router:
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(create_initial_state("Should I accept the offer?"))
+
+        assert final_state["iterations"] == 2
+        assert router.call_args_list[1][0][0] == "Should I accept the offer?\nFollow-up: Draft the acceptance email"
+        assert metrics.get("completion.follow_ups") == 1
+
+    def test_speculative_commit_keeps_completion_signal(self, fake_agents):
+        """Test that a committed speculative answer still loops when the agent reports more work."""
+        replies = iter([(False, "Add a regression test"), (True, None)])
+
+        def multi_step_agent(state):
+            done, follow_up = next(replies)
+            new_state = state.copy()
+            new_state["messages"] = state["messages"] + [
+                Message(role="assistant", content="Step answer", agent="professional")
+            ]
+            new_state["agent_done"] = done
+            new_state["follow_up"] = follow_up
+            return new_state
+        multi_step_agent.__name__ = "professional_agent"
+
+        route = RouteResult("professional", 0.95, "LLM: technical")
+        with patch.dict(graph.AGENT_FUNCTIONS, {"professional": multi_step_agent}), \
+             patch.object(graph, "route_query_with_fallback", return_value=route):
+            workflow = graph.create_workflow(speculative=True)
+            final_state = workflow.invoke(create_initial_state("Help me debug my Python code"))
+
+        assert metrics.get("speculation.hits") == 1
+        assert final_state["iterations"] == 2
+        assert metrics.get("completion.follow_ups") == 1
+
+
+class TestReroute:
+    """Tests for re-routing on follow-up iterations."""
+
+    def test_low_confidence_retry_reuses_first_pass_scores(self, fake_agents):
+        """Test that the retry picks the next best agent without another routing call."""
+        decision = RouteResult("general", 0.6, "LLM: unsure", also={"knowledge": 0.65})
+
+        with patch.object(graph, "route_query_with_fallback", return_value=decision) as router:
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(create_initial_state("Tell me about my hobbies"))
+
+        assert router.call_count == 1
+        assert fake_agents == ["general", "knowledge"]
+        assert final_state["tried_agents"] == ["general", "knowledge"]
+        assert metrics.get("routing.reroute_reused") == 1
+
+    def test_reroute_routes_user_query_and_excludes_tried_agents(self):
+        """Test that re-routing ignores the previous answer and skips exhausted agents."""
+        state = create_initial_state("Tell me about my hobbies")
+        state["messages"].append(Message(role="assistant", content="Answer from general", agent="general"))
+        state["current_agent"] = "general"
+        state["tried_agents"] = ["general"]
+        state["routing_scores"] = {"general": 0.6}
+        state["iterations"] = 1
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("knowledge", 0.8, "LLM: personal")) as router:
+            decision = graph.reroute(state)
+
+        router.assert_called_once_with("Tell me about my hobbies", exclude=["general"])
+        assert decision.agent == "knowledge"
+
+
+class TestFastPath:
+    """Tests for the trivial-intent fast path."""
+
+    def test_greeting_skips_router_and_agents(self, fake_agents):
+        """Test that a greeting is answered from a template."""
+        from app.prompts.templates import FAST_PATH_RESPONSES
+
+        with patch.object(graph, "route_query_with_fallback") as router:
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(create_initial_state("Hello!"))
+
+        router.assert_not_called()
+        assert fake_agents == []
+        assert final_state["messages"][-1].content == FAST_PATH_RESPONSES["greeting"]
+        assert final_state["routing_history"][-1].target_agent == "general"
+        assert final_state["iterations"] == 1
+        assert metrics.get("fast_path.hits") == 1
+
+    def test_greeting_with_content_goes_through_router(self, fake_agents):
+        """Test that messages with real content are not short-circuited."""
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.9, "LLM: code")):
+            workflow = graph.create_workflow(speculative=False)
+            workflow.invoke(create_initial_state("Hi, can you review my Python code?"))
+
+        assert fake_agents == ["professional"]
+
+    def test_acknowledging_an_offer_goes_through_router(self, fake_agents):
+        """Test that "sure" after an assistant offer is acted on, not acknowledged."""
+        state = conversation_state(
+            ("Can you help me reply to my landlord?",
+             "Here are the key points to cover. Would you like me to draft the email?",
+             "communication"),
+            query="sure"
+        )
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("communication", 0.9, "LLM: draft")):
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(state)
+
+        assert fake_agents == ["communication"]
+        assert final_state["messages"][-1].content == "Answer from communication"
+        assert metrics.get("fast_path.hits") == 0
+
+    def test_acknowledging_a_statement_uses_fast_path(self, fake_agents):
+        """Test that "ok" after a plain answer still gets the canned reply."""
+        state = conversation_state(
+            ("When is the standup?", "The standup is at 9:30 every weekday.", "knowledge"),
+            query="ok"
+        )
+
+        workflow = graph.create_workflow(speculative=False)
+        workflow.invoke(state)
+
+        assert fake_agents == []
+        assert metrics.get("fast_path.hits") == 1
+
+    def test_classify_intent(self):
+        """Test the local intent classifier."""
+        from app.orchestration.fastpath import classify_intent
+
+        assert classify_intent("thanks a lot!") == "thanks"
+        assert classify_intent("ok, thanks, bye") == "farewell"
+        assert classify_intent("good morning") == "greeting"
+        assert classify_intent("ok so what about tests") is None
+
+
+def conversation_state(*turns: tuple[str, str, str], query: str) -> AgentState:
+    """Create a state whose history holds (user, assistant, agent) turns."""
+    state = create_initial_state(query)
+    history = []
+    for user_text, answer, agent in turns:
+        history.append(Message(role="user", content=user_text))
+        history.append(Message(role="assistant", content=answer, agent=agent))
+    state["messages"] = history + state["messages"]
+    return state
+
+
+class TestStickyRouting:
+    """Tests for conversation-sticky routing of follow-up turns."""
+
+    def test_follow_up_reuses_previous_agent(self, fake_agents):
+        """Test that a short follow-up on the same topic skips the router."""
+        state = conversation_state(
+            ("How should I structure tests in my Python project?",
+             "Keep tests in a tests/ folder and share setup through pytest fixtures.",
+             "professional"),
+            query="And what about the fixtures?"
+        )
+
+        with patch.object(graph, "route_query_with_fallback") as router:
+            workflow = graph.create_workflow(speculative=False)
+            final_state = workflow.invoke(state)
+
+        router.assert_not_called()
+        assert fake_agents == ["professional"]
+        assert final_state["routing_history"][-1].reasoning.startswith("Sticky")
+        assert metrics.get("routing.sticky") == 1
+
+    def test_speculative_workflow_counts_sticky_once(self, fake_agents):
+        """Test that the speculative router reuses the turn's sticky decision instead of recomputing it."""
+        state = conversation_state(
+            ("How should I structure tests in my Python project?",
+             "Keep tests in a tests/ folder and share setup through pytest fixtures.",
+             "professional"),
+            query="And what about the fixtures?"
+        )
+
+        with patch.object(graph, "route_query_with_fallback") as router:
+            workflow = graph.create_workflow(speculative=True)
+            final_state = workflow.invoke(state)
+
+        router.assert_not_called()
+        assert fake_agents == ["professional"]
+        assert final_state["sticky_route"].target_agent == "professional"
+        assert metrics.get("routing.sticky") == 1
+        assert metrics.get("speculation.attempts") == 0
+
+    def test_topic_change_is_routed(self, fake_agents):
+        """Test that a follow-up about a new topic goes through the router."""
+        state = conversation_state(
+            ("How should I structure tests in my Python project?",
+             "Keep tests in a tests/ folder and share setup through pytest fixtures.",
+             "professional"),
+            query="Draft an email to my landlord"
+        )
+
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("communication", 0.9, "LLM: email")) as router:
+            workflow = graph.create_workflow(speculative=False)
+            workflow.invoke(state)
+
+        router.assert_called_once()
+        assert fake_agents == ["communication"]
+
+    def test_content_tokens_ignore_stopwords_and_plurals(self):
+        """Test the shared tokenizer used by the stickiness policy."""
+        from app.utils.text import containment, content_tokens
+
+        assert content_tokens("And what about the tests?") == {"test"}
+        assert containment({"test"}, content_tokens("Write a test first")) == 1.0
+
+
+class TestRetrievalReuse:
+    """Tests for reusing the query embedding across iterations."""
+
+    def test_query_embedding_is_computed_once_per_turn(self):
+        """Test that follow-up retrievals reuse the cached embedding of the user query."""
+        from app.agents.base import retrieve_context
+
+        state = create_initial_state("What are my technical skills?")
+        state["messages"].append(Message(role="assistant", content="Previous answer", agent="general"))
+
+        with patch("app.agents.base.get_retriever") as mock_get_retriever:
+            retriever = mock_get_retriever.return_value
+            retriever.has_documents.return_value = True
+            retriever.vector_store.embed_query.return_value = [0.1, 0.2]
+            retriever.retrieve_and_format.return_value = "context"
+
+            retrieve_context(state, domain="professional")
+            retrieve_context(state, domain="knowledge")
+
+        retriever.vector_store.embed_query.assert_called_once_with("What are my technical skills?")
+        assert retriever.retrieve_and_format.call_args[1]["query"] == "What are my technical skills?"
+        assert retriever.retrieve_and_format.call_args[1]["query_embedding"] == [0.1, 0.2]
+
+
+@pytest.fixture
+def persistent_workflow(fake_agents):
+    """Checkpointed workflow backed by an in-memory SQLite database."""
+    import sqlite3
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from app.orchestration.checkpoint import CompressedSerializer
+
+    saver = SqliteSaver(sqlite3.connect(":memory:", check_same_thread=False), serde=CompressedSerializer())
+    workflow = graph.create_workflow(speculative=False, checkpointer=saver)
+    with patch.object(graph, "get_persistent_workflow", return_value=workflow):
+        yield workflow
+
+
+class TestCheckpoints:
+    """Tests for checkpointed conversation state."""
+
+    def test_next_turn_continues_from_checkpoint(self, persistent_workflow):
+        """Test that a turn appends to the stored conversation without duplicates."""
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            graph.run_workflow(create_initial_state("First question"), thread_id="conv-1")
+            final_state = graph.run_workflow(create_initial_state("Second question"), thread_id="conv-1")
+
+        assert [(m.role, m.content) for m in final_state["messages"]] == [
+            ("user", "First question"),
+            ("assistant", "Answer from professional"),
+            ("user", "Second question"),
+            ("assistant", "Answer from professional"),
+        ]
+        assert final_state["iterations"] == 1
+
+    def test_routing_history_and_log_reset_each_turn(self, persistent_workflow):
+        """Test that every turn logs its own routing and the history does not grow."""
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("professional", 0.95, "LLM: technical")):
+            turns = [
+                graph.run_workflow(create_initial_state(f"Question {i}"), thread_id="conv-4")
+                for i in range(3)
+            ]
+
+        for final_state in turns:
+            assert len(final_state["routing_history"]) == 1
+            router_logs = [log for log in final_state["iteration_log"] if log.agent == "router"]
+            assert len(router_logs) == 1
+        assert len(turns[-1]["messages"]) == 6
+
+    def test_interrupted_turn_resumes_from_last_node(self, persistent_workflow, fake_agents):
+        """Test that retrying a crashed turn resumes without re-running the router."""
+        def crashing_agent(state):
+            raise RuntimeError("worker crashed")
+        crashing_agent.__name__ = "professional_agent"
+
+        route = RouteResult("professional", 0.95, "LLM: technical")
+        with patch.object(graph, "route_query_with_fallback", return_value=route) as router:
+            with patch.dict(graph.AGENT_FUNCTIONS, {"professional": crashing_agent}):
+                crashed = graph.create_workflow(speculative=False, checkpointer=persistent_workflow.checkpointer)
+            with patch.object(graph, "get_persistent_workflow", return_value=crashed), \
+                 pytest.raises(RuntimeError):
+                graph.run_workflow(create_initial_state("Debug my code"), thread_id="conv-2")
+
+            final_state = graph.run_workflow(create_initial_state("Debug my code"), thread_id="conv-2")
+
+        assert router.call_count == 1
+        assert fake_agents == ["professional"]
+        assert final_state["messages"][-1].content == "Answer from professional"
+        assert metrics.get("checkpoint.resumed") == 1
+
+    def test_old_checkpoints_are_pruned(self, persistent_workflow):
+        """Test that only the most recent checkpoints are kept per conversation."""
+        with patch.object(graph, "route_query_with_fallback",
+                          return_value=RouteResult("general", 0.9, "LLM: chat")):
+            for i in range(3):
+                graph.run_workflow(create_initial_state(f"Message {i}"), thread_id="conv-3")
+
+        checkpoints = list(persistent_workflow.checkpointer.list(graph.thread_config("conv-3")))
+        assert len(checkpoints) == 3
+
+    def test_serializer_compresses_large_state(self):
+        """Test that large checkpoints are compressed and round-trip."""
+        from app.orchestration.checkpoint import CompressedSerializer
+
+        serde = CompressedSerializer()
+        state = create_initial_state("word " * 500)
+
+        type_, data = serde.dumps_typed(state)
+        restored = serde.loads_typed((type_, data))
+
+        assert type_.endswith("+zlib")
+        assert restored["messages"][0] == state["messages"][0]
@@ -0,0 +1,1401 @@
+"""Tests for the RAG retrieval layer"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.rag.lexical import LexicalIndex, LexicalIndexManager, reciprocal_rank_fusion
+from app.rag.mmr import maximal_marginal_relevance
+from app.rag.packing import merge_adjacent, pack_context
+from app.rag.quantization import QuantizedIndex, QuantizedIndexManager, dequantize, quantize, squared_l2
+from app.rag.retriever import Retriever, RetrievedDocument
+from app.utils.metrics import metrics
+
+
+CHUNKS = {
+    "c1": "The Orion project migrated our billing service to Kubernetes.",
+    "c2": "Deployment failed with error ERR-4021 after the database upgrade.",
+    "c3": "Weekly sync with Priya about the roadmap and hiring plans.",
+    "c4": "Kubernetes clusters are monitored with Prometheus and Grafana.",
+}
+
+EMBEDDINGS = {
+    "c1": [0.9, 0.1, 0.0],
+    "c2": [0.1, 0.9, 0.0],
+    "c3": [0.0, 0.1, 0.9],
+    "c4": [0.8, 0.2, 0.1],
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start each test with empty counters."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def lexical_index():
+    index = LexicalIndex()
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    return index
+
+
+class TestLexicalIndex:
+    """Test the BM25 inverted index"""
+
+    def test_exact_identifier_ranks_first(self, lexical_index):
+        """Test that rare identifiers find their chunk."""
+        assert lexical_index.search("what was ERR-4021?")[0][0] == "c2"
+        assert lexical_index.search("notes from Priya")[0][0] == "c3"
+
+    def test_unrelated_query_returns_nothing(self, lexical_index):
+        """Test that documents sharing no term with the query are left out."""
+        assert lexical_index.search("vacation policy") == []
+
+    def test_rare_terms_outweigh_common_ones(self, lexical_index):
+        """Test that IDF favours the chunk matching the rarer term."""
+        ranked = [doc_id for doc_id, _ in lexical_index.search("Orion Kubernetes")]
+        assert ranked[0] == "c1"
+        assert set(ranked) == {"c1", "c4"}
+
+    def test_re_added_ids_are_skipped(self, lexical_index):
+        """Test that re-ingesting a chunk does not index it twice."""
+        assert lexical_index.add(["c1"], [CHUNKS["c1"]]) == 0
+        assert len(lexical_index) == 4
+
+    def test_round_trip(self, lexical_index):
+        """Test that the compact on-disk format restores the same rankings."""
+        restored = LexicalIndex.from_bytes(lexical_index.to_bytes())
+
+        assert restored.ids == lexical_index.ids
+        assert restored.search("Kubernetes monitoring") == lexical_index.search("Kubernetes monitoring")
+
+    def test_manager_persists_per_domain(self, tmp_path):
+        """Test that indexes survive a new manager and reset clears them."""
+        manager = LexicalIndexManager(str(tmp_path))
+        manager.add_documents("professional", list(CHUNKS), list(CHUNKS.values()))
+
+        reloaded = LexicalIndexManager(str(tmp_path))
+        assert reloaded.count_documents("professional") == 4
+        assert reloaded.count_documents("knowledge") == 0
+        assert reloaded.search("professional", "ERR-4021")[0][0] == "c2"
+
+        reloaded.reset("professional")
+        assert LexicalIndexManager(str(tmp_path)).count_documents("professional") == 0
+
+    def test_manager_reloads_after_external_write(self, tmp_path):
+        """Test that a serving manager picks up documents ingested by another process."""
+        serving = LexicalIndexManager(str(tmp_path))
+        assert serving.search("professional", "ERR-4021") == []
+
+        LexicalIndexManager(str(tmp_path)).add_documents("professional", list(CHUNKS), list(CHUNKS.values()))
+
+        assert serving.search("professional", "ERR-4021")[0][0] == "c2"
+
+    def test_deferred_additions_are_written_once(self, tmp_path):
+        """Test that persist=False batches writes until flush()."""
+        manager = LexicalIndexManager(str(tmp_path))
+        with patch.object(manager, "_write", wraps=manager._write) as write:
+            for doc_id, text in CHUNKS.items():
+                manager.add_documents("professional", [doc_id], [text], persist=False)
+            assert manager.count_documents("professional") == 4
+            manager.flush()
+
+        assert write.call_count == 1
+        assert LexicalIndexManager(str(tmp_path)).count_documents("professional") == 4
+
+
+def test_reciprocal_rank_fusion():
+    """Test that documents ranked well by both lists win."""
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["b", "c", "a"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+class TestHybridRetrieval:
+    """Test fusing vector and BM25 rankings in Retriever"""
+
+    @pytest.fixture
+    def retriever(self, lexical_index):
+        vector_store = MagicMock()
+        vector_store.count_documents.side_effect = lambda domain: 4 if domain == "professional" else 0
+        vector_store.embed_query.return_value = [0.1, 0.2]
+        # Vector search misses the error-code chunk entirely
+        vector_store.query.return_value = {
+            "ids": [["c4", "c1"]],
+            "documents": [[CHUNKS["c4"], CHUNKS["c1"]]],
+            "distances": [[0.4, 0.5]],
+            "metadatas": [[{"source": "ops"}, {"source": "orion"}]],
+            "embeddings": [[EMBEDDINGS["c4"], EMBEDDINGS["c1"]]],
+        }
+        vector_store.lexical_index.search.side_effect = lambda domain, query, limit: lexical_index.search(query, limit)
+        vector_store.get_documents.side_effect = lambda domain, ids, metadata_filter, include_embeddings: {
+            "ids": ids,
+            "documents": [CHUNKS[doc_id] for doc_id in ids],
+            "metadatas": [{"source": doc_id} for doc_id in ids],
+            "embeddings": [EMBEDDINGS[doc_id] for doc_id in ids],
+        }
+
+        with patch("app.rag.retriever.get_vector_store_manager", return_value=vector_store):
+            yield Retriever()
+
+    def test_lexical_hit_is_fetched_and_ranked(self, retriever):
+        """Test that a chunk only BM25 finds makes it into a small top_k."""
+        documents = retriever.retrieve(
+            "deployment error ERR-4021", domain="professional", top_k=2, mode="hybrid", mmr_lambda=1.0
+        )
+
+        assert CHUNKS["c2"] in [doc.content for doc in documents]
+        assert all(doc.domain == "professional" for doc in documents)
+        assert [doc.score for doc in documents] == sorted(doc.score for doc in documents)
+        retriever.vector_store.get_documents.assert_called_once_with(
+            "professional", ["c2"], None, include_embeddings=False
+        )
+
+    def test_vector_mode_ignores_lexical_index(self, retriever):
+        """Test that vector mode keeps the plain distance ranking."""
+        documents = retriever.retrieve(
+            "deployment error ERR-4021", domain="professional", top_k=2, mode="vector", mmr_lambda=1.0
+        )
+
+        assert [doc.content for doc in documents] == [CHUNKS["c4"], CHUNKS["c1"]]
+        assert [doc.score for doc in documents] == [0.4, 0.5]
+        retriever.vector_store.lexical_index.search.assert_not_called()
+
+
+class TestDiversity:
+    """Test MMR diversity selection"""
+
+    def test_near_duplicates_are_skipped(self):
+        """Test that MMR prefers a distinct candidate over a near-duplicate."""
+        query = [1.0, 0.5]
+        candidates = [[1.0, 0.5], [1.0, 0.45], [0.2, 1.0]]
+
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.3) == [0, 2]
+
+    def test_k_larger_than_candidates(self):
+        """Test that every candidate is returned when k exceeds the pool."""
+        assert sorted(maximal_marginal_relevance([1.0, 0.0], [[1.0, 0.0], [0.0, 1.0]], k=5)) == [0, 1]
+        assert maximal_marginal_relevance([1.0, 0.0], [], k=3) == []
+
+    def test_retriever_over_fetches_and_diversifies(self, lexical_index):
+        """Test that overlapping neighbour chunks do not fill every slot."""
+        overlap = "The Orion project migrated our billing service to Kubernetes last quarter."
+        vector_store = MagicMock()
+        vector_store.count_documents.return_value = 3
+        vector_store.query.return_value = {
+            "ids": [["c1", "c1b", "c4"]],
+            "documents": [[CHUNKS["c1"], overlap, CHUNKS["c4"]]],
+            "distances": [[0.20, 0.21, 0.35]],
+            "metadatas": [[{}, {}, {}]],
+            "embeddings": [[EMBEDDINGS["c1"], [0.9, 0.11, 0.0], [0.5, 0.2, 0.8]]],
+        }
+
+        with patch("app.rag.retriever.get_vector_store_manager", return_value=vector_store):
+            retriever = Retriever()
+            documents = retriever.retrieve(
+                "Orion migration", domain="knowledge", top_k=2, include_shared=False,
+                query_embedding=[1.0, 0.1, 0.2], mode="vector", mmr_lambda=0.5
+            )
+
+        assert [doc.content for doc in documents] == [CHUNKS["c1"], CHUNKS["c4"]]
+        assert vector_store.query.call_args[1]["n_results"] > 2
+        assert vector_store.query.call_args[1]["include_embeddings"] is True
+
+    def test_per_domain_lambda(self):
+        """Test that domain overrides win and 1.0 turns selection off."""
+        with patch("app.rag.retriever.get_vector_store_manager"), \
+             patch("app.rag.retriever.settings") as mock_settings:
+            mock_settings.mmr_enabled = True
+            mock_settings.mmr_lambda = 0.7
+            mock_settings.mmr_domain_lambdas = {"decision": 1.0}
+            retriever = Retriever()
+
+            assert retriever.mmr_lambda("knowledge") == 0.7
+            assert retriever.mmr_lambda("decision") == 1.0
+
+            mock_settings.mmr_enabled = False
+            assert retriever.mmr_lambda("knowledge") == 1.0
+
+
+def chunk(content: str, score: float, index: int, source: str = "notes", domain: str = "knowledge"):
+    return RetrievedDocument(
+        content=content,
+        score=score,
+        metadata={"source": source, "chunk_index": index},
+        domain=domain
+    )
+
+
+class TestContextPacking:
+    """Test de-duplication, merging and budgeting of retrieved context"""
+
+    def test_duplicates_across_stores_are_dropped(self):
+        """Test that the same text from shared memory is only included once."""
+        documents = [
+            chunk("Priya leads the hiring plan for Q3.", 0.2, 4),
+            chunk("Priya  leads the hiring plan for Q3.", 0.3, 0, source="sync", domain="shared"),
+            chunk("Q3 hiring plan: Priya leads it.", 0.4, 7, source="other"),
+        ]
+
+        packed = pack_context(documents, token_budget=1000)
+
+        assert [doc.score for doc in packed.documents] == [0.2]
+        assert packed.duplicates == 2
+        assert packed.tokens_saved > 0
+
+    def test_adjacent_chunks_are_merged_without_overlap(self):
+        """Test that neighbouring chunks become one document with the overlap removed."""
+        first = chunk("Orion moved billing to Kubernetes. The rollout took", 0.3, 2)
+        second = chunk("The rollout took two weeks and had no downtime.", 0.1, 3)
+
+        merged, merges = merge_adjacent([second, first])
+
+        assert merges == 1
+        assert merged[0].content == "Orion moved billing to Kubernetes. The rollout took two weeks and had no downtime."
+        assert merged[0].score == 0.1
+
+    def test_budget_keeps_best_documents(self):
+        """Test that lower-scored documents are dropped once the budget is spent."""
+        documents = [
+            chunk("alpha " * 40, 0.1, 0, source="a"),
+            chunk("beta " * 40, 0.2, 0, source="b"),
+            chunk("gamma " * 40, 0.3, 0, source="c"),
+        ]
+        budget = 120
+
+        packed = pack_context(documents, token_budget=budget)
+
+        assert packed.documents[0].metadata["source"] == "a"
+        assert packed.tokens <= budget
+        assert packed.dropped >= 1
+
+    def test_oversized_best_document_is_truncated(self):
+        """Test that the best document is cut to fit instead of being dropped."""
+        packed = pack_context([chunk("word " * 500, 0.1, 0)], token_budget=50)
+
+        assert len(packed.documents) == 1
+        assert packed.tokens <= 50
+
+    def test_format_context_reports_savings(self):
+        """Test that format_context packs the documents and counts saved tokens."""
+        documents = [
+            chunk("Priya leads the hiring plan for Q3.", 0.2, 4),
+            chunk("Priya leads the hiring plan for Q3.", 0.3, 4, domain="shared"),
+        ]
+        with patch("app.rag.retriever.get_vector_store_manager"):
+            retriever = Retriever()
+        before = metrics.get("context.tokens_saved")
+
+        context = retriever.format_context(documents)
+
+        assert context.count("Priya leads") == 1
+        assert "[Document 1 - Knowledge Domain - Source: notes]" in context
+        assert metrics.get("context.tokens_saved") > before
+
+
+class TestRetrievalCache:
+    """Test the generation-versioned retrieval cache"""
+
+    @pytest.fixture
+    def retriever(self):
+        vector_store = MagicMock()
+        vector_store.count_documents.return_value = 1
+        vector_store.embed_query.return_value = [0.1, 0.2]
+        vector_store.query.return_value = {
+            "ids": [["c1"]],
+            "documents": [[CHUNKS["c1"]]],
+            "distances": [[0.3]],
+            "metadatas": [[{"source": "orion"}]],
+        }
+        generations = {"knowledge": 0, "shared": 0}
+        vector_store.generation.side_effect = generations.get
+        vector_store.generations = generations
+
+        with patch("app.rag.retriever.get_vector_store_manager", return_value=vector_store):
+            yield Retriever()
+
+    def retrieve(self, retriever, **kwargs):
+        return retriever.retrieve("Orion", domain="knowledge", mode="vector", mmr_lambda=1.0, **kwargs)
+
+    def test_repeated_retrieval_hits_cache(self, retriever):
+        """Test that the same retrieval is only run against the store once."""
+        first = self.retrieve(retriever)
+        second = self.retrieve(retriever)
+
+        assert first == second
+        assert retriever.vector_store.query.call_count == 2  # knowledge + shared, once
+        assert retriever.cache.hit_rate() == 0.5
+
+    def test_different_inputs_miss(self, retriever):
+        """Test that top_k and metadata filters are part of the key."""
+        self.retrieve(retriever)
+        self.retrieve(retriever, top_k=5)
+        self.retrieve(retriever, metadata_filter={"source": "orion"})
+
+        assert retriever.vector_store.query.call_count == 6
+
+    def test_write_to_searched_domain_invalidates(self, retriever):
+        """Test that a generation bump on a searched domain forces a fresh query."""
+        self.retrieve(retriever)
+        retriever.vector_store.generations["shared"] += 1
+        self.retrieve(retriever)
+
+        assert retriever.vector_store.query.call_count == 4
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        from app.utils.cache import LRUCache
+
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+
+    def test_reset_collection_bumps_generation(self, tmp_path):
+        """Test that VectorStoreManager writes change the domain generation."""
+        from app.rag.stores import VectorStoreManager
+
+        manager = VectorStoreManager(persist_directory=str(tmp_path))
+        before = manager.generation("knowledge")
+        manager.reset_collection("knowledge")
+
+        assert manager.generation("knowledge") == before + 1
+        assert manager.generation("decision") == 0
+
+    def test_generation_is_shared_across_processes(self, tmp_path):
+        """Test that a write through another manager (e.g. the ingestion CLI) invalidates the cache."""
+        from app.rag.stores import VectorStoreManager
+
+        serving = VectorStoreManager(persist_directory=str(tmp_path))
+        ingesting = VectorStoreManager(persist_directory=str(tmp_path))
+        before = serving.generation("knowledge")
+
+        ingesting.add_documents(
+            "knowledge", texts=[CHUNKS["c1"]], metadatas=[{"source": "c1"}], ids=["c1"],
+            embeddings=[EMBEDDINGS["c1"]]
+        )
+
+        assert serving.generation("knowledge") == before + 1
+
+
+class TestEmbeddingBatcher:
+    """Test the cross-request embedding micro-batcher"""
+
+    def test_concurrent_requests_share_one_call(self):
+        """Test that queries arriving within the window are embedded together."""
+        import threading
+        from app.rag.embeddings import EmbeddingBatcher
+
+        calls = []
+
+        def embed_documents(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        batcher = EmbeddingBatcher(embed_documents, max_batch_size=4, window_ms=200)
+        results = {}
+        texts = ["a", "bb", "ccc", "bb"]
+        threads = [
+            threading.Thread(target=lambda i=i, text=text: results.__setitem__(i, batcher.embed(text)))
+            for i, text in enumerate(texts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(calls[0]) == ["a", "bb", "ccc"]  # Duplicates embedded once
+        assert [results[i] for i in range(4)] == [[1.0], [2.0], [3.0], [2.0]]
+        assert metrics.get("embedding_batch.requests") == 4
+
+    def test_lone_request_flushes_after_window(self):
+        """Test that a single request is not held longer than the window."""
+        from app.rag.embeddings import EmbeddingBatcher
+
+        batcher = EmbeddingBatcher(lambda texts: [[1.0] for _ in texts], window_ms=1)
+
+        assert batcher.embed("hello") == [1.0]
+        assert batcher.embed("again") == [1.0]
+        assert metrics.get("embedding_batch.calls") == 2
+
+    def test_errors_reach_every_waiter(self):
+        """Test that a failed batch call raises for the caller."""
+        from app.rag.embeddings import EmbeddingBatcher
+
+        def failing(texts):
+            raise ConnectionError("embeddings endpoint down")
+
+        batcher = EmbeddingBatcher(failing, window_ms=1)
+        with pytest.raises(ConnectionError):
+            batcher.embed("hello")
+
+
+class TestQueryBatching:
+    """Test multi-query vector search and coalescing of concurrent queries"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from app.rag.stores import VectorStoreManager
+
+        manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.get_collection("knowledge").add(
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values()),
+            documents=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+        )
+        return manager
+
+    def test_query_batch_splits_results(self, manager):
+        """Test that a multi-query call returns one single-query-shaped result per query."""
+        results = manager.query_batch("knowledge", [EMBEDDINGS["c2"], EMBEDDINGS["c3"]], n_results=1)
+
+        assert [result["ids"] for result in results] == [[["c2"]], [["c3"]]]
+        assert results[0]["documents"] == [[CHUNKS["c2"]]]
+        assert len(results[1]["distances"][0]) == 1
+
+    def test_concurrent_queries_are_coalesced(self, manager):
+        """Test that concurrent queries on one collection share a call and get their own results."""
+        import threading
+
+        manager.query_coalescer.window = 0.2
+        results = {}
+
+        def search(doc_id):
+            results[doc_id] = manager.query(
+                "knowledge", doc_id, n_results=1, query_embedding=EMBEDDINGS[doc_id]
+            )
+
+        threads = [threading.Thread(target=search, args=(doc_id,)) for doc_id in EMBEDDINGS]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert {doc_id: result["ids"][0][0] for doc_id, result in results.items()} == {
+            doc_id: doc_id for doc_id in EMBEDDINGS
+        }
+        assert metrics.get("query_batch.requests") == 4
+        assert metrics.get("query_batch.calls") < 4
+
+    def test_different_filters_are_not_mixed(self, manager):
+        """Test that queries are only coalesced with the same filter."""
+        unfiltered = manager.query("knowledge", "q", n_results=1, query_embedding=EMBEDDINGS["c1"])
+        filtered = manager.query(
+            "knowledge", "q", n_results=1, query_embedding=EMBEDDINGS["c1"],
+            metadata_filter={"source": "c3"}
+        )
+
+        assert unfiltered["ids"] == [["c1"]]
+        assert filtered["ids"] == [["c3"]]
+
+
+class TestQuantization:
+    """Test quantized vector storage and full-precision rescoring"""
+
+    @pytest.fixture
+    def vectors(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        return rng.normal(size=(200, 64)).astype(np.float32)
+
+    @pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-2), ("int8", 5e-2)])
+    def test_round_trip_error_is_small(self, vectors, dtype, tolerance):
+        """Test that dequantized vectors stay close to the originals."""
+        import numpy as np
+
+        codes, scales = quantize(vectors, dtype)
+        error = np.abs(dequantize(codes, scales) - vectors).max(axis=1) / np.abs(vectors).max(axis=1)
+
+        assert codes.dtype == np.dtype(dtype)
+        assert error.max() < tolerance
+
+    def test_int8_uses_a_quarter_of_the_memory(self, vectors):
+        """Test that int8 codes plus per-vector scales are ~4x smaller than float32."""
+        index = QuantizedIndex("int8")
+        index.add([str(i) for i in range(len(vectors))], vectors)
+
+        assert index.nbytes == len(vectors) * (64 + 4)
+
+    def test_search_finds_nearest_vectors(self, vectors):
+        """Test that quantized search ranks a vector's own entry first."""
+        index = QuantizedIndex("int8")
+        index.add([str(i) for i in range(len(vectors))], vectors)
+
+        for i in (0, 57, 199):
+            assert index.search(vectors[i], 3)[0][0] == str(i)
+
+    def test_manager_persists_and_skips_existing_ids(self, tmp_path, vectors):
+        """Test that indexes survive a reload and re-added IDs are ignored."""
+        ids = [str(i) for i in range(10)]
+        QuantizedIndexManager(str(tmp_path), "float16").add_documents("knowledge", ids, vectors[:10])
+
+        reloaded = QuantizedIndexManager(str(tmp_path), "float16")
+        assert reloaded.count_documents("knowledge") == 10
+        assert reloaded.add_documents("knowledge", ids[:5], vectors[:5]) == 0
+
+        reloaded.reset("knowledge")
+        assert reloaded.count_documents("knowledge") == 0
+
+    def test_search_is_scored_in_blocks(self, vectors):
+        """Test that block-wise scoring ranks exactly like scoring all rows at once."""
+        index = QuantizedIndex("int8")
+        for start in range(0, len(vectors), 30):
+            index.add([str(i) for i in range(start, start + 30)], vectors[start:start + 30])
+
+        whole = index.search(vectors[42], 5)
+        with patch("app.rag.quantization.SEARCH_BLOCK_SIZE", 7):
+            blocked = index.search(vectors[42], 5)
+
+        assert [doc_id for doc_id, _ in blocked] == [doc_id for doc_id, _ in whole]
+        assert [distance for _, distance in blocked] == pytest.approx([distance for _, distance in whole])
+
+    def test_index_file_loads_without_pickle(self, tmp_path, vectors):
+        """Test that IDs are stored as strings, readable with allow_pickle=False."""
+        import numpy as np
+
+        QuantizedIndexManager(str(tmp_path), "float16").add_documents("knowledge", ["a", "b"], vectors[:2])
+
+        with np.load(tmp_path / "knowledge.float16.npz", allow_pickle=False) as data:
+            assert data["ids"].tolist() == ["a", "b"]
+
+    def test_manager_defers_writes_until_flush(self, tmp_path, vectors):
+        """Test that persist=False additions are written once by flush()."""
+        manager = QuantizedIndexManager(str(tmp_path), "int8")
+
+        with patch.object(manager, "_write", wraps=manager._write) as write:
+            for start in range(0, 30, 10):
+                ids = [str(i) for i in range(start, start + 10)]
+                manager.add_documents("knowledge", ids, vectors[start:start + 10], persist=False)
+            manager.flush("knowledge")
+
+        assert write.call_count == 1
+        assert QuantizedIndexManager(str(tmp_path), "int8").count_documents("knowledge") == 30
+
+    def test_manager_reloads_after_external_write(self, tmp_path, vectors):
+        """Test that an index rebuilt by another process is picked up."""
+        serving = QuantizedIndexManager(str(tmp_path), "int8")
+        serving.add_documents("knowledge", ["0"], vectors[:1])
+        assert serving.search("knowledge", vectors[1], 1)[0][0] == "0"
+
+        QuantizedIndexManager(str(tmp_path), "int8").add_documents("knowledge", ["1"], vectors[1:2])
+
+        assert serving.count_documents("knowledge") == 2
+        assert serving.search("knowledge", vectors[1], 1)[0][0] == "1"
+
+    def test_manager_searches_outside_lock(self, tmp_path, vectors):
+        """Test that searches run on a snapshot without holding the manager lock."""
+        manager = QuantizedIndexManager(str(tmp_path), "int8")
+        manager.add_documents("knowledge", [str(i) for i in range(100)], vectors[:100])
+        held = []
+        search = QuantizedIndex.search
+
+        def spy(index, *args):
+            held.append(manager._lock.locked())
+            return search(index, *args)
+
+        with patch.object(QuantizedIndex, "search", spy):
+            snapshot = manager._indexes["knowledge"].snapshot()
+            manager.add_documents("knowledge", [str(i) for i in range(100, 200)], vectors[100:])
+            assert manager.search("knowledge", vectors[150], 1)[0][0] == "150"
+
+        assert held == [False]
+        assert all(int(doc_id) < 100 for doc_id, _ in snapshot.search(vectors[150], 5))
+
+    def test_quantized_query_matches_exact_search(self, tmp_path):
+        """Test that vector store queries rescore the quantized shortlist at full precision."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch("app.rag.stores.settings.vector_quantization", "int8"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.return_value = list(EMBEDDINGS.values())
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+        )
+
+        results = manager.query_batch("knowledge", [EMBEDDINGS["c1"], EMBEDDINGS["c3"]], n_results=2)
+        exact = [
+            sorted(EMBEDDINGS, key=lambda doc_id: squared_l2(query, [EMBEDDINGS[doc_id]])[0])[:2]
+            for query in (EMBEDDINGS["c1"], EMBEDDINGS["c3"])
+        ]
+
+        assert [result["ids"][0] for result in results] == exact
+        assert results[0]["documents"] == [[CHUNKS["c1"], CHUNKS["c4"]]]
+        assert results[0]["distances"][0][1] == pytest.approx(
+            squared_l2(EMBEDDINGS["c1"], [EMBEDDINGS["c4"]])[0], abs=1e-5
+        )
+        assert metrics.get("quantized.rescored") > 0
+
+    def test_quantized_domain_keeps_vectors_out_of_collection(self, tmp_path):
+        """Test that ChromaDB holds placeholders and the sidecar holds the vectors."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch("app.rag.stores.settings.vector_quantization", "int8"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values())
+        )
+
+        stored = manager.get_collection("knowledge").get(ids=["c2"], include=["embeddings"])
+        fetched = manager.get_documents("knowledge", ["c2"], include_embeddings=True)
+
+        assert len(stored["embeddings"][0]) == 1
+        assert list(fetched["embeddings"][0]) == pytest.approx(EMBEDDINGS["c2"])
+        assert manager.stored_dimensions("knowledge") == len(EMBEDDINGS["c2"])
+
+    def test_filtered_query_searches_sidecar(self, tmp_path):
+        """Test that filtered queries on a quantized domain rank by the sidecar vectors."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch("app.rag.stores.settings.vector_quantization", "float16"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values())
+        )
+
+        results = manager.query_batch(
+            "knowledge", [EMBEDDINGS["c1"]], n_results=2, metadata_filter={"source": {"$ne": "c1"}}
+        )
+
+        assert results[0]["ids"] == [["c4", "c2"]]
+        assert metrics.get("sidecar.queries") == 1
+
+    def test_rebuild_moves_legacy_vectors_to_sidecar(self, tmp_path):
+        """Test that --rebuild-quantized moves a domain's vectors out of ChromaDB."""
+        from app.rag.ingestion import DocumentIngestionPipeline
+        from app.rag.stores import VectorStoreManager
+
+        legacy = VectorStoreManager(persist_directory=str(tmp_path))
+        legacy.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values())
+        )
+        with patch("app.rag.stores.settings.vector_quantization", "int8"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+
+        with patch("app.rag.ingestion.get_vector_store_manager", return_value=manager):
+            indexed = DocumentIngestionPipeline().rebuild_quantized_index("knowledge")
+
+        stored = manager.get_collection("knowledge").get(include=["embeddings", "documents"])
+        assert indexed == len(EMBEDDINGS)
+        assert manager.vectors_in_sidecar("knowledge")
+        assert {len(embedding) for embedding in stored["embeddings"]} == {1}
+        assert sorted(stored["documents"]) == sorted(CHUNKS[doc_id] for doc_id in EMBEDDINGS)
+        assert manager.query_batch("knowledge", [EMBEDDINGS["c3"]], n_results=1)[0]["ids"] == [["c3"]]
+
+    def test_incomplete_index_falls_back_to_collection(self, tmp_path):
+        """Test that a collection with unindexed documents is searched directly."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch("app.rag.stores.settings.vector_quantization", "float16"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.get_collection("knowledge").add(
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values()),
+            documents=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+        )
+
+        results = manager.query_batch("knowledge", [EMBEDDINGS["c2"]], n_results=1)
+
+        assert results[0]["ids"] == [["c2"]]
+        assert metrics.get("quantized.rescored") == 0
+
+
+class TestEmbeddingDimensions:
+    """Test configurable embedding dimensionality and re-indexing"""
+
+    @pytest.fixture
+    def pipeline(self, tmp_path):
+        import numpy as np
+        from app.rag.ingestion import DocumentIngestionPipeline
+        from app.rag.stores import VectorStoreManager
+
+        rng = np.random.default_rng(1)
+        manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.side_effect = lambda texts: rng.normal(size=(len(texts), 8)).tolist()
+        manager.add_documents(
+            "knowledge",
+            texts=list(CHUNKS.values()),
+            metadatas=[{"source": doc_id} for doc_id in CHUNKS],
+            ids=list(CHUNKS),
+        )
+        manager.embedding_model.embed_documents.reset_mock()
+
+        with patch("app.rag.ingestion.get_vector_store_manager", return_value=manager):
+            yield DocumentIngestionPipeline()
+
+    def test_truncated_embeddings_are_unit_length(self):
+        """Test that shortened vectors keep their leading values, re-normalized."""
+        import numpy as np
+        from app.rag.embeddings import truncate_embeddings
+
+        shortened = np.array(truncate_embeddings([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]], 2))
+
+        assert shortened[0] == pytest.approx([0.6, 0.8])
+        assert shortened[1] == pytest.approx([0.0, 0.0])
+
+    def test_model_requests_configured_dimensions(self):
+        """Test that the embedding model is created with the configured size."""
+        from app.rag.embeddings import get_embedding_model
+
+        with patch("app.rag.embeddings.settings.embedding_dimensions", 256):
+            assert get_embedding_model().dimensions == 256
+
+    def test_shrinking_reindexes_without_embedding_calls(self, pipeline):
+        """Test that re-indexing to fewer dimensions truncates the stored vectors."""
+        store = pipeline.vector_store
+
+        with patch("app.rag.embeddings.settings.embedding_dimensions", 4):
+            report = pipeline.reindex_domain("knowledge")
+
+        assert report == {"chunks": 4, "from_dimensions": 8, "to_dimensions": 4, "embedding_calls": 0}
+        assert store.embedding_dimensions("knowledge") == 4
+        assert store.count_documents("knowledge") == 4
+        assert store.lexical_index.count_documents("knowledge") == 4
+        store.embedding_model.embed_documents.assert_not_called()
+
+    def test_growing_reindex_re_embeds(self, pipeline):
+        """Test that re-indexing to more dimensions re-embeds every chunk."""
+        store = pipeline.vector_store
+        store.embedding_model.embed_documents.side_effect = lambda texts: [[0.5] * 16 for _ in texts]
+
+        with patch("app.rag.embeddings.settings.embedding_dimensions", 16):
+            report = pipeline.reindex_domain("knowledge")
+
+        assert report["embedding_calls"] == 1
+        assert store.embedding_dimensions("knowledge") == 16
+        assert store.get_documents("knowledge", ["c3"])["documents"] == [CHUNKS["c3"]]
+
+    def test_matching_dimensions_are_left_alone(self, pipeline):
+        """Test that a domain already at the configured size is not rebuilt."""
+        generation = pipeline.vector_store.generation("knowledge")
+
+        with patch("app.rag.embeddings.settings.embedding_dimensions", 8):
+            assert pipeline.reindex_domain("knowledge")["chunks"] == 0
+
+        assert pipeline.vector_store.generation("knowledge") == generation
+
+    def test_failed_reindex_leaves_domain_intact(self, pipeline):
+        """Test that the old collection is only replaced once the rebuild completes."""
+        store = pipeline.vector_store
+        store.embedding_model.embed_documents.side_effect = RuntimeError("rate limited")
+
+        with patch("app.rag.embeddings.settings.embedding_dimensions", 16):
+            with pytest.raises(RuntimeError):
+                pipeline.reindex_domain("knowledge")
+
+        assert store.embedding_dimensions("knowledge") == 8
+        assert store.count_documents("knowledge") == 4
+
+    def test_mismatched_vectors_are_rejected(self, pipeline):
+        """Test that adding vectors of another size names the fix."""
+        with pytest.raises(ValueError, match="--reindex"):
+            pipeline.vector_store.add_documents(
+                "knowledge", texts=["new"], metadatas=[{"source": "new"}], ids=["new"], embeddings=[[0.5] * 4]
+            )
+
+    def test_longer_queries_are_truncated_to_stored_size(self, pipeline):
+        """Test that a domain not yet re-indexed still answers queries after the size grows."""
+        store = pipeline.vector_store
+        vector = store.get_collection("knowledge").get(ids=["c2"], include=["embeddings"])["embeddings"][0]
+
+        results = store.query_batch("knowledge", [list(vector) + [0.0] * 8], n_results=1)
+
+        assert results[0]["ids"][0] == ["c2"]
+        assert metrics.get("embedding.truncated_queries") == 1
+        with pytest.raises(ValueError, match="--reindex"):
+            store.query_batch("knowledge", [list(vector)[:4]], n_results=1)
+
+
+class TestIVFPQ:
+    """Test the IVF-PQ index and its use by the vector store"""
+
+    @pytest.fixture
+    def vectors(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(8, 16)) * 5
+        return (centers[np.arange(400) % 8] + rng.normal(size=(400, 16))).astype(np.float32)
+
+    def test_kmeans_finds_separated_clusters(self):
+        """Test that k-means recovers well-separated cluster centers."""
+        import numpy as np
+        from app.rag.ivfpq import kmeans, nearest_centroids
+
+        points = np.array([[0, 0], [0, 1], [10, 10], [10, 11]], dtype=np.float32)
+        centroids = kmeans(points, 2)
+
+        assignments = nearest_centroids(points, centroids)
+        assert assignments[0] == assignments[1] != assignments[2] == assignments[3]
+
+    def test_subquantizers_must_divide_dimensions(self, vectors):
+        """Test that an incompatible subquantizer count is rejected."""
+        from app.rag.ivfpq import IVFPQIndex
+
+        with pytest.raises(ValueError):
+            IVFPQIndex.train(vectors, nlist=4, subquantizers=5)
+
+    def test_search_with_all_lists_finds_own_vector(self, vectors):
+        """Test that scanning every list ranks a vector's own entry first."""
+        from app.rag.ivfpq import IVFPQIndex
+
+        index = IVFPQIndex.train(vectors, nlist=8, subquantizers=4)
+        index.add([str(i) for i in range(len(vectors))], vectors)
+
+        assert index.nbytes == len(vectors) * (4 + 4)
+        for i in (0, 123, 399):
+            assert index.search(vectors[i], 5, nprobe=8)[0][0] == str(i)
+
+    def test_disk_index_is_memory_mapped_and_appendable(self, tmp_path, vectors):
+        """Test that a saved index reloads memory-mapped and keeps appended vectors."""
+        import numpy as np
+        from app.rag.ivfpq import IVFPQIndex
+
+        index = IVFPQIndex.train(vectors, nlist=8, subquantizers=4, directory=tmp_path / "k.ivfpq")
+        index.add([str(i) for i in range(300)], vectors[:300])
+        index.add([str(i) for i in range(250, 400)], vectors[250:])
+
+        reloaded = IVFPQIndex.load(tmp_path / "k.ivfpq")
+        assert len(reloaded) == 400
+        assert isinstance(reloaded.codes, np.memmap)
+        assert reloaded.search(vectors[350], 1, nprobe=8) == index.search(vectors[350], 1, nprobe=8)
+
+    def test_manager_buffers_until_trained(self, tmp_path, vectors):
+        """Test that vectors are buffered until the training sample is complete."""
+        from app.rag.ivfpq import IVFPQIndexManager
+
+        def manager():
+            return IVFPQIndexManager(str(tmp_path), nlist=8, subquantizers=4, nprobe=2, train_size=300)
+
+        ids = [str(i) for i in range(len(vectors))]
+        assert manager().add_documents("shared", ids[:200], vectors[:200]) == 0
+        assert manager().count_documents("shared") == 0
+        assert manager().search("shared", vectors[0], 3) == []
+
+        # The buffer survives a restart and trains the index once full
+        assert manager().add_documents("shared", ids[200:], vectors[200:]) == 400
+        assert manager().count_documents("shared") == 400
+
+    def test_manager_appends_to_buffer(self, tmp_path, vectors):
+        """Test that buffering a batch neither reads nor rewrites earlier batches."""
+        import numpy as np
+
+        from app.rag.ivfpq import IVFPQIndexManager
+
+        manager = IVFPQIndexManager(str(tmp_path), nlist=8, subquantizers=4, nprobe=2, train_size=300)
+        ids = [str(i) for i in range(len(vectors))]
+
+        with patch("app.rag.ivfpq.np.load", wraps=np.load) as load:
+            for start in range(0, 250, 50):
+                manager.add_documents("shared", ids[start:start + 50], vectors[start:start + 50])
+
+        load.assert_not_called()
+        assert len(list((tmp_path / "shared.ivfpq-pending").glob("*.npz"))) == 5
+        assert manager.add_documents("shared", ids[250:], vectors[250:]) == 400
+        assert not (tmp_path / "shared.ivfpq-pending").exists()
+
+    def test_manager_searches_outside_lock(self, tmp_path, vectors):
+        """Test that searches run on a snapshot without holding the manager lock."""
+        from app.rag.ivfpq import IVFPQIndex, IVFPQIndexManager
+
+        manager = IVFPQIndexManager(str(tmp_path), nlist=8, subquantizers=4, nprobe=8, train_size=300)
+        ids = [str(i) for i in range(len(vectors))]
+        manager.add_documents("shared", ids[:300], vectors[:300])
+        held = []
+        search = IVFPQIndex.search
+
+        def spy(index, *args):
+            held.append(manager._lock.locked())
+            return search(index, *args)
+
+        with patch.object(IVFPQIndex, "search", spy):
+            snapshot = manager._indexes["shared"].snapshot()
+            manager.add_documents("shared", ids[300:], vectors[300:])
+            assert manager.search("shared", vectors[350], 1)[0][0] == "350"
+
+        assert held == [False]
+        assert all(int(doc_id) < 300 for doc_id, _ in snapshot.search(vectors[350], 5, nprobe=8))
+
+    def test_vector_store_searches_ivfpq_index(self, tmp_path):
+        """Test that vector store queries use the trained IVF-PQ index."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch.multiple(
+            "app.rag.stores.settings",
+            vector_quantization="ivfpq", ivfpq_nlist=2, ivfpq_subquantizers=3, ivfpq_train_size=4
+        ):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.return_value = list(EMBEDDINGS.values())
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+        )
+
+        results = manager.query_batch("knowledge", [EMBEDDINGS["c2"]], n_results=2)
+
+        assert manager.quantized_index.count_documents("knowledge") == 4
+        assert results[0]["ids"][0][0] == "c2"
+        assert metrics.get("quantized.rescored") > 0
+
+    def test_reset_collection_keeps_training(self, tmp_path):
+        """Test that emptying a domain keeps its IVF-PQ training for new vectors."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch.multiple(
+            "app.rag.stores.settings",
+            vector_quantization="ivfpq", ivfpq_nlist=2, ivfpq_subquantizers=3, ivfpq_train_size=4
+        ):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+            ids=list(EMBEDDINGS),
+            embeddings=list(EMBEDDINGS.values())
+        )
+
+        manager.reset_collection("knowledge")
+        manager.add_documents(
+            "knowledge", texts=[CHUNKS["c1"]], metadatas=[{"source": "c1"}], ids=["c1"],
+            embeddings=[EMBEDDINGS["c1"]]
+        )
+
+        assert manager.quantized_index.count_documents("knowledge") == 1
+
+
+class TestVectorNamespaces:
+    """Test per-user vector store namespaces"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from app.rag.stores import VectorStoreManager
+
+        with patch.multiple(
+            "app.rag.stores.settings", vector_namespaces_enabled=True, vector_namespace_cache_size=2
+        ):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+            manager.embedding_model = MagicMock()
+            manager.embedding_model.embed_documents.side_effect = (
+                lambda texts: [EMBEDDINGS[text[:2]] for text in texts]
+            )
+            yield manager
+
+    def add(self, manager, *doc_ids):
+        manager.add_documents(
+            "knowledge",
+            texts=[f"{doc_id} {CHUNKS[doc_id]}" for doc_id in doc_ids],
+            metadatas=[{"source": doc_id} for doc_id in doc_ids],
+            ids=list(doc_ids),
+        )
+
+    def test_users_see_only_their_documents(self, manager):
+        """Test that each user's documents live in their own collections."""
+        from app.rag.namespaces import namespace_scope
+
+        with namespace_scope("alice"):
+            self.add(manager, "c1", "c2")
+        with namespace_scope("bob"):
+            self.add(manager, "c3")
+
+        with namespace_scope("alice"):
+            assert manager.count_documents("knowledge") == 2
+        with namespace_scope("bob"):
+            result = manager.query("knowledge", "q", n_results=3, query_embedding=EMBEDDINGS["c1"])
+            assert result["ids"] == [["c3"]]
+        assert manager.count_documents("knowledge") == 0
+
+    def test_collections_open_lazily(self, manager):
+        """Test that a user's collections are only created when first used."""
+        from app.rag.namespaces import namespace_scope
+
+        with namespace_scope("carol"):
+            namespace = manager.namespace()
+            assert namespace.collections == {}
+            manager.count_documents("decision")
+            assert list(namespace.collections) == ["decision"]
+
+    def test_least_recently_used_namespace_is_evicted(self, manager):
+        """Test that open namespaces are bounded and evicted ones reopen from disk."""
+        from app.rag.namespaces import namespace_scope
+
+        with namespace_scope("alice"):
+            self.add(manager, "c1")
+            alice = manager.namespace()
+            manager.lexical_index.add_documents("knowledge", ["c1"], [CHUNKS["c1"]])
+        for user in ("bob", "carol"):
+            with namespace_scope(user):
+                manager.namespace()
+
+        assert metrics.get("vector_namespaces.evictions") == 1
+        with namespace_scope("alice"):
+            assert manager.namespace() is not alice
+            assert manager.count_documents("knowledge") == 1
+            assert manager.lexical_index.count_documents("knowledge") == 1
+
+    def test_generations_are_per_namespace(self, manager):
+        """Test that writes only invalidate cached results of the writer's namespace."""
+        from app.rag.namespaces import namespace_scope
+
+        with namespace_scope("alice"):
+            self.add(manager, "c1")
+            assert manager.generation("knowledge") == 1
+        with namespace_scope("bob"):
+            assert manager.generation("knowledge") == 0
+
+    def test_disabled_namespaces_use_global_store(self, manager):
+        """Test that the user scope is ignored unless namespaces are enabled."""
+        from app.rag.namespaces import namespace_scope
+
+        with patch("app.rag.stores.settings.vector_namespaces_enabled", False), namespace_scope("alice"):
+            assert manager.namespace() is manager.default_namespace
+
+
+class TestSharding:
+    """Test sharded vector search across worker processes"""
+
+    @pytest.fixture
+    def vectors(self):
+        import numpy as np
+
+        return np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+    def test_shard_search_is_exact(self, tmp_path, vectors):
+        """Test that a shard returns the true nearest vectors in distance order."""
+        import numpy as np
+        from app.rag.sharding import ShardedIndex, search_shard
+
+        index = ShardedIndex.create(tmp_path / "d.shards", 1, 8)
+        index.add([str(i) for i in range(50)], vectors)
+
+        hits = search_shard(str(tmp_path / "d.shards" / "shard-0"), 0, 50, 8, vectors[[3, 7]], 4)
+
+        for query, shard_hits in zip((3, 7), hits):
+            expected = np.argsort(((vectors - vectors[query]) ** 2).sum(axis=1))[:4]
+            assert [int(doc_id) for doc_id, _ in shard_hits] == expected.tolist()
+            assert shard_hits[0][1] == pytest.approx(0, abs=1e-4)
+
+    def test_add_fills_smallest_shards_and_skips_known_ids(self, tmp_path, vectors):
+        """Test that appends keep shards even and survive a reload."""
+        from app.rag.sharding import ShardedIndex
+
+        index = ShardedIndex.create(tmp_path / "d.shards", 3, 8)
+        assert index.add([str(i) for i in range(10)], vectors[:10]) == 10
+        assert index.add([str(i) for i in range(5, 12)], vectors[5:12]) == 2
+
+        reloaded = ShardedIndex.load(tmp_path / "d.shards")
+        assert reloaded.counts == [4, 4, 4]
+        assert sorted(sum((reloaded.shard_ids(s) for s in range(3)), [])) == sorted(str(i) for i in range(12))
+
+    def test_rebalance_changes_shard_count_and_epoch(self, tmp_path, vectors):
+        """Test that rebalancing rewrites every vector into the new layout."""
+        import numpy as np
+        from app.rag.sharding import ShardedIndex
+
+        index = ShardedIndex.create(tmp_path / "d.shards", 2, 8)
+        index.add([str(i) for i in range(50)], vectors)
+
+        rebalanced = index.rebalance(5)
+
+        assert rebalanced.counts == [10] * 5
+        assert rebalanced.epoch == 1
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["d.shards"]
+        first = rebalanced.shard_ids(0)[0]
+        assert np.array_equal(rebalanced.shard_vectors(0)[0], vectors[int(first)])
+
+    def test_vector_store_scatters_queries_to_workers(self, tmp_path):
+        """Test that sharded domains are searched by the worker processes."""
+        from app.rag.stores import VectorStoreManager
+
+        with patch.multiple(
+            "app.rag.stores.settings", vector_shards=2, vector_sharded_domains=["knowledge"]
+        ):
+            manager = VectorStoreManager(persist_directory=str(tmp_path))
+            try:
+                manager.embedding_model = MagicMock()
+                manager.embedding_model.embed_documents.return_value = list(EMBEDDINGS.values())
+                manager.add_documents(
+                    "knowledge",
+                    texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+                    metadatas=[{"source": doc_id} for doc_id in EMBEDDINGS],
+                    ids=list(EMBEDDINGS),
+                )
+
+                results = manager.query_batch("knowledge", [EMBEDDINGS["c2"], EMBEDDINGS["c3"]], n_results=2)
+
+                assert manager.sharded_index("knowledge").shard_counts("knowledge") == [2, 2]
+                assert manager.sharded_index("decision") is None
+                assert [result["ids"][0][0] for result in results] == ["c2", "c3"]
+                assert results[0]["documents"][0][0] == CHUNKS["c2"]
+                assert metrics.get("sharded.queries") == 2
+            finally:
+                manager.shard_pool.shutdown()
+
+    def test_recreated_domain_is_not_served_from_worker_cache(self, tmp_path):
+        """Test that workers drop the shards of a reset domain, even at the same count."""
+        from app.rag.sharding import ShardedIndexManager, ShardWorkerPool
+
+        pool = ShardWorkerPool(1)
+        try:
+            manager = ShardedIndexManager(str(tmp_path), 1, pool)
+            manager.add_documents("knowledge", ["a", "b"], [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]])
+            assert manager.search_batch("knowledge", [[1.0, 0.0, 0.0, 0.0]], 1)[0][0][0] == "a"
+
+            manager.reset("knowledge")
+            manager.add_documents("knowledge", ["p", "q"], [[0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]])
+            assert manager.search_batch("knowledge", [[0.0, 0.0, 1.0, 0.0]], 2)[0][0] == ("p", 0.0)
+
+            # Re-indexed at another size
+            manager.reset("knowledge")
+            manager.add_documents("knowledge", ["x", "y"], [[1.0] * 8, [0.0] * 8])
+            assert manager.search_batch("knowledge", [[0.0] * 8], 1)[0] == [("y", 0.0)]
+        finally:
+            pool.shutdown()
+
+
+class TestSnapshots:
+    """Test vector store snapshot export and import"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from app.rag.stores import VectorStoreManager
+
+        manager = VectorStoreManager(persist_directory=str(tmp_path / "source"))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.return_value = list(EMBEDDINGS.values())
+        manager.add_documents(
+            "knowledge",
+            texts=[CHUNKS[doc_id] for doc_id in EMBEDDINGS],
+            metadatas=[{"source": doc_id, "chunk_index": i} for i, doc_id in enumerate(EMBEDDINGS)],
+            ids=list(EMBEDDINGS),
+        )
+        return manager
+
+    @pytest.mark.parametrize("compression", ["none", "zlib"])
+    def test_round_trip_streams_row_groups(self, tmp_path, compression):
+        """Test that rows come back in groups with memory-mapped vectors."""
+        import numpy as np
+        from app.rag.snapshot import SnapshotReader, SnapshotWriter
+
+        vectors = np.arange(15, dtype=np.float32).reshape(5, 3)
+        with patch("app.rag.snapshot.SNAPSHOT_GROUP_SIZE", 2):
+            writer = SnapshotWriter(str(tmp_path / "s.vsnap"), "shared", 5, 3, compression)
+            writer.write(["a", "b", "c"], ["x", "ü", ""], [{"n": 1}, None, {}], vectors[:3])
+            writer.write(["d", "e"], ["y", "z"], [{}, {"n": 5}], vectors[3:])
+            writer.close()
+
+        reader = SnapshotReader(str(tmp_path / "s.vsnap"))
+        batches = list(reader.batches())
+
+        assert isinstance(reader.vectors, np.memmap)
+        assert np.array_equal(reader.vectors, vectors)
+        assert [len(batch[0]) for batch in batches] == [2, 1, 2]
+        assert sum((batch[1] for batch in batches), []) == ["x", "ü", "", "y", "z"]
+        assert batches[0][2] == [{"n": 1}, None]
+        assert np.array_equal(batches[2][3], vectors[3:])
+
+    def test_incomplete_snapshot_is_rejected(self, tmp_path):
+        """Test that unfinished or foreign files are not read as snapshots."""
+        from app.rag.snapshot import SnapshotReader, SnapshotWriter
+
+        writer = SnapshotWriter(str(tmp_path / "s.vsnap"), "shared", 2, 3)
+        writer.write(["a"], ["x"], [{}], [[0.0, 0.0, 1.0]])
+        with pytest.raises(ValueError):
+            writer.close()
+        assert list(tmp_path.iterdir()) == []
+
+        (tmp_path / "other.bin").write_bytes(b"not a snapshot at all")
+        with pytest.raises(ValueError):
+            SnapshotReader(str(tmp_path / "other.bin"))
+
+    def test_import_needs_no_embedding_calls(self, tmp_path, manager):
+        """Test that an imported domain is searchable without embedding anything."""
+        from app.rag.stores import VectorStoreManager
+
+        path = str(tmp_path / "knowledge.vsnap")
+        assert manager.export_domain("knowledge", path)["chunks"] == 4
+
+        replica = VectorStoreManager(persist_directory=str(tmp_path / "replica"))
+        replica.embedding_model = MagicMock()
+        with patch("app.rag.stores.settings.embedding_dimensions", 3):
+            report = replica.import_domain("knowledge", path)
+            again = replica.import_domain("knowledge", path)
+
+        replica.embedding_model.embed_documents.assert_not_called()
+        assert (report["imported"], again["imported"]) == (4, 0)
+        result = replica.query("knowledge", "q", n_results=1, query_embedding=EMBEDDINGS["c3"])
+        assert result["ids"] == [["c3"]]
+        assert result["metadatas"][0][0] == {"source": "c3", "chunk_index": 2}
+        assert replica.lexical_index.search("knowledge", "ERR-4021")[0][0] == "c2"
+
+    def test_mismatched_dimensions_are_refused(self, tmp_path, manager):
+        """Test that vectors of another dimensionality are not imported."""
+        path = str(tmp_path / "knowledge.vsnap")
+        manager.export_domain("knowledge", path, compression="none")
+
+        with pytest.raises(ValueError):
+            manager.import_domain("decision", path)
+        assert manager.count_documents("decision") == 0
+
+
+class TestIngestionDedup:
+    """Test MinHash/LSH near-duplicate suppression at ingestion"""
+
+    MEETING = (
+        "Hi team, the quarterly planning meeting moved to Thursday at 3pm in room 4B. "
+        "Please bring your roadmap updates and hiring plans for the next two quarters. "
+        "We will also review the budget."
+    )
+
+    @pytest.fixture
+    def pipeline(self, tmp_path):
+        from app.rag.ingestion import DocumentIngestionPipeline
+        from app.rag.stores import VectorStoreManager
+
+        manager = VectorStoreManager(persist_directory=str(tmp_path / "store"))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+        with patch("app.rag.ingestion.get_vector_store_manager", return_value=manager), \
+             patch("app.rag.ingestion.settings.ingestion_dedup", "link"):
+            yield DocumentIngestionPipeline()
+
+    def write(self, tmp_path, name, text):
+        path = tmp_path / name
+        path.write_text(text)
+        return str(path)
+
+    def test_near_duplicates_match_and_unrelated_text_does_not(self):
+        """Test that a one-word edit is caught and a different chunk is not."""
+        from app.rag.dedup import DuplicateIndex
+
+        index = DuplicateIndex()
+        index.add(["a", "c"], [self.MEETING, CHUNKS["c2"]])
+
+        matches = index.find_duplicates(
+            ["b", "d", "a"], [self.MEETING.replace("3pm", "4pm"), CHUNKS["c3"], self.MEETING]
+        )
+
+        assert matches[0][0] == "a" and matches[0][1] >= index.threshold
+        assert matches[1] is None
+        assert matches[2] is None  # Re-ingesting the same chunk is not a duplicate
+
+    def test_duplicates_within_one_batch(self):
+        """Test that repeats inside one document point at their first copy."""
+        from app.rag.dedup import DuplicateIndex
+
+        matches = DuplicateIndex().find_duplicates(["x", "y", "z"], [self.MEETING, CHUNKS["c1"], self.MEETING])
+
+        assert matches[:2] == [None, None]
+        assert matches[2][0] == "x"
+
+    def test_manager_persists_signatures(self, tmp_path):
+        """Test that the domain index survives a restart."""
+        from app.rag.dedup import DuplicateIndexManager
+
+        DuplicateIndexManager(str(tmp_path)).add_documents("shared", ["a"], [self.MEETING])
+        reloaded = DuplicateIndexManager(str(tmp_path))
+
+        assert reloaded.count_documents("shared") == 1
+        assert reloaded.find_duplicates("shared", ["b"], [self.MEETING + " Thanks!"])[0][0] == "a"
+
+    def test_duplicate_document_is_linked_without_embedding(self, tmp_path, pipeline):
+        """Test that a near-copy is not embedded and is recorded on the kept chunk."""
+        store = pipeline.vector_store
+        assert pipeline.ingest_document(self.write(tmp_path, "monday.txt", self.MEETING), "shared") == 1
+        resent = self.write(tmp_path, "resent.txt", self.MEETING.replace("3pm", "4pm"))
+        assert pipeline.ingest_document(resent, "shared", source="resent") == 0
+
+        assert store.embedding_model.embed_documents.call_count == 1
+        assert store.count_documents("shared") == 1
+        metadata = store.get_collection("shared").get(include=["metadatas"])["metadatas"][0]
+        assert metadata["duplicate_count"] == 1
+        assert metadata["duplicate_sources"] == "resent"
+        assert pipeline.dedup_report["duplicates"] == 1
+        assert pipeline.dedup_report["embedding_calls_avoided"] == 1
+        assert metrics.get("ingestion.duplicate_chunks") == 1
+
+    def test_skip_mode_and_off(self, tmp_path, pipeline):
+        """Test that skip mode leaves metadata alone and off disables the check."""
+        store = pipeline.vector_store
+        pipeline.ingest_document(self.write(tmp_path, "a.txt", self.MEETING), "shared")
+
+        with patch("app.rag.ingestion.settings.ingestion_dedup", "skip"):
+            assert pipeline.ingest_document(self.write(tmp_path, "b.txt", self.MEETING), "shared") == 0
+        metadata = store.get_collection("shared").get(include=["metadatas"])["metadatas"][0]
+        assert "duplicate_count" not in metadata
+
+        with patch("app.rag.ingestion.settings.ingestion_dedup", "off"):
+            assert pipeline.ingest_document(self.write(tmp_path, "c.txt", self.MEETING), "shared") == 1
+        assert store.count_documents("shared") == 2
+
+    def test_directory_run_writes_index_once(self, tmp_path, pipeline):
+        """Test that ingesting a directory persists the side indexes once, not per file."""
+        from app.rag.dedup import DuplicateIndexManager
+
+        documents = tmp_path / "docs"
+        documents.mkdir()
+        for i, chunk in enumerate(CHUNKS.values()):
+            (documents / f"{i}.txt").write_text(chunk)
+        index = pipeline.vector_store.duplicate_index
+        lexical = pipeline.vector_store.lexical_index
+
+        with patch.object(index, "_write", wraps=index._write) as write, \
+             patch.object(lexical, "_write", wraps=lexical._write) as lexical_write:
+            results = pipeline.ingest_directory(str(documents), "shared")
+
+        assert results["files_processed"] == len(CHUNKS)
+        assert write.call_count == 1
+        assert lexical_write.call_count == 1
+        assert DuplicateIndexManager(str(index.directory)).count_documents("shared") == len(CHUNKS)
+
+    def test_directory_run_writes_quantized_index_once(self, tmp_path):
+        """Test that ingesting a directory persists the quantized index once, not per file."""
+        from app.rag.ingestion import DocumentIngestionPipeline
+        from app.rag.stores import VectorStoreManager
+
+        documents = tmp_path / "docs"
+        documents.mkdir()
+        for i, chunk in enumerate(CHUNKS.values()):
+            (documents / f"{i}.txt").write_text(chunk)
+        with patch("app.rag.stores.settings.vector_quantization", "int8"):
+            manager = VectorStoreManager(persist_directory=str(tmp_path / "store"))
+        manager.embedding_model = MagicMock()
+        manager.embedding_model.embed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+        index = manager.quantized_index
+
+        with patch("app.rag.ingestion.get_vector_store_manager", return_value=manager), \
+             patch.object(index, "_write", wraps=index._write) as write:
+            DocumentIngestionPipeline().ingest_directory(str(documents), "shared")
+
+        assert write.call_count == 1
+        assert index.count_documents("shared") == len(CHUNKS)
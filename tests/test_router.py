@@ -7,6 +7,10 @@ Tests the new Phase 4 router implementation.
 import pytest
 from unittest.mock import Mock, patch
 from app.agents.router import (
+    RouteResult,
+    RouterDecisionParser,
+    route_query,
+    route_query_with_fallback,
     router_agent,
     router_agent_with_fallback,
     _keyword_fallback,
@@ -22,7 +26,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "professional", "confidence": 0.95, "reasoning": "Technical question"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("How do I implement OAuth in Python?")
@@ -37,7 +41,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "communication", "confidence": 0.90, "reasoning": "Writing assistance"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Help me draft an email")
@@ -51,7 +55,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "knowledge", "confidence": 0.88, "reasoning": "Personal preferences"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("What are my favorite hobbies?")
@@ -65,7 +69,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "decision", "confidence": 0.92, "reasoning": "Decision making"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Should I learn Rust or Go?")
@@ -79,7 +83,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "general", "confidence": 0.85, "reasoning": "Casual greeting"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Hello! How are you?")
@@ -93,7 +97,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "invalid_agent", "confidence": 0.95, "reasoning": "Test"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Test query")
@@ -107,7 +111,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = 'Not valid JSON'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Test query")
@@ -122,7 +126,7 @@ class TestRouterAgent:
         mock_llm = Mock()
         mock_response = Mock()
         mock_response.content = '{"agent": "professional", "confidence": 1.5, "reasoning": "Test"}'
-        mock_llm.invoke.return_value = mock_response
+        mock_llm.stream.return_value = iter([mock_response])
         mock_get_llm.return_value = mock_llm
         
         agent, confidence, reasoning = router_agent("Test query")
@@ -130,6 +134,159 @@ class TestRouterAgent:
         assert 0.0 <= confidence <= 1.0
         assert confidence == 1.0  # Should be clipped to max
 
+    
+    @patch('app.agents.router.get_llm')
+    def test_router_agent_uses_router_tier(self, mock_get_llm):
+        """Test router uses the small router model with a tight token budget."""
+        from app.config.settings import settings
+        
+        mock_llm = Mock()
+        mock_response = Mock()
+        mock_response.content = '{"agent": "general", "confidence": 0.85, "reasoning": "Greeting"}'
+        mock_llm.stream.return_value = iter([mock_response])
+        mock_get_llm.return_value = mock_llm
+        
+        router_agent("Hello!")
+        
+        kwargs = mock_get_llm.call_args.kwargs
+        assert kwargs["model"] == settings.router_llm_model
+        assert kwargs["max_tokens"] == settings.router_max_tokens
+        assert kwargs["stop"]
+    
+    @patch('app.agents.router.get_llm')
+    def test_router_agent_restores_brace_cut_by_stop_sequence(self, mock_get_llm):
+        """Test router parses JSON whose closing brace was consumed by a stop sequence."""
+        mock_llm = Mock()
+        mock_response = Mock()
+        mock_response.content = '{"agent": "decision", "confidence": 0.9, "reasoning": "Choice"'
+        mock_llm.stream.return_value = iter([mock_response])
+        mock_get_llm.return_value = mock_llm
+        
+        agent, confidence, reasoning = router_agent("Should I move to Berlin?")
+        
+        assert agent == "decision"
+        assert confidence == 0.9
+
+    
+    @patch('app.agents.router.get_llm')
+    def test_router_agent_stops_streaming_after_decision(self, mock_get_llm):
+        """Test router stops consuming the stream once agent and confidence are known."""
+        chunks = ['{"agent": "prof', 'essional", "confi', 'dence": 0.93, "also": {}, ', '"reasoning": "Tech', 'nical question"}']
+        consumed = []
+        
+        def stream(_messages):
+            for text in chunks:
+                consumed.append(text)
+                chunk = Mock()
+                chunk.content = text
+                yield chunk
+        
+        mock_llm = Mock()
+        mock_llm.stream.side_effect = stream
+        mock_get_llm.return_value = mock_llm
+        
+        agent, confidence, reasoning = router_agent("How do I profile Python code?")
+        
+        assert agent == "professional"
+        assert confidence == 0.93
+        assert len(consumed) == 3  # Reasoning chunks never requested
+
+
+class TestRouterDecisionParser:
+    """Tests for the incremental routing decision parser."""
+    
+    def test_parser_waits_for_complete_confidence(self):
+        """Test a number is not accepted until a delimiter follows it."""
+        parser = RouterDecisionParser()
+        
+        assert parser.feed('{"agent": "decision", "confidence": 0.8') is False
+        assert parser.feed('5, "reasoning": "') is True
+        assert parser.agent == "decision"
+        assert parser.confidence == 0.85
+    
+    def test_parser_captures_partial_reasoning(self):
+        """Test reasoning received before early exit is kept."""
+        parser = RouterDecisionParser()
+        parser.feed('{"agent": "general", "confidence": 0.7, "reasoning": "Casual gree')
+        
+        assert parser.complete
+        assert parser.reasoning == "Casual gree"
+    
+    def test_parser_waits_for_secondary_agents(self):
+        """Test parser keeps reading until the secondary agents are known."""
+        parser = RouterDecisionParser()
+        
+        assert parser.feed('{"agent": "decision", "confidence": 0.85, "also": {"communi') is False
+        assert parser.feed('cation": 0.8, "bogus": 0.9}, ') is True
+        assert parser.also == {"communication": 0.8}
+    
+    def test_parser_incomplete_without_fields(self):
+        """Test parser does not complete on unrelated output."""
+        parser = RouterDecisionParser()
+        
+        assert parser.feed("Not valid JSON") is False
+        assert parser.reasoning is None
+
+
+class TestRouteQuery:
+    """Tests for the full routing decision including secondary agents."""
+    
+    @patch('app.agents.router.get_llm')
+    def test_route_query_returns_secondary_agents(self, mock_get_llm):
+        """Test secondary agents are returned without the primary agent."""
+        mock_llm = Mock()
+        mock_response = Mock()
+        mock_response.content = ('{"agent": "decision", "confidence": 0.85, '
+                                 '"also": {"communication": 0.8, "decision": 0.9}, "reasoning": "Both"}')
+        mock_llm.stream.return_value = iter([mock_response])
+        mock_get_llm.return_value = mock_llm
+        
+        result = route_query("Should I take the job, and draft the acceptance email?")
+        
+        assert result.agent == "decision"
+        assert result.also == {"communication": 0.8}
+    
+    @patch('app.agents.router.route_query')
+    def test_route_query_with_fallback_uses_keywords_on_error(self, mock_route_query):
+        """Test keyword fallback when the LLM router fails."""
+        mock_route_query.side_effect = Exception("LLM error")
+        
+        result = route_query_with_fallback("Help me debug my Python code")
+        
+        assert result.agent == "professional"
+        assert result.also == {}
+        assert "Fallback" in result.reasoning
+    
+    @patch('app.agents.router.get_llm')
+    def test_llm_outage_uses_keywords_without_escalation(self, mock_get_llm):
+        """Test that a failing router LLM triggers the keyword fallback at a confidence that does not escalate."""
+        from app.config.settings import settings
+        
+        mock_llm = Mock()
+        mock_llm.stream.side_effect = ConnectionError("Connection error.")
+        mock_get_llm.return_value = mock_llm
+        
+        assert route_query("Help me debug my Python code").confidence == 0.0
+        
+        result = route_query_with_fallback("Help me debug my Python code")
+        
+        assert result.agent == "professional"
+        assert "Fallback" in result.reasoning
+        assert result.confidence >= settings.escalation_confidence_threshold
+    
+    @patch('app.agents.router.route_query')
+    def test_excluded_choice_falls_back_to_next_best(self, mock_route_query):
+        """Test that an already-tried agent is replaced by the best secondary agent."""
+        mock_route_query.return_value = RouteResult(
+            "professional", 0.9, "Technical", also={"knowledge": 0.7, "general": 0.55}
+        )
+        
+        result = route_query_with_fallback("Summarize my Python projects", exclude=["professional"])
+        
+        assert result.agent == "knowledge"
+        assert result.confidence == 0.7
+        mock_route_query.assert_called_once_with("Summarize my Python projects", ["professional"])
+
 
 class TestKeywordFallback:
     """Tests for keyword fallback routing."""
@@ -163,6 +320,24 @@ class TestKeywordFallback:
         assert agent == "decision"
         assert confidence > 0.6
     
+    def test_keyword_fallback_skips_excluded_agents(self):
+        """Test keyword fallback never picks an excluded agent."""
+        agent, confidence, reasoning = _keyword_fallback(
+            "Help me debug my Python code", exclude=["professional"]
+        )
+        
+        assert agent == "general"
+    
+    def test_keyword_fallback_skips_excluded_general(self):
+        """Test keyword fallback picks an untried agent when general is excluded."""
+        agent, confidence, reasoning = _keyword_fallback("Hello there!", exclude={"general"})
+        
+        assert agent == "professional"
+        assert confidence == 0.6
+        
+        agent, _, _ = _keyword_fallback("Hello there!", exclude={"general", "professional"})
+        assert agent == "communication"
+    
     def test_keyword_fallback_general(self):
         """Test keyword fallback uses general for no matches."""
         agent, confidence, reasoning = _keyword_fallback("Hello there!")